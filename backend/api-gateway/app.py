@@ -1,17 +1,14 @@
-import json
+import asyncio
 import os
+import statistics
+from collections import deque
 from datetime import datetime
 
-import requests
-from flask import Flask, request, jsonify, redirect
-from flask_cors import CORS
-from werkzeug.exceptions import RequestTimeout
+import aiohttp
+from aiohttp import web
 from dotenv import load_dotenv
 import jwt
 
-app = Flask(__name__)
-CORS(app)
-
 load_dotenv()
 
 # JWT configuration
@@ -96,6 +93,94 @@ PUBLIC_GET_ROUTE_PREFIXES = [
     '/api/artifacts'
 ]
 
+# Client request headers forwarded upstream so conditional, ranged and
+# compressed responses work end to end
+PASSTHROUGH_REQUEST_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Range', 'If-Range')
+
+# Upstream connections: one keep-alive pool per service, so slow speech or
+# LLM calls queue behind their own limit instead of starving other services
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '1024'))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '30'))
+UPSTREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=UPSTREAM_CONNECT_TIMEOUT,
+                                         sock_read=UPSTREAM_READ_TIMEOUT)
+# Retries after connection errors (any method: nothing was sent) and, for
+# idempotent methods only, after read errors and 502/503/504 responses.
+# Streamed bodies are never retried: the first attempt consumed them.
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '2'))
+UPSTREAM_RETRY_BACKOFF = 0.1
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+# Largest request bodies accepted from clients: multipart uploads (audio,
+# images) and everything else. Larger ones are rejected with 413 before
+# anything reaches the upstream, and before the body is sent at all when
+# the client asks with Expect: 100-continue.
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(100 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', str(10 * 1024 * 1024)))
+# Bodies up to this size are read whole so idempotent retries can resend
+# them; larger ones are streamed upstream as they arrive
+BUFFERED_BODY_BYTES = 64 * 1024
+
+# Connection-level headers that apply to one hop only and are never forwarded
+HOP_BY_HOP_HEADERS = frozenset([
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+])
+
+# Service health is probed concurrently in the background and /health
+# answers from the latest results; they are reported stale when no refresh
+# has completed for two intervals (the loop died or probes are hanging)
+HEALTH_REFRESH_SECONDS = float(os.getenv('HEALTH_REFRESH_SECONDS', '15'))
+HEALTH_TIMEOUT = float(os.getenv('HEALTH_TIMEOUT', '5'))
+HEALTH_HISTORY_SIZE = int(os.getenv('HEALTH_HISTORY_SIZE', '40'))
+
+CORS_EXPOSE_HEADERS = 'ETag, X-Dictionary-Version'
+CORS_ALLOW_METHODS = 'DELETE, GET, HEAD, OPTIONS, POST, PUT'
+
+_sessions = {}
+
+def create_session():
+    """Client session with a keep-alive connection pool for one upstream"""
+    connector = aiohttp.TCPConnector(limit=UPSTREAM_POOL_SIZE, limit_per_host=UPSTREAM_POOL_SIZE)
+    # Sessions are shared by every client; never carry one user's cookies into another's request.
+    # Bodies are relayed still encoded, exactly as the upstream sent them.
+    return aiohttp.ClientSession(connector=connector, timeout=UPSTREAM_TIMEOUT,
+                                 cookie_jar=aiohttp.DummyCookieJar(), auto_decompress=False)
+
+def get_session(service_name):
+    """Pooled session for a service (created on first use, inside the running event loop)"""
+    session = _sessions.get(service_name)
+    if session is None or session.closed:
+        session = _sessions[service_name] = create_session()
+    return session
+
+async def close_sessions(app):
+    for session in list(_sessions.values()):
+        await session.close()
+    _sessions.clear()
+
+async def send_upstream(session, method, url, replayable=True, **kwargs):
+    """Send a request upstream under the retry policy; the caller releases the response"""
+    attempt = 0
+    while True:
+        try:
+            response = await session.request(method, url, **kwargs)
+        except aiohttp.ClientConnectorError:
+            # Connection never established, so the request was not sent
+            if not replayable or attempt >= UPSTREAM_RETRIES:
+                raise
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if method not in IDEMPOTENT_METHODS or not replayable or attempt >= UPSTREAM_RETRIES:
+                raise
+        else:
+            if (response.status not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS
+                    or not replayable or attempt >= UPSTREAM_RETRIES):
+                return response
+            response.release()
+        await asyncio.sleep(UPSTREAM_RETRY_BACKOFF * 2 ** attempt)
+        attempt += 1
+
 def get_service_url(service_name):
     """Get the base URL for a service"""
     return SERVICES.get(service_name, {}).get('url', '')
@@ -105,12 +190,12 @@ def is_public_route(full_path, method):
     if any(full_path.startswith(prefix) for prefix in PUBLIC_ROUTE_PREFIXES):
         return True
 
-    if method == 'GET' and any(full_path.startswith(prefix) for prefix in PUBLIC_GET_ROUTE_PREFIXES):
+    if method in ('GET', 'HEAD') and any(full_path.startswith(prefix) for prefix in PUBLIC_GET_ROUTE_PREFIXES):
         return True
 
     return False
 
-def extract_token_from_header():
+def extract_token_from_header(request):
     """Extract Bearer token from Authorization header"""
     auth_header = request.headers.get('Authorization', '')
     if not auth_header.startswith('Bearer '):
@@ -127,94 +212,274 @@ def decode_token(token):
         raise jwt.InvalidTokenError('userId not present in token payload')
     return user_id
 
-def forward_request(service_name, path, method='GET', data=None, params=None, files=None, headers=None):
+class RequestTooLarge(Exception):
+    """Request body over the size limit for its kind"""
+
+    def __init__(self, limit):
+        super().__init__(f'Request body exceeds {limit} bytes')
+        self.limit = limit
+
+def body_limit(request):
+    return MAX_UPLOAD_BYTES if request.content_type == 'multipart/form-data' else MAX_REQUEST_BYTES
+
+def too_large_cause(error):
+    """The RequestTooLarge behind a failed upstream send, if that is what stopped it"""
+    while error is not None:
+        if isinstance(error, RequestTooLarge):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+async def limited_body(request, limit):
+    """Chunks of a body without Content-Length, cut off once it passes *limit*"""
+    received = 0
+    async for chunk in request.content.iter_any():
+        received += len(chunk)
+        if received > limit:
+            # The client session reports this as a failed send; forward_request turns it into a 413
+            raise RequestTooLarge(limit)
+        yield chunk
+
+async def request_body(request, headers):
+    """Upstream body for a POST or PUT: the client's bytes, never parsed or re-encoded.
+
+    Raises RequestTooLarge when the declared length is over the limit;
+    a chunked body is checked as it streams.
+    """
+    limit = body_limit(request)
+    length = request.content_length
+    if length is not None and length > limit:
+        raise RequestTooLarge(limit)
+    if not request.body_exists:
+        # Bodyless writes reach services as an empty JSON object, as they always have
+        headers['Content-Type'] = 'application/json'
+        return b'{}'
+    if 'Content-Type' in request.headers:
+        headers['Content-Type'] = request.headers['Content-Type']
+    if length is None:
+        return limited_body(request, limit)
+    headers['Content-Length'] = str(length)
+    if length <= BUFFERED_BODY_BYTES:
+        return await request.read()
+    return request.content
+
+async def expect_handler(request):
+    """Answer Expect: 100-continue, rejecting an oversized body before the client sends it"""
+    if request.content_length is not None and request.content_length > body_limit(request):
+        return web.json_response({'error': str(RequestTooLarge(body_limit(request)))}, status=413)
+    if request.version == aiohttp.HttpVersion11 and request.headers.get('Expect', '').lower() == '100-continue':
+        await request.writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        # Reset output_size as the main response has not started yet
+        request.writer.output_size = 0
+    else:
+        raise web.HTTPExpectationFailed(text=f"Unknown Expect: {request.headers.get('Expect')}")
+
+async def relay_response(request, upstream):
+    """Stream an upstream response to the client as raw bytes, status and end-to-end headers unchanged.
+
+    Bodies with a Content-Length keep it; others go out chunked. An
+    upstream failure after the headers are sent is raised as
+    ConnectionError, which closes the client connection so the response
+    reads as truncated rather than complete.
+    """
+    response = web.StreamResponse(status=upstream.status, reason=upstream.reason)
+    response.headers.extend((name, value) for name, value in upstream.headers.items()
+                            if name.lower() not in HOP_BY_HOP_HEADERS)
+    await response.prepare(request)
+    try:
+        async for chunk in upstream.content.iter_any():
+            await response.write(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ Upstream response for {request.path} aborted: {str(e) or type(e).__name__}")
+        raise ConnectionError('Upstream response aborted') from e
+    await response.write_eof()
+    return response
+
+async def forward_request(request, service_name, path, method='GET', body=None, params=None, headers=None):
     """Forward request to appropriate microservice"""
     try:
         service_url = get_service_url(service_name)
         if not service_url:
-            return jsonify({'error': 'Service not found'}), 404
+            return web.json_response({'error': 'Service not found'}, status=404)
         
         url = f"{service_url}{path}"
         request_headers = headers or {}
+        session = get_session(service_name)
         
-        # Forward the request
-        if method == 'GET':
-            response = requests.get(url, params=params, headers=request_headers, timeout=30)
-        elif method == 'POST':
-            # Handle file uploads for STT service
-            if files:
-                response = requests.post(url, files=files, data=data, params=params, headers=request_headers, timeout=30)
-            else:
-                response = requests.post(url, json=data, params=params, headers=request_headers, timeout=30)
-        elif method == 'PUT':
-            response = requests.put(url, json=data, params=params, headers=request_headers, timeout=30)
-        elif method == 'DELETE':
-            response = requests.delete(url, params=params, headers=request_headers, timeout=30)
-        else:
-            return jsonify({'error': 'Method not allowed'}), 405
+        if method not in ('GET', 'HEAD', 'POST', 'PUT', 'DELETE'):
+            return web.json_response({'error': 'Method not allowed'}, status=405)
         
-        # Handle different response types
-        if response.headers.get('content-type', '').startswith('audio/'):
-            # Return audio files directly
-            return response.content, response.status_code, response.headers.items()
-        else:
-            return jsonify(response.json()), response.status_code
+        # Forward the request; a streamed body is consumed by the first attempt and cannot be resent
+        response = await send_upstream(session, method, url, replayable=body is None or isinstance(body, bytes),
+                                       params=params, headers=request_headers, data=body)
+        async with response:
+            return await relay_response(request, response)
         
-    except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Service unavailable: {str(e)}'}), 503
+    except ConnectionError:
+        # Raised once the response has started; there is no error body left to send
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        too_large = too_large_cause(e)
+        if too_large:
+            return web.json_response({'error': str(too_large)}, status=413)
+        return web.json_response({'error': f'Service unavailable: {str(e) or type(e).__name__}'}, status=503)
     except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return web.json_response({'error': f'Internal server error: {str(e)}'}, status=500)
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    service_health = {}
-    
-    for service_name, config in SERVICES.items():
+def _timestamp(moment):
+    return moment.isoformat() + 'Z' if moment else None
+
+class HealthMonitor:
+    """Latest health of every service plus its recent probe latencies, refreshed by a background loop"""
+
+    def __init__(self, services, interval=HEALTH_REFRESH_SECONDS, timeout=HEALTH_TIMEOUT,
+                 history_size=HEALTH_HISTORY_SIZE):
+        self.services = services
+        self.interval = interval
+        self.timeout = timeout
+        self.results = {}
+        self.history = {name: deque(maxlen=history_size) for name in services}
+        self.last_healthy = {}
+        self.checked_at = None
+        self._session = None
+        self._refreshing = None
+        self._task = None
+
+    async def _probe(self, service_name, config):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
         try:
-            response = requests.get(f"{config['url']}{config['health']}", timeout=5)
-            service_health[service_name] = {
-                'status': 'healthy' if response.status_code == 200 else 'unhealthy',
-                'response_time': response.elapsed.total_seconds()
+            async with self._session.get(f"{config['url']}{config['health']}") as response:
+                await response.read()
+            elapsed = loop.time() - started
+            result = {
+                'status': 'healthy' if response.status == 200 else 'unhealthy',
+                'response_time': round(elapsed, 4)
             }
         except Exception as e:
-            service_health[service_name] = {
+            elapsed = None
+            result = {
                 'status': 'unhealthy',
-                'error': str(e)
+                'error': str(e) or type(e).__name__
             }
-    
-    overall_status = 'healthy' if all(
-        service['status'] == 'healthy' for service in service_health.values()
-    ) else 'degraded'
-    
-    return jsonify({
-        'status': overall_status,
-        'services': service_health,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
-    })
+        checked_at = datetime.utcnow()
+        result['checked_at'] = _timestamp(checked_at)
+        if result['status'] == 'healthy':
+            self.last_healthy[service_name] = checked_at
+        self.history[service_name].append((checked_at, result['status'], elapsed))
+        self.results[service_name] = result
+
+    async def _refresh(self):
+        if self._session is None or self._session.closed:
+            # Separate from the proxy pools: no retries, and a hung probe gives up after the timeout
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                  cookie_jar=aiohttp.DummyCookieJar())
+        await asyncio.gather(*(self._probe(name, config) for name, config in self.services.items()))
+        self.checked_at = datetime.utcnow()
+
+    def refresh(self):
+        """Probe every service at once; callers arriving mid-refresh share the one in flight"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        return asyncio.shield(self._refreshing)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"❌ Health refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self, app):
+        self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self, app):
+        for task in (self._task, self._refreshing):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self._session is not None:
+            await self._session.close()
 
+    def latency(self, service_name):
+        """Summary of the recent probe latencies of a service, in seconds (probes that got no answer excluded)"""
+        samples = self.history[service_name]
+        latencies = sorted(elapsed for _, _, elapsed in samples if elapsed is not None)
+        return {
+            'samples': len(samples),
+            'healthy_samples': sum(1 for _, status, _ in samples if status == 'healthy'),
+            'avg': round(statistics.mean(latencies), 4) if latencies else None,
+            'p50': round(statistics.median(latencies), 4) if latencies else None,
+            'p95': round(latencies[int(len(latencies) * 0.95)], 4) if latencies else None,
+            'max': round(latencies[-1], 4) if latencies else None
+        }
 
-@app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
-def api_gateway(path):
+    def report(self, include_history=False):
+        now = datetime.utcnow()
+        age = (now - self.checked_at).total_seconds() if self.checked_at else None
+        service_health = {}
+        for service_name in self.services:
+            entry = dict(self.results.get(service_name, {'status': 'unknown'}))
+            entry['last_healthy'] = _timestamp(self.last_healthy.get(service_name))
+            entry['latency'] = self.latency(service_name)
+            if include_history:
+                entry['history'] = [
+                    {'checked_at': _timestamp(checked_at), 'status': status,
+                     'response_time': round(elapsed, 4) if elapsed is not None else None}
+                    for checked_at, status, elapsed in self.history[service_name]
+                ]
+            service_health[service_name] = entry
+
+        overall_status = 'healthy' if all(
+            service['status'] == 'healthy' for service in service_health.values()
+        ) else 'degraded'
+
+        return {
+            'status': overall_status,
+            'services': service_health,
+            'timestamp': _timestamp(now),
+            'checked_at': _timestamp(self.checked_at),
+            'age_seconds': round(age, 3) if age is not None else None,
+            'stale': age is None or age > 2 * self.interval + self.timeout,
+            'refresh_seconds': self.interval
+        }
+
+HEALTH_MONITOR = web.AppKey('health_monitor', HealthMonitor)
+
+async def health_check(request):
+    """Health check endpoint, answered from the background probes"""
+    monitor = request.app[HEALTH_MONITOR]
+    if monitor.checked_at is None:
+        # Only until the first refresh finishes; it is bounded by the probe timeout
+        await monitor.refresh()
+    include_history = request.query.get('history', '').lower() in ('1', 'true', 'yes')
+    return web.json_response(monitor.report(include_history))
+
+
+async def api_gateway(request):
     """Main API gateway endpoint"""
-    full_path = f'/api/{path}'
+    full_path = f"/api/{request.match_info['path']}"
     
     # Determine if the route requires authentication
     headers = {}
     incoming_auth_headers = request.headers.get('Authorization')
     
     if not is_public_route(full_path, request.method):
-        token = extract_token_from_header()
+        token = extract_token_from_header(request)
         if not token:
-            return jsonify({'error': 'Authorization token missing'}), 401
+            return web.json_response({'error': 'Authorization token missing'}, status=401)
         try:
             user_id = decode_token(token)
         except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token expired'}), 401
+            return web.json_response({'error': 'Token expired'}, status=401)
         except jwt.InvalidTokenError as e:
-            return jsonify({'error': f'Invalid token: {str(e)}'}), 401
+            return web.json_response({'error': f'Invalid token: {str(e)}'}, status=401)
         except ValueError as e:
-            return jsonify({'error': str(e)}), 500
+            return web.json_response({'error': str(e)}, status=500)
 
         # Attach the authenticated user id to downstream requests
         headers['X-User-Id'] = user_id
@@ -227,36 +492,69 @@ def api_gateway(path):
             break
     
     if not service_name:
-        return jsonify({'error': 'Route not found'}), 404
+        return web.json_response({'error': 'Route not found'}, status=404)
     
     # Get request data
-    data = None
-    files = None
+    body = None
     headers['Authorization'] = incoming_auth_headers or ''
+    for name in PASSTHROUGH_REQUEST_HEADERS:
+        if request.headers.get(name):
+            headers[name] = request.headers[name]
+    # Without this the client session would ask for gzip the caller may not accept
+    headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
 
     if request.method in ['POST', 'PUT']:
-        # Handle file uploads for endpoints that accept multipart/form-data.
-        if request.files:
-            files = {}
-            for key, file in request.files.items():
-                files[key] = (file.filename, file.stream, file.content_type)
-            # Include form fields alongside files.
-            data = request.form.to_dict()
-        else:
-            data = request.get_json(silent=True) or {}
+        # JSON and multipart uploads alike are passed through as they arrive
+        try:
+            body = await request_body(request, headers)
+        except RequestTooLarge as e:
+            return web.json_response({'error': str(e)}, status=413)
     
-    params = request.args.to_dict()
+    params = {key: request.query.getone(key) for key in request.query}
     
     # Forward the request
-    return forward_request(service_name, full_path, request.method, data, params, files, headers)
+    return await forward_request(request, service_name, full_path, request.method, body, params, headers)
+
+@web.middleware
+async def error_middleware(request, handler):
+    # CORS preflight is answered here, before any route or auth check
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = CORS_ALLOW_METHODS
+        if 'Access-Control-Request-Headers' in request.headers:
+            response.headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+        return response
+    try:
+        return await handler(request)
+    except web.HTTPNotFound:
+        return web.json_response({'error': 'Endpoint not found'}, status=404)
+    except (web.HTTPException, ConnectionError):
+        raise
+    except Exception as e:
+        print(f"❌ Unhandled gateway error on {request.method} {request.path}: {e}")
+        return web.json_response({'error': 'Internal server error'}, status=500)
+
+async def add_cors_headers(request, response):
+    """Runs just before headers are sent, so streamed and error responses get them too"""
+    if 'Origin' in request.headers:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Expose-Headers'] = CORS_EXPOSE_HEADERS
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': 'Endpoint not found'}), 404
+def create_app():
+    app = web.Application(middlewares=[error_middleware], client_max_size=MAX_REQUEST_BYTES)
+    monitor = app[HEALTH_MONITOR] = HealthMonitor(SERVICES)
+    app.router.add_get('/health', health_check)
+    # GET also answers HEAD, which is forwarded as HEAD so upstream validators and lengths come back
+    app.router.add_get('/api/{path:.*}', api_gateway, allow_head=True, expect_handler=expect_handler)
+    for method in ('POST', 'PUT', 'DELETE'):
+        app.router.add_route(method, '/api/{path:.*}', api_gateway, expect_handler=expect_handler)
+    app.on_response_prepare.append(add_cors_headers)
+    app.on_startup.append(monitor.start)
+    app.on_cleanup.append(monitor.stop)
+    app.on_cleanup.append(close_sessions)
+    return app
 
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({'error': 'Internal server error'}), 500
+app = create_app()
 
 if __name__ == '__main__':
     print("Starting API Gateway on port 5000...")
@@ -264,4 +562,4 @@ if __name__ == '__main__':
     for route, service in ROUTE_MAPPINGS.items():
         print(f"  {route} -> {service} service")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    web.run_app(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,159 @@
+"""
+API Gateway Proxy Overhead Benchmark
+Starts a local stub upstream service and the gateway, each on its own event
+loop thread, and drives proxied requests through the gateway over HTTP.
+Each level runs once with the pooled keep-alive sessions and once opening a
+new upstream connection per request (how the gateway proxied before
+pooling). With --delay-ms the upstream answers slowly, which shows how many
+proxied calls the gateway keeps in flight at once; --body-kb sets the size
+of the JSON the upstream returns. The cpu column is CPU time spent on the
+gateway's thread per proxied request.
+
+Usage: python benchmark_gateway.py [--requests 2000] [--concurrency 1,32,1000] [--delay-ms 0] [--body-kb 0]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+
+import app as gateway
+
+STUB_RESULT = {'vedda_word': 'maya', 'english_word': 'water', 'sinhala_word': 'වතුර'}
+
+
+def thread_time(loop):
+    """CPU seconds used so far by the thread running *loop*"""
+    async def read():
+        return time.thread_time()
+    return asyncio.run_coroutine_threadsafe(read(), loop).result()
+
+
+def stub_body(size_kb):
+    """Dictionary-style JSON answer of about *size_kb* KiB (one result when 0)"""
+    results = [STUB_RESULT]
+    while len(json.dumps(results).encode()) < size_kb * 1024:
+        results.extend([STUB_RESULT] * len(results))
+    return json.dumps({'success': True, 'results': results}, ensure_ascii=False).encode()
+
+
+def new_connection_session():
+    """Stand-in for the old per-request connections: no keep-alive reuse"""
+    connector = aiohttp.TCPConnector(limit=gateway.UPSTREAM_POOL_SIZE, force_close=True)
+    return aiohttp.ClientSession(connector=connector, timeout=gateway.UPSTREAM_TIMEOUT,
+                                 cookie_jar=aiohttp.DummyCookieJar())
+
+
+def start_in_thread(application):
+    """Serve *application* on a free local port from a background event loop; returns (loop, thread, port)"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def serve():
+        runner = web.AppRunner(application, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, backlog=4096)
+        await site.start()
+        state['runner'] = runner
+        state['port'] = runner.addresses[0][1]
+        started.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve())
+        loop.run_forever()
+        loop.run_until_complete(state['runner'].cleanup())
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    return loop, thread, state['port']
+
+
+def stub_app(delay, body):
+    async def answer(request):
+        if delay:
+            await asyncio.sleep(delay)
+        return web.Response(body=body, content_type='application/json')
+
+    application = web.Application()
+    application.router.add_get('/{path:.*}', answer)
+    return application
+
+
+async def run(url, total, concurrency):
+    """Latencies (ms) of *total* proxied GETs issued by *concurrency* concurrent clients"""
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        async def one():
+            start = time.perf_counter()
+            async with client.get(url) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            return (time.perf_counter() - start) * 1000
+
+        for _ in range(20):
+            await one()
+
+        queue = iter(range(total))
+        latencies = []
+
+        async def worker():
+            for _ in queue:
+                latencies.append(await one())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'req_per_sec': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)], 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', default='1,32,1000')
+    parser.add_argument('--delay-ms', type=float, default=0, help='upstream response delay')
+    parser.add_argument('--body-kb', type=int, default=0, help='upstream response size')
+    args = parser.parse_args()
+
+    _, _, stub_port = start_in_thread(stub_app(args.delay_ms / 1000, stub_body(args.body_kb)))
+    stub_url = f'http://127.0.0.1:{stub_port}'
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    print(f"{'Mode':<10} {'Clients':>7} {'req/s':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'cpu':>10}")
+    print('-' * 73)
+    with patch.dict(gateway.SERVICES['dictionary'], url=stub_url):
+        for mode in ('new-conn', 'pooled'):
+            factory = new_connection_session if mode == 'new-conn' else gateway.create_session
+            with patch.object(gateway, 'create_session', factory):
+                gateway_loop, gateway_thread, gateway_port = start_in_thread(gateway.create_app())
+                url = f'http://127.0.0.1:{gateway_port}/api/dictionary/search?q=maya'
+                for concurrency in levels:
+                    cpu_before = thread_time(gateway_loop)
+                    result = asyncio.run(run(url, args.requests, concurrency))
+                    # Includes the warm-up requests
+                    cpu_us = (thread_time(gateway_loop) - cpu_before) / (args.requests + 20) * 1e6
+                    print(f"{mode:<10} {concurrency:>7} {result['req_per_sec']:>10,.0f} "
+                          f"{result['p50_ms']:>8.2f}ms {result['p95_ms']:>8.2f}ms {result['p99_ms']:>8.2f}ms "
+                          f"{cpu_us:>8.0f}us")
+                # Cleanup closes the upstream sessions before the next mode creates its own
+                gateway_loop.call_soon_threadsafe(gateway_loop.stop)
+                gateway_thread.join()
+
+
+if __name__ == "__main__":
+    main()
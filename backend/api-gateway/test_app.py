@@ -0,0 +1,490 @@
+"""
+Tests for the API gateway: auth rules, header and body passthrough, size
+limits, retries, HEAD and health monitoring, against stand-in upstreams
+served on local ports.
+
+Run with:  python -m unittest test_app  (from backend/api-gateway)
+"""
+
+import asyncio
+import gzip
+import json
+import socket
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import aiohttp
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, TestServer
+
+import app as gateway
+
+DOCUMENT = json.dumps([{'word': 'maya', 'meaning': 'water'}] * 50).encode()
+ETAG = '"v1"'
+
+
+def token(user_id='user-1', **claims):
+    payload = dict(claims)
+    if user_id:
+        payload['userId'] = user_id
+    return jwt.encode(payload, gateway.JWT_SECRET, algorithm=gateway.JWT_ALGORITHMS[0])
+
+
+def create_upstream(requests, outcomes):
+    """Upstream service recording what reached it in *requests*.
+
+    Each request first takes the next entry of *outcomes*, if any: a status
+    to answer with, or 'drop' to close the connection without a response.
+    """
+
+    async def health(request):
+        return web.json_response({'status': 'healthy'})
+
+    async def document(request):
+        body = await request.read()
+        requests.append({
+            'method': request.method,
+            'path': request.path,
+            'query': dict(request.query),
+            'headers': dict(request.headers),
+            'body': body
+        })
+        if outcomes:
+            outcome = outcomes.pop(0)
+            if outcome == 'drop':
+                request.transport.close()
+                return web.Response()
+            return web.json_response({'error': 'unavailable'}, status=outcome)
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304, headers={'ETag': ETAG})
+        headers = {'ETag': ETAG, 'Content-Type': 'application/json'}
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+            return web.Response(body=gzip.compress(DOCUMENT), headers=headers)
+        return web.Response(body=DOCUMENT, headers=headers)
+
+    upstream = web.Application(client_max_size=1024 ** 3)
+    upstream.router.add_get('/health', health)
+    upstream.router.add_route('*', '/{path:.*}', document)
+    return upstream
+
+
+class GatewayTestCase(AioHTTPTestCase):
+
+    async def get_application(self):
+        self.upstream_requests = []
+        self.upstream_outcomes = []
+        self.upstream = TestServer(create_upstream(self.upstream_requests, self.upstream_outcomes))
+        await self.upstream.start_server()
+        url = str(self.upstream.make_url('')).rstrip('/')
+        services = patch.dict(gateway.SERVICES, {
+            name: {'url': url, 'health': '/health'} for name in gateway.SERVICES
+        })
+        services.start()
+        self.addCleanup(services.stop)
+        return gateway.create_app()
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        await self.upstream.close()
+
+    def bearer(self, value=None):
+        return {'Authorization': f'Bearer {value or token()}'}
+
+
+class TestAuth(GatewayTestCase):
+
+    async def test_public_routes_need_no_token(self):
+        async with self.client.get('/api/dictionary/search', params={'q': 'maya'}) as response:
+            self.assertEqual(response.status, 200)
+        self.assertEqual(self.upstream_requests[0]['query'], {'q': 'maya'})
+        self.assertNotIn('X-User-Id', self.upstream_requests[0]['headers'])
+
+    async def test_public_get_routes_need_a_token_to_write(self):
+        async with self.client.get('/api/artifacts') as response:
+            self.assertEqual(response.status, 200)
+        async with self.client.post('/api/artifacts', json={}) as response:
+            self.assertEqual(response.status, 401)
+        self.assertEqual(len(self.upstream_requests), 1)
+
+    async def test_private_routes_reject_missing_bad_and_expired_tokens(self):
+        cases = (
+            ({}, 'Authorization token missing'),
+            ({'Authorization': 'Basic abc'}, 'Authorization token missing'),
+            (self.bearer('not-a-jwt'), 'Invalid token'),
+            (self.bearer(token(user_id=None)), 'Invalid token: userId not present in token payload'),
+            (self.bearer(token(exp=int(time.time()) - 60)), 'Token expired'),
+        )
+        for headers, error in cases:
+            with self.subTest(error=error):
+                async with self.client.get('/api/learn/lessons', headers=headers) as response:
+                    self.assertEqual(response.status, 401)
+                    self.assertTrue((await response.json())['error'].startswith(error))
+        self.assertEqual(self.upstream_requests, [])
+
+    async def test_user_id_is_sent_upstream(self):
+        headers = dict(self.bearer(), **{'X-User-Id': 'someone-else'})
+        async with self.client.get('/api/learn/lessons', headers=headers) as response:
+            self.assertEqual(response.status, 200)
+        forwarded = self.upstream_requests[0]['headers']
+        self.assertEqual(forwarded['X-User-Id'], 'user-1')
+        self.assertEqual(forwarded['Authorization'], headers['Authorization'])
+
+    async def test_client_user_id_is_not_trusted_on_public_routes(self):
+        async with self.client.get('/api/dictionary/search', headers={'X-User-Id': 'admin'}) as response:
+            self.assertEqual(response.status, 200)
+        self.assertNotIn('X-User-Id', self.upstream_requests[0]['headers'])
+
+    async def test_unknown_routes_are_404(self):
+        # Routes outside the public prefixes are authenticated before they are resolved
+        async with self.client.get('/api/nowhere') as response:
+            self.assertEqual(response.status, 401)
+        async with self.client.get('/api/nowhere', headers=self.bearer()) as response:
+            self.assertEqual(response.status, 404)
+        async with self.client.get('/elsewhere') as response:
+            self.assertEqual(response.status, 404)
+
+
+class TestBodies(GatewayTestCase):
+
+    async def test_body_is_forwarded_unchanged(self):
+        body = b'{"text": "water",  "source_language": "english"}'
+        async with self.client.post('/api/translate', data=body,
+                                    headers={'Content-Type': 'application/json'}) as response:
+            self.assertEqual(response.status, 200)
+        self.assertEqual(self.upstream_requests[0]['body'], body)
+
+    async def test_declared_oversized_body_is_413(self):
+        with patch.object(gateway, 'MAX_REQUEST_BYTES', 1024):
+            async with self.client.post('/api/translate', data=b'x' * 2048,
+                                        headers={'Content-Type': 'application/json'}) as response:
+                self.assertEqual(response.status, 413)
+                self.assertIn('1024', (await response.json())['error'])
+        self.assertEqual(self.upstream_requests, [])
+
+    async def test_chunked_oversized_body_is_413(self):
+        async def chunks():
+            for _ in range(4):
+                yield b'x' * 512
+
+        with patch.object(gateway, 'MAX_REQUEST_BYTES', 1024):
+            async with self.client.post('/api/translate', data=chunks(),
+                                        headers={'Content-Type': 'application/json'}) as response:
+                self.assertEqual(response.status, 413)
+                self.assertIn('1024', (await response.json())['error'])
+        self.assertEqual(self.upstream_requests, [])
+
+    async def test_chunked_body_under_the_limit_is_streamed(self):
+        async def chunks():
+            for _ in range(4):
+                yield b'x' * 512
+
+        with patch.object(gateway, 'MAX_REQUEST_BYTES', 4096):
+            async with self.client.post('/api/translate', data=chunks()) as response:
+                self.assertEqual(response.status, 200)
+        self.assertEqual(self.upstream_requests[0]['body'], b'x' * 2048)
+
+    async def test_large_body_is_streamed_with_its_length(self):
+        body = bytes(range(256)) * 400  # 100 KiB, past the buffered size
+        self.assertGreater(len(body), gateway.BUFFERED_BODY_BYTES)
+        async with self.client.post('/api/translate', data=body,
+                                    headers={'Content-Type': 'application/octet-stream'}) as response:
+            self.assertEqual(response.status, 200)
+        forwarded = self.upstream_requests[0]
+        self.assertEqual(forwarded['body'], body)
+        self.assertEqual(forwarded['headers']['Content-Length'], str(len(body)))
+        self.assertEqual(forwarded['headers']['Content-Type'], 'application/octet-stream')
+
+    def upload(self, size):
+        form = aiohttp.FormData()
+        form.add_field('audio', b'a' * size, filename='clip.wav', content_type='audio/wav')
+        return form
+
+    async def test_multipart_uploads_have_their_own_limit(self):
+        with patch.object(gateway, 'MAX_REQUEST_BYTES', 1024), patch.object(gateway, 'MAX_UPLOAD_BYTES', 4096):
+            async with self.client.post('/api/stt', data=self.upload(2048),
+                                        headers=self.bearer()) as response:
+                self.assertEqual(response.status, 200)
+            forwarded = self.upstream_requests[0]
+            self.assertTrue(forwarded['headers']['Content-Type'].startswith('multipart/form-data; boundary='))
+            self.assertIn(b'a' * 2048, forwarded['body'])
+
+            async with self.client.post('/api/stt', data=self.upload(8192),
+                                        headers=self.bearer()) as response:
+                self.assertEqual(response.status, 413)
+                self.assertIn('4096', (await response.json())['error'])
+        self.assertEqual(len(self.upstream_requests), 1)
+
+    async def send_expecting_continue(self, length):
+        """Send only the headers of a POST asking for 100-continue; returns what the gateway answers first"""
+        reader, writer = await asyncio.open_connection(self.server.host, self.server.port)
+        writer.write((f'POST /api/translate HTTP/1.1\r\nHost: {self.server.host}\r\n'
+                      f'Content-Type: application/json\r\nContent-Length: {length}\r\n'
+                      'Expect: 100-continue\r\n\r\n').encode())
+        await writer.drain()
+        return reader, writer, await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+
+    async def test_expect_continue_rejects_an_oversized_body_before_it_is_sent(self):
+        with patch.object(gateway, 'MAX_REQUEST_BYTES', 1024):
+            reader, writer, head = await self.send_expecting_continue(2048)
+            writer.close()
+        self.assertTrue(head.startswith(b'HTTP/1.1 413'), head)
+        self.assertEqual(self.upstream_requests, [])
+
+    async def test_expect_continue_accepts_a_body_under_the_limit(self):
+        body = b'{"text": "water"}'
+        reader, writer, head = await self.send_expecting_continue(len(body))
+        self.assertTrue(head.startswith(b'HTTP/1.1 100 Continue'), head)
+        writer.write(body)
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), 5)
+        writer.close()
+        self.assertTrue(status.startswith(b'HTTP/1.1 200'), status)
+        self.assertEqual(self.upstream_requests[0]['body'], body)
+
+
+def unused_url():
+    """URL of a local port nothing listens on, so connecting to it fails"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+class TestRetries(GatewayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        backoff = patch.object(gateway, 'UPSTREAM_RETRY_BACKOFF', 0)
+        backoff.start()
+        self.addCleanup(backoff.stop)
+
+    def count_attempts(self, service_url):
+        """Methods of every request the gateway starts to *service_url*, connected or not"""
+        attempts = []
+        send = aiohttp.ClientSession.request
+
+        async def request(session, method, url, **kwargs):
+            if str(url).startswith(service_url):
+                attempts.append(method)
+            return await send(session, method, url, **kwargs)
+
+        patcher = patch.object(aiohttp.ClientSession, 'request', request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return attempts
+
+    async def test_connect_errors_are_retried_for_any_method(self):
+        url = unused_url()
+        attempts = self.count_attempts(url)
+        with patch.dict(gateway.SERVICES['translator'], url=url):
+            async with self.client.post('/api/translate', json={'text': 'water'}) as response:
+                self.assertEqual(response.status, 503)
+        self.assertEqual(attempts, ['POST'] * (gateway.UPSTREAM_RETRIES + 1))
+
+    async def test_idempotent_methods_retry_read_errors_and_gateway_statuses(self):
+        for outcome in ('drop', 502, 503, 504):
+            for method in ('GET', 'PUT', 'DELETE'):
+                with self.subTest(outcome=outcome, method=method):
+                    self.upstream_requests.clear()
+                    self.upstream_outcomes[:] = [outcome]
+                    async with self.client.request(method, '/api/learn/lessons', data=b'{"a": 1}',
+                                                   headers=self.bearer()) as response:
+                        self.assertEqual(response.status, 200)
+                    self.assertEqual([r['method'] for r in self.upstream_requests], [method, method])
+                    if method == 'PUT':
+                        # The buffered body is sent again unchanged
+                        self.assertEqual(self.upstream_requests[1]['body'], b'{"a": 1}')
+
+    async def test_post_is_not_retried_after_a_read_error_or_gateway_status(self):
+        for outcome, status in (('drop', 503), (502, 502), (503, 503), (504, 504)):
+            with self.subTest(outcome=outcome):
+                self.upstream_requests.clear()
+                self.upstream_outcomes[:] = [outcome]
+                async with self.client.post('/api/translate', json={'text': 'water'}) as response:
+                    self.assertEqual(response.status, status)
+                self.assertEqual(len(self.upstream_requests), 1)
+
+    async def test_retries_stop_at_the_limit(self):
+        self.upstream_outcomes[:] = [503] * 10
+        async with self.client.get('/api/dictionary/all') as response:
+            self.assertEqual(response.status, 503)
+        self.assertEqual(len(self.upstream_requests), gateway.UPSTREAM_RETRIES + 1)
+
+    async def test_streamed_bodies_are_not_retried(self):
+        async def chunks():
+            for _ in range(4):
+                yield b'x' * 512
+
+        for outcome, status in (('drop', 503), (503, 503)):
+            with self.subTest(outcome=outcome):
+                self.upstream_requests.clear()
+                self.upstream_outcomes[:] = [outcome]
+                async with self.client.put('/api/learn/lessons', data=chunks(),
+                                           headers=self.bearer()) as response:
+                    self.assertEqual(response.status, status)
+                self.assertEqual(len(self.upstream_requests), 1)
+
+        url = unused_url()
+        attempts = self.count_attempts(url)
+        with patch.dict(gateway.SERVICES['learn'], url=url):
+            async with self.client.put('/api/learn/lessons', data=chunks(), headers=self.bearer()) as response:
+                self.assertEqual(response.status, 503)
+        self.assertEqual(attempts, ['PUT'])
+
+
+class TestPassthrough(GatewayTestCase):
+
+    async def test_gzip_is_relayed_still_encoded(self):
+        async with self.client.get('/api/dictionary/all', headers={'Accept-Encoding': 'gzip'},
+                                   auto_decompress=False) as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(await response.read()), DOCUMENT)
+        self.assertEqual(self.upstream_requests[0]['headers']['Accept-Encoding'], 'gzip')
+
+    async def test_identity_unless_the_client_accepts_gzip(self):
+        async with self.client.get('/api/dictionary/all', skip_auto_headers=['Accept-Encoding']) as response:
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual(await response.read(), DOCUMENT)
+        self.assertEqual(self.upstream_requests[0]['headers']['Accept-Encoding'], 'identity')
+
+    async def test_not_modified_is_relayed(self):
+        async with self.client.get('/api/dictionary/all', headers={'If-None-Match': ETAG}) as response:
+            self.assertEqual(response.status, 304)
+            self.assertEqual(response.headers['ETag'], ETAG)
+            self.assertEqual(await response.read(), b'')
+        self.assertEqual(self.upstream_requests[0]['headers']['If-None-Match'], ETAG)
+
+    async def test_head_is_forwarded_as_head(self):
+        async with self.client.head('/api/dictionary/all', skip_auto_headers=['Accept-Encoding']) as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers['ETag'], ETAG)
+            self.assertEqual(int(response.headers['Content-Length']), len(DOCUMENT))
+            self.assertEqual(await response.read(), b'')
+        self.assertEqual(self.upstream_requests[0]['method'], 'HEAD')
+
+    async def test_head_follows_the_get_auth_rules(self):
+        async with self.client.head('/api/artifacts') as response:
+            self.assertEqual(response.status, 200)
+        async with self.client.head('/api/learn/lessons') as response:
+            self.assertEqual(response.status, 401)
+
+    async def test_cors_headers_on_relayed_responses(self):
+        async with self.client.get('/api/dictionary/all', headers={'Origin': 'http://localhost:3000'}) as response:
+            self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+            self.assertIn('ETag', response.headers['Access-Control-Expose-Headers'])
+
+
+HANGING_SERVICES = ('dictionary', 'history')
+PROBE_TIMEOUT = 0.3
+
+
+class TestHealth(AioHTTPTestCase):
+    """Health monitoring with some services whose health checks never answer"""
+
+    async def get_application(self):
+        self.hung_probes = []
+        self.release = asyncio.Event()
+
+        async def hang(request):
+            self.hung_probes.append(request.path)
+            await self.release.wait()
+            return web.json_response({'status': 'healthy'})
+
+        hanging = web.Application()
+        hanging.router.add_get('/health', hang)
+        self.upstream = TestServer(create_upstream([], []))
+        self.hanging = TestServer(hanging)
+        for server in (self.upstream, self.hanging):
+            await server.start_server()
+        services = patch.dict(gateway.SERVICES, {
+            name: {'url': str((self.hanging if name in HANGING_SERVICES else self.upstream).make_url('')).rstrip('/'),
+                   'health': '/health'}
+            for name in gateway.SERVICES
+        })
+        services.start()
+        self.addCleanup(services.stop)
+        app = gateway.create_app()
+        self.monitor = app[gateway.HEALTH_MONITOR]
+        # Only the startup refresh runs in the background during a test
+        self.monitor.interval = 3600
+        self.monitor.timeout = PROBE_TIMEOUT
+        return app
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await super().asyncTearDown()
+        for server in (self.upstream, self.hanging):
+            await server.close()
+
+    async def test_health_answers_within_the_probe_timeout(self):
+        started = time.monotonic()
+        async with self.client.get('/health') as response:
+            self.assertEqual(response.status, 200)
+            report = await response.json()
+        self.assertLess(time.monotonic() - started, 2 * PROBE_TIMEOUT)
+        self.assertEqual(report['status'], 'degraded')
+        self.assertFalse(report['stale'])
+        for name, service in report['services'].items():
+            self.assertEqual(service['status'], 'unhealthy' if name in HANGING_SERVICES else 'healthy', name)
+        self.assertIn('error', report['services']['dictionary'])
+        self.assertIsNone(report['services']['dictionary']['last_healthy'])
+
+    async def test_services_are_probed_concurrently(self):
+        await self.monitor.refresh()
+        started = time.monotonic()
+        await self.monitor.refresh()
+        # One timeout for all the hanging services, not one each
+        self.assertLess(time.monotonic() - started, len(HANGING_SERVICES) * PROBE_TIMEOUT)
+
+    async def test_concurrent_callers_share_one_refresh(self):
+        await self.monitor.refresh()
+        probes = len(self.hung_probes)
+        # With no completed refresh, /health also waits on one and should join the same one
+        self.monitor.checked_at = None
+
+        async def health():
+            async with self.client.get('/health') as response:
+                return response.status
+
+        results = await asyncio.gather(self.monitor.refresh(), self.monitor.refresh(), health())
+        self.assertEqual(results[2], 200)
+        self.assertEqual(len(self.hung_probes) - probes, len(HANGING_SERVICES))
+
+    async def test_report_is_stale_when_refreshes_stop(self):
+        await self.monitor.refresh()
+        self.monitor.checked_at = datetime.utcnow() - timedelta(seconds=3 * self.monitor.interval)
+        started = time.monotonic()
+        async with self.client.get('/health') as response:
+            report = await response.json()
+        # Answered from the old results without probing again
+        self.assertLess(time.monotonic() - started, PROBE_TIMEOUT)
+        self.assertTrue(report['stale'])
+        self.assertGreater(report['age_seconds'], 2 * self.monitor.interval)
+
+    async def test_latency_summary(self):
+        await self.monitor.refresh()
+        history = self.monitor.history['translator']
+        history.clear()
+        checked_at = datetime.utcnow()
+        for n in range(1, 21):
+            history.append((checked_at, 'healthy', n / 100))
+        history.append((checked_at, 'unhealthy', None))
+        self.assertEqual(self.monitor.latency('translator'), {
+            'samples': 21, 'healthy_samples': 20,
+            'avg': 0.105, 'p50': 0.105, 'p95': 0.2, 'max': 0.2
+        })
+        self.assertEqual(self.monitor.latency('dictionary')['avg'], None)
+
+        async with self.client.get('/health', params={'history': '1'}) as response:
+            report = await response.json()
+        self.assertEqual(len(report['services']['translator']['history']), 21)
+        self.assertEqual(report['services']['translator']['latency']['samples'], 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
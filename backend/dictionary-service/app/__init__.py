@@ -11,8 +11,8 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # Enable CORS
-    CORS(app)
+    # Enable CORS (expose the snapshot version header to browser clients)
+    CORS(app, expose_headers=['X-Dictionary-Version'])
 
     # DB init
     init_mongo(app)
@@ -23,7 +23,15 @@ def create_app():
 
     # Initialize dictionary service on startup
     from app.services.dictionary_service import get_dictionary_service
+    from app.services.change_feed import start_change_feed
+    from app.services.shared_snapshot import start_shared_snapshot
     with app.app_context():
-        get_dictionary_service()
+        dictionary_service = get_dictionary_service()
+        # Publish to (coordinator) or follow (worker) the snapshot shared across processes
+        start_shared_snapshot(dictionary_service, app.config)
+        # Keep this replica in step with writes made through other replicas;
+        # workers get them from the coordinator instead
+        if app.config.get('DICTIONARY_SHARED_MODE') != 'worker':
+            start_change_feed(dictionary_service, app.config)
 
     return app
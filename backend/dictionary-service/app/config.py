@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,3 +12,25 @@ class Config:
     # MongoDB Configuration
     MONGODB_URI = os.getenv('MONGODB_URI')
     DATABASE_NAME = os.getenv('DATABASE_NAME')
+    
+    # On-disk dictionary snapshot used for fast cold starts (empty disables it)
+    DICTIONARY_SNAPSHOT_PATH = os.getenv('DICTIONARY_SNAPSHOT_PATH', 'snapshots/dictionary.snap')
+    
+    # Seconds clients may reuse /translate, /search and /types responses without revalidating
+    DICTIONARY_CACHE_MAX_AGE = int(os.getenv('DICTIONARY_CACHE_MAX_AGE', '0'))
+    
+    # Cross-replica change propagation: auto (change stream, else polling), change_stream, poll or off
+    DICTIONARY_SYNC_MODE = os.getenv('DICTIONARY_SYNC_MODE', 'auto')
+    DICTIONARY_SYNC_POLL_SECONDS = float(os.getenv('DICTIONARY_SYNC_POLL_SECONDS', '5'))
+    DICTIONARY_MAX_STALENESS_SECONDS = float(os.getenv('DICTIONARY_MAX_STALENESS_SECONDS', '30'))
+    DICTIONARY_FULL_RESYNC_SECONDS = float(os.getenv('DICTIONARY_FULL_RESYNC_SECONDS', '900'))
+    # Polls re-read writes this much older than the newest seen (concurrent writers, clock skew)
+    DICTIONARY_SYNC_OVERLAP_SECONDS = float(os.getenv('DICTIONARY_SYNC_OVERLAP_SECONDS', '60'))
+    
+    # Worker processes sharing one memory-mapped dictionary: off, coordinator or worker
+    DICTIONARY_SHARED_MODE = os.getenv('DICTIONARY_SHARED_MODE', 'off')
+    DICTIONARY_SHARED_DIR = os.getenv('DICTIONARY_SHARED_DIR', os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'vedda-dictionary'
+    ))
+    DICTIONARY_SHARED_POLL_SECONDS = float(os.getenv('DICTIONARY_SHARED_POLL_SECONDS', '1'))
+    DICTIONARY_SHARED_WAIT_SECONDS = float(os.getenv('DICTIONARY_SHARED_WAIT_SECONDS', '60'))
@@ -1,12 +1,75 @@
-from flask import Blueprint, request, jsonify
+import hashlib
+from functools import wraps
+
+from flask import Blueprint, current_app, request, jsonify, g, stream_with_context
+from app.services.dictionary_export import FORMATS, MSGPACK_AVAILABLE, encode_records
 from app.services.dictionary_service import get_dictionary_service
+from app.services.entry_store import ENTRY_FIELDS, LANGUAGES
 
 dictionary_bp = Blueprint('dictionary', __name__)
 
+VERSION_HEADER = 'X-Dictionary-Version'
+
+MAX_LOOKUP_BATCH = 1000
+
+
+@dictionary_bp.before_request
+def pin_snapshot():
+    """Pin one dictionary snapshot for the whole request"""
+    g.dictionary_snapshot = get_dictionary_service().snapshot()
+
+
+@dictionary_bp.after_request
+def add_version_header(response):
+    """Expose the snapshot version so clients can use it in cache keys"""
+    snapshot = g.get('dictionary_snapshot')
+    if snapshot is not None:
+        response.headers[VERSION_HEADER] = snapshot.tag
+    return response
+
+
+def _snapshot_etag():
+    """ETag for this request: the pinned snapshot version plus a digest of the path and query"""
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    digest = hashlib.blake2b(f'{request.path}?{query}'.encode('utf-8'), digest_size=8).hexdigest()
+    return f'{g.dictionary_snapshot.tag}-{digest}'
+
+
+def conditional(revalidate=False):
+    """Serve a read endpoint conditionally: snapshot ETag, 304 on If-None-Match, Cache-Control.
+    
+    ETags are weak because the body is only guaranteed to be equivalent: it is
+    rebuilt on every request and JSON key order or whitespace may differ. Routes with revalidate=True are always checked
+    with the server; the others may be reused for DICTIONARY_CACHE_MAX_AGE
+    seconds. Only for views whose body depends on nothing but the snapshot
+    and the query - a 304 skips the view entirely.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _snapshot_etag()
+            if request.if_none_match.contains_weak(etag):
+                # Unchanged snapshot and query - skip the work entirely
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            max_age = current_app.config.get('DICTIONARY_CACHE_MAX_AGE', 0)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = (
+                'no-cache' if revalidate or not max_age else f'public, max-age={max_age}'
+            )
+            return response
+        return wrapper
+    return decorator
+
 
 @dictionary_bp.route('/translate', methods=['GET'])
+@conditional()
 def translate_word():
-    """FAST O(1) word translation - uses LRU cache"""
+    """FAST O(1) word translation - one probe of the snapshot's word index"""
     try:
         dictionary_service = get_dictionary_service()
         word = request.args.get('word', '').strip()
@@ -21,8 +84,8 @@ def translate_word():
         if source not in valid_langs or target not in valid_langs:
             return jsonify({'error': f'source/target must be one of: {valid_langs}'}), 400
         
-        # Fast O(1) lookup with LRU cache
-        result = dictionary_service.fast_translate(word, source, target)
+        # Fast O(1) lookup in the pinned snapshot (not cached)
+        result = dictionary_service.fast_translate(word, source, target, g.dictionary_snapshot)
         
         if result:
             return jsonify({
@@ -63,11 +126,11 @@ def translate_batch():
         if source not in valid_langs or target not in valid_langs:
             return jsonify({'error': f'source/target must be one of: {valid_langs}'}), 400
         
-        # Batch translate - uses LRU cache for each word
+        # Batch translate - one snapshot probe per word
         results = []
         for word in words:
             word = word.strip()
-            result = dictionary_service.fast_translate(word, source, target)
+            result = dictionary_service.fast_translate(word, source, target, g.dictionary_snapshot)
             
             if result:
                 results.append({
@@ -92,7 +155,59 @@ def translate_batch():
         return jsonify({'error': str(e)}), 500
 
 
+@dictionary_bp.route('/lookup/batch', methods=['POST'])
+def lookup_batch():
+    """Full entries for many words in one call - per-item source language, optional field projection"""
+    try:
+        dictionary_service = get_dictionary_service()
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'request body must be a JSON object'}), 400
+        
+        items = data.get('items', data.get('words', []))
+        source = str(data.get('source', 'all')).lower()
+        target = data.get('target')
+        target = str(target).lower() if target else None
+        fields = data.get('fields')
+        
+        if not items or not isinstance(items, list):
+            return jsonify({'error': 'items (array of words or {word, source} objects) required'}), 400
+        if len(items) > MAX_LOOKUP_BATCH:
+            return jsonify({'error': f'at most {MAX_LOOKUP_BATCH} items per request'}), 400
+        
+        # Validate languages
+        valid_sources = list(LANGUAGES) + ['all']
+        item_sources = {str(item.get('source', source)).lower() for item in items if isinstance(item, dict)}
+        if not item_sources.union([source]) <= set(valid_sources):
+            return jsonify({'error': f'source must be one of: {valid_sources}'}), 400
+        if target is not None and target not in LANGUAGES:
+            return jsonify({'error': f'target must be one of: {list(LANGUAGES)}'}), 400
+        
+        if fields is not None:
+            if not isinstance(fields, list) or not fields:
+                return jsonify({'error': 'fields must be a non-empty array'}), 400
+            unknown = [name for name in fields if name not in ENTRY_FIELDS]
+            if unknown:
+                return jsonify({'error': f'unknown fields: {unknown}', 'valid_fields': list(ENTRY_FIELDS)}), 400
+        
+        items = [dict(item, source=str(item.get('source', source)).lower()) if isinstance(item, dict) else item
+                 for item in items]
+        results = dictionary_service.lookup_entries(items, source, target, fields, snapshot=g.dictionary_snapshot)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results),
+            'found_count': sum(1 for result in results if result['found']),
+            'version': g.dictionary_snapshot.tag
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @dictionary_bp.route('/search', methods=['GET'])
+@conditional()
 def search_dictionary():
     """Search dictionary endpoint"""
     try:
@@ -106,7 +221,7 @@ def search_dictionary():
             return jsonify({'error': 'Query parameter required'}), 400
         
         results = dictionary_service.search_dictionary(
-            query, source_language, target_language, limit
+            query, source_language, target_language, limit, snapshot=g.dictionary_snapshot
         )
         
         return jsonify({
@@ -161,7 +276,7 @@ def get_random_words():
         count = int(request.args.get('count', 10))
         word_type = request.args.get('type', None)
         
-        results = dictionary_service.get_random_words(count, word_type)
+        results = dictionary_service.get_random_words(count, word_type, snapshot=g.dictionary_snapshot)
         
         return jsonify({
             'success': True,
@@ -174,11 +289,12 @@ def get_random_words():
 
 
 @dictionary_bp.route('/types', methods=['GET'])
+@conditional()
 def get_word_types():
     """Get available word types"""
     try:
         dictionary_service = get_dictionary_service()
-        types = dictionary_service.get_word_types()
+        types = dictionary_service.get_word_types(g.dictionary_snapshot)
         return jsonify({
             'success': True,
             'word_types': types
@@ -188,14 +304,22 @@ def get_word_types():
 
 
 @dictionary_bp.route('/all', methods=['GET'])
+@conditional(revalidate=True)
 def get_all_words():
-    """Get all dictionary words with pagination"""
+    """Get all dictionary words with keyset (cursor) or offset pagination"""
     try:
         dictionary_service = get_dictionary_service()
-        limit = int(request.args.get('limit', 0))
-        offset = int(request.args.get('offset', 0))
+        try:
+            limit = int(request.args.get('limit', 0))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be integers'}), 400
+        cursor = request.args.get('cursor', '').strip() or None
         
-        result = dictionary_service.get_all_words(limit, offset)
+        if limit < 0 or offset < 0:
+            return jsonify({'error': 'limit and offset must not be negative'}), 400
+        
+        result = dictionary_service.get_all_words(limit, offset, cursor, snapshot=g.dictionary_snapshot)
         
         return jsonify({
             'success': True,
@@ -206,28 +330,75 @@ def get_all_words():
         return jsonify({'error': str(e)}), 500
 
 
+@dictionary_bp.route('/export', methods=['GET'])
+@conditional(revalidate=True)
+def export_dictionary():
+    """Stream the pinned snapshot as NDJSON or msgpack records; ?since=<version> sends only changes"""
+    try:
+        dictionary_service = get_dictionary_service()
+        fmt = request.args.get('format', 'ndjson').lower()
+        since = request.args.get('since', '').strip() or None
+        compression = request.args.get('compression', '').lower() or (
+            'gzip' if 'gzip' in request.headers.get('Accept-Encoding', '') else 'none')
+        
+        if fmt not in FORMATS:
+            return jsonify({'error': f'format must be one of: {", ".join(FORMATS)}'}), 400
+        if fmt == 'msgpack' and not MSGPACK_AVAILABLE:
+            return jsonify({'error': 'msgpack export is not available (msgpack is not installed)'}), 400
+        if compression not in ('gzip', 'none'):
+            return jsonify({'error': 'compression must be gzip or none'}), 400
+        
+        header, records = dictionary_service.export(since, snapshot=g.dictionary_snapshot)
+        body = encode_records(records, fmt, compress=compression == 'gzip')
+        response = current_app.response_class(stream_with_context(body), mimetype=FORMATS[fmt])
+        if compression == 'gzip':
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Export-Mode'] = header['mode']
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @dictionary_bp.route('/stats', methods=['GET'])
 def get_dictionary_stats():
-    """Get dictionary statistics including cache performance"""
+    """Get dictionary statistics including cache performance.
+    
+    Not conditional: cache counters and replication lag change between
+    requests on the same snapshot, and verify=true must always reach MongoDB.
+    """
     try:
         dictionary_service = get_dictionary_service()
-        stats = dictionary_service.get_statistics()
+        # verify=true cross-checks the in-memory counters against MongoDB
+        verify = request.args.get('verify', 'false').lower() == 'true'
+        stats = dictionary_service.get_statistics(g.dictionary_snapshot, verify=verify)
+        
+        stats['version'] = g.dictionary_snapshot.tag
+        stats['replication'] = dictionary_service.get_sync_info()
+        stats['shared_snapshot'] = dictionary_service.get_shared_info()
         
         # Add cache stats
         cache_info = dictionary_service.get_cache_info()
-        total_requests = cache_info['hits'] + cache_info['misses']
         stats['cache'] = {
             'hits': cache_info['hits'],
             'misses': cache_info['misses'],
             'size': cache_info['size'],
             'maxsize': cache_info['maxsize'],
-            'hit_rate': f"{(cache_info['hits'] / total_requests * 100):.2f}%" if total_requests > 0 else "0%"
+            'evictions': cache_info['evictions'],
+            'hit_rate': f"{cache_info['hit_rate'] * 100:.2f}%",
+            'caches': {
+                name: dict(info, hit_rate=f"{info['hit_rate'] * 100:.2f}%")
+                for name, info in cache_info['caches'].items()
+            }
         }
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'stats': stats
         })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -235,7 +406,7 @@ def get_dictionary_stats():
 
 @dictionary_bp.route('/cache/clear', methods=['POST'])
 def clear_cache():
-    """Clear the LRU translation cache"""
+    """Clear the search result cache"""
     try:
         dictionary_service = get_dictionary_service()
         dictionary_service.clear_cache()
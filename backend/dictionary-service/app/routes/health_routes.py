@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 from app.db.mongo import get_db, dictionary_collection
+from app.services.dictionary_service import get_dictionary_service
 
 health_bp = Blueprint('health', __name__)
 
@@ -18,7 +19,8 @@ def health_check():
             'status': 'healthy',
             'service': 'Dictionary Service (MongoDB)',
             'database': 'connected',
-            'word_count': word_count
+            'word_count': word_count,
+            'replication': get_dictionary_service().get_sync_info()
         })
     except Exception as e:
         return jsonify({
@@ -0,0 +1,311 @@
+"""
+Cross-replica propagation of dictionary changes.
+
+Each dictionary-service replica runs one DictionaryChangeFeed thread that
+applies writes made through any replica to its own in-memory snapshot,
+incrementally via ``DictionaryService.apply_changes``.  A MongoDB change
+stream is used when the deployment supports it (replica sets / Atlas);
+otherwise the feed polls the ``last_updated`` watermark and compares
+document counts to catch inserts and deletes.  Each poll re-reads an
+overlap window below the newest ``last_updated`` seen, so writes that
+commit out of timestamp order (concurrent writers, clock skew between
+replicas) are still picked up.
+
+Staleness is bounded: ``lag_seconds()`` is the time since this replica was
+last known to match MongoDB, and once it exceeds ``max_staleness`` the feed
+falls back to a full reload.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.db.mongo import dictionary_collection
+from app.services.dictionary_service import ENTRY_PROJECTION
+from app.services.entry_store import document_id
+
+logger = logging.getLogger(__name__)
+
+POLL_PROJECTION = {**ENTRY_PROJECTION, 'last_updated': 1}
+
+# Change stream events that invalidate the whole collection
+RELOAD_OPERATIONS = ('drop', 'rename', 'dropDatabase', 'invalidate')
+
+# Error codes for "change streams are not available on this deployment"
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324, 136)
+
+MAX_EVENT_BATCH = 500
+
+# Polls re-read documents updated this long before the newest one already seen
+WATERMARK_OVERLAP_SECONDS = 60.0
+
+
+class DictionaryChangeFeed:
+    """Background thread keeping one replica's dictionary snapshot current"""
+
+    def __init__(self, service, mode='auto', poll_interval=5.0, max_staleness=30.0,
+                 full_resync_interval=900.0, watermark_overlap=WATERMARK_OVERLAP_SECONDS):
+        self.service = service
+        self.mode = mode  # 'auto', 'change_stream' or 'poll'
+        self.active_mode = None
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.full_resync_interval = full_resync_interval
+        self.watermark_overlap = watermark_overlap
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._resume_token = None
+        self._watermark = None
+
+        self.last_sync = time.time()
+        self.last_full_resync = time.time()
+        self.last_change_lag = None
+        self.applied_changes = 0
+        self.full_resyncs = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dictionary-change-feed', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def wake(self):
+        """Poll now instead of at the end of the interval (after a write through this replica)"""
+        self._wake.set()
+
+    def lag_seconds(self) -> float:
+        """Seconds since this replica was last known to match MongoDB"""
+        return max(0.0, time.time() - self.last_sync)
+
+    def info(self):
+        lag = self.lag_seconds()
+        return {
+            'mode': self.active_mode or self.mode,
+            'replica_lag_seconds': round(lag, 3),
+            'max_staleness_seconds': self.max_staleness,
+            'stale': lag > self.max_staleness,
+            'last_change_lag_seconds': (round(self.last_change_lag, 3)
+                                        if self.last_change_lag is not None else None),
+            'applied_changes': self.applied_changes,
+            'full_resyncs': self.full_resyncs,
+            'errors': self.errors
+        }
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        self.ensure_indexes()
+        self._watermark = self._latest_watermark()
+        if self.mode in ('auto', 'change_stream'):
+            self._watch_loop()
+        if not self._stop.is_set():
+            self._poll_loop()
+
+    def _watch_loop(self):
+        """Follow the change stream, reconnecting with the resume token on transient errors"""
+        while not self._stop.is_set():
+            try:
+                self._watch()
+                return
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED and self.mode == 'auto':
+                    logger.info(f"Change streams unavailable ({e.code}), polling every {self.poll_interval}s")
+                    return
+                self._record_error('change stream', e)
+                self._resume_token = None
+            except PyMongoError as e:
+                self._record_error('change stream', e)
+            self._enforce_staleness()
+            self._stop.wait(self.poll_interval)
+
+    def _watch(self):
+        collection = dictionary_collection()
+        with collection.watch(full_document='updateLookup', resume_after=self._resume_token,
+                              max_await_time_ms=1000) as stream:
+            if self.active_mode != 'change_stream':
+                self.active_mode = 'change_stream'
+                # Catch anything written between the snapshot load and opening the stream
+                self.poll_once()
+            while not self._stop.is_set():
+                synced_at = time.time()
+                batch = []
+                change = stream.try_next()
+                while change is not None:
+                    batch.append(change)
+                    if len(batch) >= MAX_EVENT_BATCH:
+                        break
+                    change = stream.try_next()
+                if batch:
+                    self.apply_events(batch)
+                self._resume_token = stream.resume_token
+                self.last_sync = synced_at
+                self._enforce_staleness()
+
+    def _poll_loop(self):
+        self.active_mode = 'poll'
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except PyMongoError as e:
+                self._record_error('poll', e)
+            self._enforce_staleness()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # ------------------------------------------------------------------
+    # Applying changes
+    # ------------------------------------------------------------------
+
+    def apply_events(self, events):
+        """Fold a batch of change stream events into one incremental snapshot update"""
+        upserts = {}
+        deletes = set()
+        needs_reload = False
+        newest_write = None
+
+        for change in events:
+            operation = change.get('operationType')
+            if operation in RELOAD_OPERATIONS:
+                needs_reload = True
+                continue
+            if 'documentKey' not in change:
+                continue
+            entry_id = str(change['documentKey']['_id'])
+            document = change.get('fullDocument')
+            if operation in ('insert', 'update', 'replace') and document is not None:
+                upserts[entry_id] = document
+                deletes.discard(entry_id)
+            elif operation in ('insert', 'update', 'replace', 'delete'):
+                # Deleted (or gone before the lookup) - drop it
+                deletes.add(entry_id)
+                upserts.pop(entry_id, None)
+            cluster_time = change.get('clusterTime')
+            if cluster_time is not None:
+                newest_write = max(newest_write or 0, cluster_time.time)
+
+        if needs_reload:
+            self._full_resync('collection invalidated')
+            return
+        if upserts or deletes:
+            self.service.apply_changes(list(upserts.values()), list(deletes))
+            self.applied_changes += len(upserts) + len(deletes)
+        if newest_write is not None:
+            self.last_change_lag = max(0.0, time.time() - newest_write)
+
+    def _poll_query(self):
+        """Documents a poll must read: every one with a last_updated until the watermark is
+        seeded from them, then the overlap window below the watermark and everything after it"""
+        if self._watermark is None:
+            return {'last_updated': {'$exists': True}}
+        return {'last_updated': {'$gte': self._watermark - timedelta(seconds=self.watermark_overlap)}}
+
+    def poll_once(self):
+        """One watermark poll: upsert changed documents and reconcile inserts/deletes by count.
+
+        ``last_sync`` only moves once the poll has read every document
+        written since the previous one and its changes are applied; a
+        failed poll raises and leaves both it and the watermark behind.
+        """
+        started = time.time()
+        collection = dictionary_collection()
+        store = self.service.snapshot().store
+
+        watermark = self._watermark
+        upserts = {}
+        for doc in collection.find(self._poll_query(), POLL_PROJECTION):
+            last_updated = doc.get('last_updated')
+            if last_updated is not None and (watermark is None or last_updated > watermark):
+                watermark = last_updated
+            # Documents already matching the snapshot (most of the overlap window) are skipped
+            row = store.row_for_id(document_id(doc))
+            if row is None or not store.matches(row, doc):
+                upserts[document_id(doc)] = doc
+
+        # Inserts without last_updated and all deletes only show up in the count
+        deletes = []
+        new_ids = sum(1 for entry_id in upserts if store.row_for_id(entry_id) is None)
+        if collection.count_documents({}) != len(store) + new_ids:
+            raw_ids = {str(doc['_id']): doc['_id'] for doc in collection.find({}, {'_id': 1})}
+            deletes = [entry_id for entry_id in store.id_rows if entry_id not in raw_ids]
+            missing = [raw_id for entry_id, raw_id in raw_ids.items()
+                       if store.row_for_id(entry_id) is None and entry_id not in upserts]
+            if missing:
+                for doc in collection.find({'_id': {'$in': missing}}, ENTRY_PROJECTION):
+                    upserts[document_id(doc)] = doc
+
+        if upserts or deletes:
+            self.service.apply_changes(list(upserts.values()), deletes)
+            self.applied_changes += len(upserts) + len(deletes)
+            self.last_change_lag = time.time() - started
+        self._watermark = watermark
+        self.last_sync = started
+
+    def _full_resync(self, reason):
+        started = time.time()
+        logger.info(f"Full dictionary resync ({reason})")
+        if self.service.reload() is not None:
+            self.last_sync = started
+            self.last_full_resync = started
+            self.full_resyncs += 1
+
+    def _enforce_staleness(self):
+        if self.lag_seconds() > self.max_staleness:
+            self._full_resync(f'replica lag {self.lag_seconds():.0f}s exceeds {self.max_staleness:.0f}s')
+        elif (self.active_mode == 'poll' and self.full_resync_interval and
+              time.time() - self.last_full_resync > self.full_resync_interval):
+            # Safety net for writes that bypass last_updated without changing the count
+            self._full_resync('periodic')
+
+    def ensure_indexes(self):
+        """Index the watermark field so each poll is a range scan, not a collection scan"""
+        try:
+            dictionary_collection().create_index([('last_updated', ASCENDING)])
+        except PyMongoError as e:
+            self._record_error('index', e)
+
+    def _latest_watermark(self):
+        try:
+            latest = dictionary_collection().find_one(
+                {'last_updated': {'$exists': True}}, {'last_updated': 1}, sort=[('last_updated', -1)]
+            )
+            return latest.get('last_updated') if latest else None
+        except PyMongoError as e:
+            self._record_error('watermark', e)
+            return None
+
+    def _record_error(self, where, error):
+        self.errors += 1
+        logger.warning(f"Dictionary change feed {where} error: {error}")
+
+
+def start_change_feed(service, config):
+    """Start the change feed configured by DICTIONARY_SYNC_* settings (None when disabled)"""
+    mode = config.get('DICTIONARY_SYNC_MODE', 'auto')
+    if mode == 'off':
+        return None
+    feed = DictionaryChangeFeed(
+        service,
+        mode=mode,
+        poll_interval=config.get('DICTIONARY_SYNC_POLL_SECONDS', 5.0),
+        max_staleness=config.get('DICTIONARY_MAX_STALENESS_SECONDS', 30.0),
+        full_resync_interval=config.get('DICTIONARY_FULL_RESYNC_SECONDS', 900.0),
+        watermark_overlap=config.get('DICTIONARY_SYNC_OVERLAP_SECONDS', WATERMARK_OVERLAP_SECONDS)
+    )
+    service.change_feed = feed
+    return feed.start()
@@ -0,0 +1,234 @@
+"""
+Streaming export of a dictionary snapshot for other services' local replicas.
+
+An export is a stream of records: a ``header``, one ``upsert`` per entry
+(or, for a delta, per changed entry), ``delete`` records for removed ids
+and a closing ``end``.  Deltas come from the ChangeLog of ids touched by
+each published version; when the requested version is not covered (too
+old, or from another service instance) the export falls back to a full one.
+"""
+
+import json
+import logging
+import threading
+import zlib
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+from app.services.entry_store import ENTRY_FIELDS
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'msgpack': 'application/x-msgpack'
+}
+
+# Compress and flush roughly this much encoded output at a time
+CHUNK_SIZE = 64 * 1024
+
+# ChangeLog step whose ids are still being worked out
+PENDING = 'pending'
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_values(store) -> Dict[str, tuple]:
+    """Entry id -> tuple of every entry field"""
+    columns = getattr(store, 'columns', None)
+    if columns is not None:
+        return dict(zip(columns['id'], zip(*(columns[field] for field in ENTRY_FIELDS))))
+    ids, rows = store.id_order()
+    return {entry_id: tuple(store.entry(row).values()) for entry_id, row in zip(ids, rows)}
+
+
+def diff_stores(old, new) -> Tuple[Set[str], Set[str]]:
+    """Ids upserted and deleted between two stores (compares every entry)"""
+    old_values = _entry_values(old)
+    new_values = _entry_values(new)
+    upserted = {entry_id for entry_id, values in new_values.items() if old_values.get(entry_id) != values}
+    return upserted, old_values.keys() - new_values.keys()
+
+
+class ChangeLog:
+    """Ids changed by each recent version, so exports can send only what changed.
+    
+    Steps whose changes are not known up front (full reloads, re-attaching to a
+    shared snapshot) are recorded as pending and diffed on a background thread,
+    so publishing never waits for a whole-store comparison. Until the diff
+    lands, deltas across that step fall back to a full export.
+    """
+
+    def __init__(self, max_versions: int = 256):
+        self._entries = deque(maxlen=max_versions)
+        self._lock = threading.Lock()
+        # (entry, previous store, new store) waiting for the diff thread
+        self._pending = deque()
+        self._diff_thread = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self.diffs = 0
+        self.diff_errors = 0
+
+    @staticmethod
+    def _limit(changes, total: int):
+        """Frozen (upserted, deleted) ids, or None for a break when the step rewrote most of the *total* entries"""
+        if changes is None:
+            return None
+        upserted, deleted = frozenset(changes[0]), frozenset(changes[1])
+        if len(upserted) + len(deleted) > max(total // 2, 1000):
+            return None
+        return upserted, deleted
+
+    def record(self, previous, snapshot, changes: Optional[Tuple[Iterable[str], Iterable[str]]]):
+        """Record the (upserted, deleted) ids from *previous* to *snapshot*; None breaks the chain"""
+        changes = self._limit(changes, len(snapshot.store))
+        with self._lock:
+            self._entries.append([previous.instance, previous.version, snapshot.instance, snapshot.version, changes])
+
+    def record_diff(self, previous, snapshot):
+        """Record the step from *previous* to *snapshot* as pending and diff the stores off-thread"""
+        entry = [previous.instance, previous.version, snapshot.instance, snapshot.version, PENDING]
+        with self._lock:
+            self._entries.append(entry)
+            # Only the newest step waits; older ones become breaks so a burst of
+            # reloads does not keep a queue of whole stores alive
+            while self._pending:
+                skipped = self._pending.popleft()[0]
+                skipped[4] = None
+            self._pending.append((entry, previous.store, snapshot.store))
+            self._idle.clear()
+            if self._diff_thread is None:
+                self._diff_thread = threading.Thread(target=self._diff_loop, name='dictionary-changelog',
+                                                     daemon=True)
+                self._diff_thread.start()
+
+    def _diff_loop(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._diff_thread = None
+                    self._idle.set()
+                    return
+                entry, old, new = self._pending.popleft()
+            try:
+                changes = self._limit(diff_stores(old, new), len(new))
+                self.diffs += 1
+            except Exception as e:
+                logger.warning(f"Could not diff dictionary version {entry[2]}.{entry[3]}: {e}")
+                self.diff_errors += 1
+                changes = None
+            del old, new
+            with self._lock:
+                if entry[4] is PENDING:
+                    entry[4] = changes
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every pending diff has been recorded; False on timeout"""
+        return self._idle.wait(timeout)
+
+    def changes_since(self, instance: str, version: int, current) -> Optional[Tuple[Set[str], Set[str]]]:
+        """Upserted and deleted ids from *version* up to *current*, or None when not covered"""
+        if (instance, version) == (current.instance, current.version):
+            return set(), set()
+        with self._lock:
+            steps = {(entry[0], entry[1]): tuple(entry[2:]) for entry in self._entries}
+
+        upserted, deleted = set(), set()
+        position = (instance, version)
+        while position != (current.instance, current.version):
+            step = steps.pop(position, None)
+            if step is None or step[2] is None or step[2] is PENDING:
+                return None
+            step_upserted, step_deleted = step[2]
+            upserted.difference_update(step_deleted)
+            deleted.update(step_deleted)
+            deleted.difference_update(step_upserted)
+            upserted.update(step_upserted)
+            position = step[:2]
+        return upserted, deleted
+
+
+def parse_tag(tag: str) -> Optional[Tuple[str, int]]:
+    """Split an X-Dictionary-Version tag into (instance, version)"""
+    instance, _, version = (tag or '').rpartition('.')
+    if not instance or not version.isdigit():
+        return None
+    return instance, int(version)
+
+
+def export_records(snapshot, changelog: ChangeLog, since: Optional[str] = None,
+                   fields=ENTRY_FIELDS) -> Tuple[Dict, Iterator[Dict]]:
+    """Header and record stream for a full export, or a delta when *since* is covered"""
+    store = snapshot.store
+    changes = None
+    reason = None
+    if since:
+        parsed = parse_tag(since)
+        changes = changelog.changes_since(*parsed, snapshot) if parsed else None
+        if changes is None:
+            reason = 'since version not available, sending full export'
+
+    if changes is None:
+        ids, rows = store.id_order()
+        upsert_rows = rows
+        deleted = []
+    else:
+        upserted, deleted = changes
+        upsert_rows = sorted(row for row in map(store.row_for_id, upserted) if row is not None)
+        deleted = sorted(deleted)
+
+    header = {
+        'type': 'header',
+        'version': snapshot.tag,
+        'mode': 'full' if changes is None else 'delta',
+        'since': since if changes is not None else None,
+        'upserts': len(upsert_rows),
+        'deletes': len(deleted),
+        'total_words': len(store),
+        'fields': list(fields)
+    }
+    if reason:
+        header['reason'] = reason
+
+    def records():
+        yield header
+        for row in upsert_rows:
+            yield {'type': 'upsert', 'entry': store.entry(row, fields)}
+        for entry_id in deleted:
+            yield {'type': 'delete', 'id': entry_id}
+        yield {'type': 'end', 'version': snapshot.tag, 'upserts': len(upsert_rows), 'deletes': len(deleted)}
+
+    return header, records()
+
+
+def encode_records(records: Iterable[Dict], fmt: str = 'ndjson', compress: bool = True) -> Iterator[bytes]:
+    """Serialize records as NDJSON lines or concatenated msgpack objects, gzip-compressed in chunks"""
+    if fmt == 'msgpack':
+        packer = msgpack.Packer(use_bin_type=True)
+        encode = packer.pack
+    else:
+        encode = lambda record: (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for record in records:
+        data = encode(record)
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield chunk
+    chunk = b''.join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -1,7 +1,19 @@
+import bisect
+import itertools
 import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from bson import ObjectId
+from flask import current_app, has_app_context
 from app.db.mongo import get_db, dictionary_collection
+from app.services.dictionary_export import ChangeLog, export_records
+from app.services.entry_store import EntryStore, ENTRY_FIELDS, KEY_FIELDS, LANGUAGES, document_id
+from app.services.romanization import ROMANIZED_LANGUAGES, fold, is_romanized_query
+from app.services.snapshot_file import SnapshotFileError, load_snapshot, save_snapshot
 import pandas as pd
 from typing import Dict, List, Optional
 from collections import OrderedDict
@@ -12,213 +24,429 @@ logger = logging.getLogger(__name__)
 
 
 class LRUCache:
-    """Simple LRU cache implementation"""
+    """Simple thread-safe LRU cache implementation"""
     def __init__(self, maxsize=1000):
         self.cache = OrderedDict()
         self.maxsize = maxsize
         self.hits = 0
         self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
     
-    def get(self, key):
-        if key in self.cache:
-            self.hits += 1
-            self.cache.move_to_end(key)
-            return self.cache[key]
-        self.misses += 1
-        return None
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+            return default
     
     def put(self, key, value):
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        else:
-            self.cache[key] = value
-            if len(self.cache) > self.maxsize:
-                self.cache.popitem(last=False)
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            else:
+                self.cache[key] = value
+                if len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+                    self.evictions += 1
     
     def clear(self):
-        self.cache.clear()
-        self.hits = 0
-        self.misses = 0
+        with self._lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
     
     def info(self):
         return {
             'hits': self.hits,
             'misses': self.misses,
             'size': len(self.cache),
-            'maxsize': self.maxsize
+            'maxsize': self.maxsize,
+            'evictions': self.evictions
         }
 
 
+class ShardedLRUCache:
+    """LRU cache split into independently locked shards so request threads rarely contend"""
+    def __init__(self, maxsize=1000, shards=8):
+        shards = max(1, min(shards, maxsize))
+        self.shards = [LRUCache(maxsize=max(1, maxsize // shards)) for _ in range(shards)]
+        self.maxsize = sum(shard.maxsize for shard in self.shards)
+    
+    def _shard(self, key) -> LRUCache:
+        return self.shards[hash(key) % len(self.shards)]
+    
+    def get(self, key, default=None):
+        return self._shard(key).get(key, default)
+    
+    def put(self, key, value):
+        self._shard(key).put(key, value)
+    
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+    
+    def info(self):
+        totals = {'hits': 0, 'misses': 0, 'size': 0, 'evictions': 0}
+        for shard in self.shards:
+            shard_info = shard.info()
+            for name in totals:
+                totals[name] += shard_info[name]
+        requests = totals['hits'] + totals['misses']
+        totals['maxsize'] = self.maxsize
+        totals['shards'] = len(self.shards)
+        totals['hit_rate'] = round(totals['hits'] / requests, 4) if requests else 0.0
+        return totals
+
+
+# Fields read from MongoDB to build an EntryStore
+ENTRY_PROJECTION = {
+    '_id': 1,
+    'vedda_word': 1,
+    'english_word': 1,
+    'sinhala_word': 1,
+    'vedda_ipa': 1,
+    'sinhala_ipa': 1,
+    'english_ipa': 1,
+    'word_type': 1,
+    'usage_example': 1,
+    'frequency_score': 1,
+    'confidence_score': 1
+}
+
+
+@dataclass(frozen=True)
+class DictionarySnapshot:
+    """Immutable, versioned view of the dictionary and everything derived from it.
+
+    Readers pin one snapshot for a whole request; reloads build a new one
+    and publish it with a single reference assignment.
+    """
+    store: EntryStore
+    version: int
+    instance: str
+    built_at: float = field(default_factory=time.time)
+
+    @property
+    def tag(self) -> str:
+        """Opaque version string handed to clients for cache keys"""
+        return f"{self.instance}.{self.version}"
+
+
 class DictionaryService:
-    def __init__(self):
+    def __init__(self, store: Optional[EntryStore] = None, snapshot_path: Optional[str] = None):
+        start = time.perf_counter()
         self.db = get_db()
-        self.dictionary = self.load_dictionary()
-        self.translation_cache = LRUCache(maxsize=1000)
-        self._build_fast_indexes()
-        print(f"✅ Dictionary Service initialized - {len(self.dictionary['all_words'])} entries loaded")
+        self.instance_id = uuid.uuid4().hex[:8]
+        self.snapshot_path = snapshot_path
+        self._versions = itertools.count(1)
+        self._reload_lock = threading.Lock()
+        self._publish_lock = threading.RLock()
+        self.change_feed = None
+        self.shared = None
+        self.publish_hooks = [self._warm_romanized]
+        self._romanized_lock = threading.Lock()
+        self.changelog = ChangeLog()
+        self._reload_pending = False
+        self._reload_thread = None
+        self._snapshot = None
+        
+        # Result caches for work that is expensive to redo (exact lookups are plain
+        # dict probes on the snapshot and are never cached). Every key starts with the
+        # snapshot instance and version, so entries from older snapshots stop matching and age out
+        self.caches = {
+            'search': ShardedLRUCache(maxsize=1000)
+        }
+        
+        source = 'shared snapshot' if getattr(store, 'origin', None) else 'provided'
+        if store is None and snapshot_path:
+            store = self._load_snapshot_file()
+            if store is not None:
+                source = 'snapshot file'
+        if store is None:
+            store = self.load_dictionary()
+            source = 'MongoDB'
+        self.publish(store)
+        
+        if source == 'snapshot file':
+            # Serve from the file right away and reconcile with MongoDB in the background
+            self.request_reload()
+        elif source == 'MongoDB':
+            self._save_snapshot_file(self._snapshot)
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✅ Dictionary Service initialized - {len(self.store)} entries loaded from {source} in {elapsed:.0f}ms")
         print(f"✅ Fast indexes built - O(1) lookup enabled")
     
+    @property
+    def store(self) -> EntryStore:
+        return self._snapshot.store
+    
+    def snapshot(self) -> DictionarySnapshot:
+        """Return the current snapshot; callers should hold on to it for the whole request"""
+        return self._snapshot
+    
+    def publish(self, store: EntryStore, changes=None) -> DictionarySnapshot:
+        """Wrap a freshly built store in a new snapshot and swap it in atomically.
+        
+        ``changes`` is the (upserted ids, deleted ids) pair when the caller knows
+        it; otherwise the changelog works it out against the previous store in
+        the background.
+        """
+        # Stores mapped from a shared snapshot keep the coordinator's version
+        instance, version = getattr(store, 'origin', None) or (self.instance_id, next(self._versions))
+        snapshot = DictionarySnapshot(store=store, version=version, instance=instance)
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if previous is not None:
+            self._record_changes(previous, snapshot, changes)
+        for hook in self.publish_hooks:
+            hook(snapshot)
+        return snapshot
+    
+    def _record_changes(self, previous: DictionarySnapshot, snapshot: DictionarySnapshot, changes):
+        """Add one step to the export changelog; unknown changes are diffed off the publish path"""
+        if changes is None:
+            self.changelog.record_diff(previous, snapshot)
+        else:
+            self.changelog.record(previous, snapshot, changes)
+    
     def load_dictionary(self):
-        """Load dictionary from MongoDB with reverse lookup support - OPTIMIZED"""
+        """Load dictionary from MongoDB into a columnar EntryStore"""
         try:
-            dictionary = {
-                'vedda_to_english': {},
-                'english_to_vedda': {},
-                'vedda_to_sinhala': {},
-                'sinhala_to_vedda': {},
-                'english_to_sinhala': {},
-                'sinhala_to_english': {},
-                'all_words': [],
-                'word_map': {}  # Fast O(1) lookup by ID
-            }
-            
-            # Load all dictionary entries in one batch
-            cursor = dictionary_collection().find({}, {
-                '_id': 1,
-                'vedda_word': 1,
-                'english_word': 1,
-                'sinhala_word': 1,
-                'vedda_ipa': 1,
-                'sinhala_ipa': 1,
-                'english_ipa': 1,
-                'word_type': 1,
-                'usage_example': 1,
-                'frequency_score': 1,
-                'confidence_score': 1
-            })
-            
-            for doc in cursor:
-                vedda_word = doc.get('vedda_word', '').strip()
-                english_word = doc.get('english_word', '').strip()
-                sinhala_word = doc.get('sinhala_word', '').strip()
-                
-                # Create complete word entry
-                word_entry = {
-                    'id': str(doc['_id']),
-                    'vedda_word': vedda_word,
-                    'english_word': english_word,
-                    'sinhala_word': sinhala_word,
-                    'vedda_ipa': doc.get('vedda_ipa', ''),
-                    'sinhala_ipa': doc.get('sinhala_ipa', ''),
-                    'english_ipa': doc.get('english_ipa', ''),
-                    'word_type': doc.get('word_type', ''),
-                    'usage_example': doc.get('usage_example', ''),
-                    'frequency_score': doc.get('frequency_score', 1.0),
-                    'confidence_score': doc.get('confidence_score', 0.95)
-                }
-                
-                # Build fast lookup indexes (lowercase for case-insensitive search)
-                if vedda_word and english_word:
-                    vedda_lower = vedda_word.lower()
-                    english_lower = english_word.lower()
-                    dictionary['vedda_to_english'][vedda_lower] = word_entry
-                    dictionary['english_to_vedda'][english_lower] = word_entry
-                
-                if vedda_word and sinhala_word:
-                    vedda_lower = vedda_word.lower()
-                    sinhala_lower = sinhala_word.lower()
-                    dictionary['vedda_to_sinhala'][vedda_lower] = word_entry
-                    dictionary['sinhala_to_vedda'][sinhala_lower] = word_entry
-                
-                if english_word and sinhala_word:
-                    english_lower = english_word.lower()
-                    sinhala_lower = sinhala_word.lower()
-                    dictionary['english_to_sinhala'][english_lower] = word_entry
-                    dictionary['sinhala_to_english'][sinhala_lower] = word_entry
-                
-                dictionary['all_words'].append(word_entry)
-                dictionary['word_map'][str(doc['_id'])] = word_entry
-            
-            print(f"Loaded {len(dictionary['all_words'])} dictionary entries from MongoDB")
-            return dictionary
-            
+            return self._read_store()
         except Exception as e:
             print(f"❌ Error loading dictionary: {e}")
-            return {
-                'vedda_to_english': {},
-                'english_to_vedda': {},
-                'vedda_to_sinhala': {},
-                'sinhala_to_vedda': {},
-                'english_to_sinhala': {},
-                'sinhala_to_english': {},
-                'all_words': [],
-                'word_map': {}
-            }
+            return EntryStore()
     
-    def _build_fast_indexes(self):
-        """Build additional fast lookup indexes for common queries"""
-        self.word_type_index = {}
-        for word in self.dictionary['all_words']:
-            word_type = word.get('word_type', 'unknown')
-            if word_type not in self.word_type_index:
-                self.word_type_index[word_type] = []
-            self.word_type_index[word_type].append(word)
-    
-    def fast_translate(self, word: str, source_lang: str, target_lang: str) -> Optional[Dict]:
-        """Ultra-fast O(1) translation lookup with LRU cache"""
-        word_lower = word.lower().strip()
-        cache_key = f"{word_lower}:{source_lang}:{target_lang}"
-        
-        # Check cache first
-        cached_result = self.translation_cache.get(cache_key)
-        if cached_result is not None:
-            return cached_result
+    def _read_store(self):
+        """Full MongoDB scan into a new EntryStore (raises on failure)"""
+        # Load all dictionary entries in one batch
+        cursor = dictionary_collection().find({}, ENTRY_PROJECTION)
         
-        # Direct dictionary lookup based on language pair
-        lookup_key = f"{source_lang}_to_{target_lang}"
-        lookup_dict = self.dictionary.get(lookup_key, {})
-        
-        result = lookup_dict.get(word_lower, None)
-        
-        # Cache the result (even if None)
-        self.translation_cache.put(cache_key, result)
+        store = EntryStore.from_documents(cursor)
+        print(f"Loaded {len(store)} dictionary entries from MongoDB")
+        return store
+    
+    def reload(self):
+        """Rebuild from MongoDB and publish; keeps the current snapshot if the load fails"""
+        if self.shared is not None and self.shared.role == 'worker':
+            # Workers never scan MongoDB; the coordinator publishes and they re-attach
+            return self.shared.refresh()
+        try:
+            start = time.perf_counter()
+            # Incremental changes wait for the scan so none are published underneath it
+            with self._publish_lock:
+                snapshot = self.publish(self._read_store())
+            logger.info(f"Published dictionary snapshot {snapshot.tag} "
+                        f"({len(snapshot.store)} entries, {(time.perf_counter() - start) * 1000:.0f}ms)")
+        except Exception as e:
+            logger.error(f"Dictionary reload failed, keeping snapshot {self._snapshot.tag}: {e}")
+            return None
+        self._save_snapshot_file(snapshot)
+        return snapshot
+    
+    def apply_changes(self, upserts: List[dict], deleted_ids: List[str]) -> DictionarySnapshot:
+        """Apply changed documents and deletions on top of the current snapshot and publish"""
+        upserts, deleted_ids = list(upserts), list(deleted_ids)
+        with self._publish_lock:
+            store = self._snapshot.store.with_changes(upserts, deleted_ids)
+            changes = ({document_id(doc) for doc in upserts}, {str(entry_id) for entry_id in deleted_ids})
+            snapshot = self.publish(store, changes)
+        logger.info(f"Applied {len(upserts)} upserts and {len(deleted_ids)} deletes "
+                    f"as dictionary snapshot {snapshot.tag}")
+        return snapshot
+    
+    def _load_snapshot_file(self) -> Optional[EntryStore]:
+        """Load the on-disk snapshot, or None when it is missing or unreadable"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            start = time.perf_counter()
+            store, header = load_snapshot(self.snapshot_path)
+            age = time.time() - header.get('created_at', time.time())
+            logger.info(f"Loaded dictionary snapshot file {self.snapshot_path} "
+                        f"({len(store)} entries, {age:.0f}s old) in {(time.perf_counter() - start) * 1000:.1f}ms")
+            return store
+        except SnapshotFileError as e:
+            logger.warning(f"Ignoring dictionary snapshot file: {e}")
+            return None
+    
+    def _save_snapshot_file(self, snapshot: DictionarySnapshot):
+        """Persist a snapshot for the next cold start (best effort)"""
+        if not self.snapshot_path or len(snapshot.store) == 0:
+            return
+        try:
+            start = time.perf_counter()
+            save_snapshot(snapshot.store, self.snapshot_path, snapshot.tag)
+            logger.info(f"Saved dictionary snapshot file {self.snapshot_path} "
+                        f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+        except OSError as e:
+            logger.warning(f"Could not save dictionary snapshot file: {e}")
+    
+    def request_reload(self):
+        """Schedule a rebuild on the background reload thread (coalesces bursts of writes)"""
+        with self._reload_lock:
+            self._reload_pending = True
+            if self._reload_thread is None:
+                self._reload_thread = threading.Thread(
+                    target=self._reload_loop, name='dictionary-reload', daemon=True
+                )
+                self._reload_thread.start()
+    
+    def _after_write(self):
+        """Bring this replica up to date after a write made through it"""
+        if self.change_feed is not None and self.change_feed.is_running():
+            # The feed applies the change incrementally; a full rescan would only repeat its work
+            self.change_feed.wake()
+        else:
+            # Rebuild the snapshot off the request path
+            self.request_reload()
+    
+    def _reload_loop(self):
+        while True:
+            with self._reload_lock:
+                if not self._reload_pending:
+                    self._reload_thread = None
+                    return
+                self._reload_pending = False
+            self.reload()
+    
+    def _warm_romanized(self, snapshot: DictionarySnapshot):
+        """Publish hook: build the romanized search indexes off the request path"""
+        threading.Thread(target=self._build_romanized, name='dictionary-romanized', daemon=True).start()
+    
+    def _build_romanized(self):
+        # Bursts of publishes queue up here; each one builds only the latest store
+        with self._romanized_lock:
+            store = self._snapshot.store
+            for lang in ROMANIZED_LANGUAGES:
+                store.romanized(lang)
+    
+    def fast_translate(self, word: str, source_lang: str, target_lang: str,
+                       snapshot: Optional[DictionarySnapshot] = None) -> Optional[Dict]:
+        """Ultra-fast O(1) translation lookup straight from the snapshot maps"""
+        snapshot = snapshot or self._snapshot
+        row = self._lookup_row(snapshot, word.lower().strip(), source_lang, target_lang)
+        return snapshot.store.entry(row) if row is not None else None
+    
+    def _lookup_row(self, snapshot: DictionarySnapshot, word_lower: str, source_lang: str,
+                    target_lang: Optional[str] = None) -> Optional[int]:
+        """Row for a normalized word; without a target any pairing matches"""
+        # Direct row lookup based on language pair
+        if target_lang is None:
+            return snapshot.store.find(source_lang, word_lower)
+        return snapshot.store.lookup(source_lang, target_lang, word_lower)
+    
+    def lookup_entries(self, items: List, source_lang: str = 'all', target_lang: Optional[str] = None,
+                       fields: Optional[List[str]] = None,
+                       snapshot: Optional[DictionarySnapshot] = None) -> List[Dict]:
+        """Resolve many words to full entries in one pass through the O(1) maps.
         
-        return result
+        Items are plain words or ``{'word': ..., 'source': ...}`` dicts; a source
+        of 'all' tries Vedda, then Sinhala, then English.
+        """
+        snapshot = snapshot or self._snapshot
+        fields = fields or ENTRY_FIELDS
+        results = []
+        for item in items:
+            if isinstance(item, dict):
+                word = str(item.get('word', ''))
+                source = item.get('source', source_lang) or source_lang
+            else:
+                word, source = str(item), source_lang
+            word = word.strip()
+            word_lower = word.lower()
+            
+            row = None
+            matched_source = None
+            for candidate in (('vedda', 'sinhala', 'english') if source == 'all' else (source,)):
+                if candidate == target_lang:
+                    continue
+                row = self._lookup_row(snapshot, word_lower, candidate, target_lang)
+                if row is not None:
+                    matched_source = candidate
+                    break
+            
+            results.append({
+                'word': word,
+                'source': matched_source or source,
+                'found': row is not None,
+                'entry': snapshot.store.entry(row, fields) if row is not None else None
+            })
+        return results
     
-    def search_dictionary(self, query, source_language='all', target_language='all', limit=50):
-        """OPTIMIZED: Memory-based search with fast filtering"""
+    def search_dictionary(self, query, source_language='all', target_language='all', limit=50,
+                          snapshot: Optional[DictionarySnapshot] = None):
+        """OPTIMIZED: Columnar scan over pre-lowercased key columns, plus romanized keys for Latin queries"""
         try:
+            snapshot = snapshot or self._snapshot
+            store = snapshot.store
             query_lower = query.lower().strip()
-            results = []
             
             # Fast exact match first (O(1) lookup)
             if source_language != 'all':
-                exact_match = self.fast_translate(query, source_language, target_language)
+                exact_match = self.fast_translate(query, source_language, target_language, snapshot)
                 if exact_match:
                     return [exact_match]
             
-            # Fast filtering using in-memory dictionary
-            if source_language == 'vedda':
-                results = [entry for entry in self.dictionary['all_words']
-                          if query_lower in entry['vedda_word'].lower()]
-            elif source_language == 'english':
-                results = [entry for entry in self.dictionary['all_words']
-                          if query_lower in entry['english_word'].lower()]
-            elif source_language == 'sinhala':
-                results = [entry for entry in self.dictionary['all_words']
-                          if query_lower in entry['sinhala_word'].lower()]
+            cache_key = (snapshot.instance, snapshot.version, query_lower, source_language, limit)
+            rows = self.caches['search'].get(cache_key)
+            if rows is not None:
+                return store.entries(rows)
+            
+            if source_language in LANGUAGES:
+                rows = store.scan(query_lower, [f'{source_language}_word'])
             else:
                 # Search all languages
-                results = [entry for entry in self.dictionary['all_words']
-                          if (query_lower in entry['vedda_word'].lower() or
-                              query_lower in entry['english_word'].lower() or
-                              query_lower in entry['sinhala_word'].lower() or
-                              query_lower in entry.get('usage_example', '').lower())]
+                rows = store.scan(query_lower, KEY_FIELDS)
             
             # Sort by relevance (exact match first, then by frequency)
-            results.sort(key=lambda x: (
-                not (x['vedda_word'].lower() == query_lower or
-                     x['english_word'].lower() == query_lower or
-                     x['sinhala_word'].lower() == query_lower),
-                -x['frequency_score']
+            rows.sort(key=lambda row: (
+                not store.is_exact(row, query_lower),
+                -store.frequency(row)
             ))
             
-            return results[:limit]
+            if is_romanized_query(query_lower):
+                rows = self._merge_romanized(store, query_lower, source_language, rows, limit)
+            
+            rows = tuple(rows[:limit])
+            self.caches['search'].put(cache_key, rows)
+            return store.entries(rows)
             
         except Exception as e:
             print(f"❌ Search error: {e}")
             return []
     
+    def _merge_romanized(self, store, query_lower, source_language, rows, limit):
+        """Add Vedda/Sinhala words whose romanization matches a Latin-script query.
+        
+        Exact romanized matches rank with exact matches, prefix matches after
+        the substring results; fuzzy matches are only tried when nothing else matched.
+        """
+        languages = [lang for lang in ROMANIZED_LANGUAGES if source_language in ('all', lang)]
+        key = fold(query_lower)
+        if not languages or not key:
+            return rows
+        
+        exact, prefix = [], []
+        for lang in languages:
+            index = store.romanized(lang)
+            exact.extend(index.exact(key))
+            prefix.extend(index.prefix(key, limit))
+        exact.sort(key=lambda row: -store.frequency(row))
+        
+        first_inexact = next((i for i, row in enumerate(rows) if not store.is_exact(row, query_lower)), len(rows))
+        merged = rows[:first_inexact] + exact + rows[first_inexact:] + prefix
+        if not merged and len(key) >= 3:
+            max_distance = 1 if len(key) <= 5 else 2
+            for lang in languages:
+                merged.extend(store.romanized(lang).fuzzy(key, max_distance, limit))
+        return list(dict.fromkeys(merged))
+    
     def add_word(self, vedda_word, english_word, sinhala_word='', vedda_ipa='', 
                 sinhala_ipa='', english_ipa='', word_type='', usage_example=''):
         """Add new word to dictionary"""
@@ -253,8 +481,7 @@ class DictionaryService:
             
             result = dictionary_collection().insert_one(word_doc)
             
-            # Reload dictionary
-            self.dictionary = self.load_dictionary()
+            self._after_write()
             
             return {
                 'success': True,
@@ -266,110 +493,142 @@ class DictionaryService:
             print(f"❌ Error adding word: {e}")
             return {'success': False, 'error': str(e)}
     
-    def get_random_words(self, count=10, word_type=None):
+    def get_random_words(self, count=10, word_type=None, snapshot: Optional[DictionarySnapshot] = None):
         """OPTIMIZED: Get random words using in-memory data"""
         try:
             import random
             
+            store = (snapshot or self._snapshot).store
             if word_type:
                 # Use pre-built index
-                words = self.word_type_index.get(word_type, [])
+                rows = store.type_rows.get(word_type, [])
             else:
-                words = self.dictionary['all_words']
+                rows = range(len(store))
             
-            if not words:
+            if not rows:
                 return []
             
             # Fast random sampling
-            sample_size = min(count, len(words))
-            return random.sample(words, sample_size)
+            sample_size = min(count, len(rows))
+            return store.entries(random.sample(rows, sample_size))
             
         except Exception as e:
             print(f"❌ Error getting random words: {e}")
             return []
     
     def clear_cache(self):
-        """Clear LRU cache for fast_translate"""
-        self.translation_cache.clear()
-        print("✅ Translation cache cleared")
+        """Clear the search result cache"""
+        for cache in self.caches.values():
+            cache.clear()
+        print("✅ Search cache cleared")
     
     def get_cache_info(self):
-        """Get cache statistics"""
-        return self.translation_cache.info()
+        """Get cache statistics: totals plus hit rate and evictions for each cache"""
+        caches = {name: cache.info() for name, cache in self.caches.items()}
+        totals = {name: sum(info[name] for info in caches.values())
+                  for name in ('hits', 'misses', 'size', 'maxsize', 'evictions')}
+        requests = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / requests, 4) if requests else 0.0
+        totals['caches'] = caches
+        return totals
+    
+    def get_sync_info(self):
+        """Replication status of this replica (None when the change feed is disabled)"""
+        return self.change_feed.info() if self.change_feed is not None else None
     
-    def get_word_types(self):
-        """Get all available word types"""
+    def get_shared_info(self):
+        """Shared snapshot role and state (None when workers do not share a snapshot)"""
+        return self.shared.info() if self.shared is not None else None
+    
+    def export(self, since: Optional[str] = None, snapshot: Optional[DictionarySnapshot] = None):
+        """Header and record stream of the snapshot, as a delta from *since* when possible"""
+        return export_records(snapshot or self._snapshot, self.changelog, since)
+    
+    def get_word_types(self, snapshot: Optional[DictionarySnapshot] = None):
+        """Get all available word types (from the snapshot, so they match its version)"""
         try:
-            word_types = dictionary_collection().distinct('word_type')
-            return [wt for wt in word_types if wt and wt.strip()]
+            word_types = (snapshot or self._snapshot).store.type_rows
+            return sorted(wt for wt, rows in word_types.items() if wt and wt.strip() and len(rows))
         except Exception as e:
             print(f"❌ Error getting word types: {e}")
             return []
     
-    def get_all_words(self, limit=0, offset=0):
-        """Get all dictionary words with pagination"""
+    def get_all_words(self, limit=0, offset=0, cursor=None, snapshot: Optional[DictionarySnapshot] = None):
+        """Page through all words in id order from the in-memory snapshot.
+        
+        ``cursor`` is the last id of the previous page (keyset pagination), so
+        deep pages cost the same as the first; ``offset`` is still accepted.
+        """
         try:
-            if limit > 0:
-                cursor = dictionary_collection().find({}).skip(offset).limit(limit)
-            else:
-                cursor = dictionary_collection().find({}).skip(offset)
-            results = []
-            
-            for doc in cursor:
-                results.append({
-                    'id': str(doc['_id']),
-                    'vedda_word': doc.get('vedda_word', ''),
-                    'sinhala_word': doc.get('sinhala_word', ''),
-                    'english_word': doc.get('english_word', ''),
-                    'vedda_ipa': doc.get('vedda_ipa', ''),
-                    'sinhala_ipa': doc.get('sinhala_ipa', ''),
-                    'english_ipa': doc.get('english_ipa', ''),
-                    'word_type': doc.get('word_type', ''),
-                    'usage_example': doc.get('usage_example', ''),
-                    'confidence_score': doc.get('confidence_score', 0.95),
-                    'frequency_score': doc.get('frequency_score', 1.0)
-                })
-            
-            total_count = dictionary_collection().count_documents({})
+            store = (snapshot or self._snapshot).store
+            ids, rows = store.id_order()
+            
+            start = bisect.bisect_right(ids, cursor) if cursor else max(offset, 0)
+            end = min(start + limit, len(ids)) if limit > 0 else len(ids)
+            results = store.entries(rows[start:end])
             
             return {
                 'results': results,
                 'count': len(results),
-                'total_count': total_count,
+                'total_count': len(store),
                 'limit': limit,
-                'offset': offset
+                'offset': start,
+                'next_cursor': ids[end - 1] if results and end < len(ids) else None
             }
             
         except Exception as e:
             print(f"❌ Error getting all words: {e}")
             return {'results': [], 'count': 0, 'total_count': 0}
     
-    def get_statistics(self):
-        """Get dictionary statistics"""
+    def get_statistics(self, snapshot: Optional[DictionarySnapshot] = None, verify=False):
+        """Get dictionary statistics from the counters kept with the in-memory indexes"""
         try:
-            total_words = dictionary_collection().count_documents({})
-            word_types = len(self.get_word_types())
-            
-            # Word type breakdown
-            pipeline = [
-                {'$group': {'_id': '$word_type', 'count': {'$sum': 1}}},
-                {'$sort': {'count': -1}}
-            ]
-            type_breakdown = list(dictionary_collection().aggregate(pipeline))
-            
-            return {
-                'total_words': total_words,
-                'word_types': word_types,
-                'type_breakdown': [
-                    {'type': item['_id'], 'count': item['count']} 
-                    for item in type_breakdown if item['_id']
-                ]
-            }
+            snapshot = snapshot or self._snapshot
+            stats = snapshot.store.statistics()
+            if verify:
+                try:
+                    stats['verification'] = self.verify_statistics(stats)
+                except Exception as e:
+                    stats['verification'] = {'consistent': None, 'error': str(e)}
+            return stats
             
         except Exception as e:
             print(f"❌ Error getting statistics: {e}")
             return {}
     
+    def verify_statistics(self, stats: Dict) -> Dict:
+        """Recompute the statistics in MongoDB and report where the snapshot differs"""
+        total_words = dictionary_collection().count_documents({})
+        pipeline = [
+            {'$group': {'_id': '$word_type', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1}}
+        ]
+        type_counts = {
+            item['_id']: item['count']
+            for item in dictionary_collection().aggregate(pipeline)
+            if isinstance(item['_id'], str) and item['_id'].strip()
+        }
+        ipa_counts = {
+            lang: dictionary_collection().count_documents({f'{lang}_ipa': {'$exists': True, '$nin': ['', None]}})
+            for lang in LANGUAGES
+        }
+        
+        differences = []
+        if total_words != stats['total_words']:
+            differences.append({'field': 'total_words', 'snapshot': stats['total_words'], 'mongo': total_words})
+        snapshot_types = {item['type']: item['count'] for item in stats['type_breakdown']}
+        for word_type in sorted(set(snapshot_types) | set(type_counts)):
+            if snapshot_types.get(word_type, 0) != type_counts.get(word_type, 0):
+                differences.append({'field': f'type_breakdown.{word_type}',
+                                    'snapshot': snapshot_types.get(word_type, 0),
+                                    'mongo': type_counts.get(word_type, 0)})
+        for lang, count in ipa_counts.items():
+            if stats['ipa_coverage'][lang]['count'] != count:
+                differences.append({'field': f'ipa_coverage.{lang}',
+                                    'snapshot': stats['ipa_coverage'][lang]['count'], 'mongo': count})
+        
+        return {'consistent': not differences, 'differences': differences}
+    
     def update_word(self, word_id, update_data):
         """Update a dictionary word"""
         try:
@@ -401,8 +660,7 @@ class DictionaryService:
             if result.matched_count == 0:
                 return {'success': False, 'error': 'Word not found'}
             
-            # Reload dictionary
-            self.dictionary = self.load_dictionary()
+            self._after_write()
             
             return {
                 'success': True,
@@ -428,8 +686,7 @@ class DictionaryService:
             if result.deleted_count == 0:
                 return {'success': False, 'error': 'Word not found'}
             
-            # Reload dictionary
-            self.dictionary = self.load_dictionary()
+            self._after_write()
             
             return {
                 'success': True,
@@ -555,8 +812,7 @@ class DictionaryService:
                 except Exception as e:
                     errors.append(f"Row {row_num}: {str(e)}")
             
-            # Reload dictionary
-            self.dictionary = self.load_dictionary()
+            self._after_write()
             
             return {
                 'success': True,
@@ -578,5 +834,16 @@ def get_dictionary_service():
     """Get dictionary service instance"""
     global _dictionary_service
     if _dictionary_service is None:
-        _dictionary_service = DictionaryService()
+        config = current_app.config if has_app_context() else {}
+        store = None
+        snapshot_path = config.get('DICTIONARY_SNAPSHOT_PATH')
+        if config.get('DICTIONARY_SHARED_MODE') == 'worker':
+            # Attach to the coordinator's snapshot instead of building a private copy
+            from app.services.shared_snapshot import attach_shared_snapshot
+            store = attach_shared_snapshot(config.get('DICTIONARY_SHARED_DIR'),
+                                           config.get('DICTIONARY_SHARED_WAIT_SECONDS', 60.0))
+            if store is None:
+                logger.warning("No shared dictionary snapshot yet, loading a private copy")
+            snapshot_path = None
+        _dictionary_service = DictionaryService(store=store, snapshot_path=snapshot_path)
     return _dictionary_service
@@ -0,0 +1,391 @@
+"""
+Compact columnar storage for the in-memory dictionary.
+
+Every entry field lives in its own column (a list of strings, with
+categorical values interned, or an ``array('d')`` for the scores) and all
+lookup maps hold integer row ids instead of per-entry dicts.  Lower-cased key columns are computed once at
+load time so searches never re-lowercase strings.  Entry dicts are only
+rebuilt by ``entry()`` when a row is serialized for a response.
+"""
+
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.romanization import RomanizedIndex
+
+LANGUAGES = ('vedda', 'english', 'sinhala')
+
+# Fields returned for every entry, in the order they are serialized
+STRING_FIELDS = (
+    'id', 'vedda_word', 'english_word', 'sinhala_word',
+    'vedda_ipa', 'sinhala_ipa', 'english_ipa',
+    'word_type', 'usage_example'
+)
+SCORE_FIELDS = ('frequency_score', 'confidence_score')
+SCORE_DEFAULTS = {'frequency_score': 1.0, 'confidence_score': 0.95}
+ENTRY_FIELDS = STRING_FIELDS + SCORE_FIELDS
+
+# Fields that get a pre-lowercased companion column for searching
+KEY_FIELDS = ('vedda_word', 'english_word', 'sinhala_word', 'usage_example')
+
+# Fields stripped of surrounding whitespace when loaded
+STRIPPED_FIELDS = ('vedda_word', 'english_word', 'sinhala_word')
+
+# Low-cardinality fields whose values are shared through sys.intern
+INTERNED_FIELDS = ('word_type',)
+
+
+# (source language, the two other languages) for building lookup maps
+PAIR_TARGETS = tuple(
+    (source, tuple(lang for lang in LANGUAGES if lang != source)) for source in LANGUAGES
+)
+PAIR_TARGET_MAP = dict(PAIR_TARGETS)
+
+
+def _text(value, interned: bool = False) -> str:
+    """Coerce a stored value to a string, interning low-cardinality values"""
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        value = str(value)
+    return sys.intern(value) if interned else value
+
+
+def _lower(value: str) -> str:
+    """Lower-case a string, reusing the original object when unchanged"""
+    lowered = value.lower()
+    return value if lowered == value else lowered
+
+
+def _score(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def document_id(doc: dict) -> str:
+    """Entry id of a MongoDB document (``_id``) or serialized entry (``id``)"""
+    return _text(doc['_id'] if '_id' in doc else doc.get('id', ''))
+
+
+def _rows_to_map(key_column: List[str], rows: Sequence[int]) -> Dict[str, int]:
+    rows = list(rows)
+    return dict(zip(map(key_column.__getitem__, rows), rows))
+
+
+def lookup_name(source_lang: str, target_lang: str) -> str:
+    return f"{source_lang}_to_{target_lang}"
+
+
+class EntryStore:
+    """Columnar dictionary entries with integer-row lookup maps"""
+
+    def __init__(self):
+        self.columns: Dict[str, list] = {field: [] for field in STRING_FIELDS}
+        for field in SCORE_FIELDS:
+            self.columns[field] = array('d')
+        self.keys: Dict[str, List[str]] = {field: [] for field in KEY_FIELDS}
+
+        # One map per source language: {lowercase word: row}.  A pair lookup
+        # uses the row when it has the target word, otherwise the (rare)
+        # per-pair fallback recorded when a newer row shadowed an older one.
+        self.maps: Dict[str, Dict[str, int]] = {lang: {} for lang in LANGUAGES}
+        self.fallbacks: Dict[str, Dict[str, int]] = {
+            lookup_name(source, target): {}
+            for source in LANGUAGES for target in LANGUAGES if source != target
+        }
+        self.id_rows: Dict[str, int] = {}
+        self.type_rows: Dict[str, List[int]] = {}
+        # Entries with a non-empty IPA per language, kept current as rows change
+        self.ipa_counts: Dict[str, int] = {lang: 0 for lang in LANGUAGES}
+        self._id_order: Optional[Tuple[List[str], List[int]]] = None
+        self._romanized: Dict[str, RomanizedIndex] = {}
+        self._romanized_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[dict]) -> 'EntryStore':
+        """Build a store from MongoDB dictionary documents"""
+        store = cls()
+        for doc in documents:
+            store.append(doc)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list], keys: Dict[str, List[str]],
+                     map_rows: Dict[str, Sequence[int]],
+                     fallback_rows: Dict[str, Sequence[int]],
+                     type_rows: Optional[Dict[str, List[int]]] = None) -> 'EntryStore':
+        """Rebuild a store from serialized columns and the rows held by each lookup map.
+
+        A map's keys are always the key column value at the row it points to,
+        so the row ids alone are enough to restore it without re-indexing.
+        """
+        store = cls()
+        store.columns = columns
+        store.keys = keys
+        for lang, rows in map_rows.items():
+            store.maps[lang] = _rows_to_map(keys[f'{lang}_word'], rows)
+        for name, rows in fallback_rows.items():
+            store.fallbacks[name] = _rows_to_map(keys[f"{name.split('_to_')[0]}_word"], rows)
+        store.id_rows = dict(zip(columns['id'], range(len(columns['id']))))
+        if type_rows is None:
+            for row, word_type in enumerate(columns['word_type']):
+                store.type_rows.setdefault(word_type, []).append(row)
+        else:
+            store.type_rows = type_rows
+        store.ipa_counts = {lang: sum(map(bool, columns[f'{lang}_ipa'])) for lang in LANGUAGES}
+        return store
+
+    @staticmethod
+    def _row_values(doc: dict) -> Tuple[str, Dict]:
+        """(id, {field: value} for every other column) of a document, as stored in a row"""
+        values = {}
+        for field in STRING_FIELDS[1:]:
+            value = doc.get(field, '')
+            if field in STRIPPED_FIELDS and isinstance(value, str):
+                value = value.strip()
+            values[field] = _text(value, field in INTERNED_FIELDS)
+        for field in SCORE_FIELDS:
+            default = SCORE_DEFAULTS[field]
+            values[field] = _score(doc.get(field, default), default)
+        return document_id(doc), values
+
+    def append(self, doc: dict) -> int:
+        """Append one MongoDB document (or entry dict) and index it"""
+        return self._append_values(*self._row_values(doc))
+
+    def _append_values(self, entry_id: str, values: Dict) -> int:
+        row = len(self)
+        columns = self.columns
+
+        columns['id'].append(entry_id)
+        for field, value in values.items():
+            columns[field].append(value)
+
+        for field in KEY_FIELDS:
+            self.keys[field].append(_lower(values[field]))
+
+        for source, _ in PAIR_TARGETS:
+            self._index_source(source, row)
+
+        self.id_rows[entry_id] = row
+        self.type_rows.setdefault(values['word_type'], []).append(row)
+        for lang in LANGUAGES:
+            if values[f'{lang}_ipa']:
+                self.ipa_counts[lang] += 1
+        return row
+
+    def _index_source(self, source: str, row: int):
+        """Register *row* in the *source* language map.
+
+        Same pairing rules as the original dict-based loader: a pair only
+        resolves when both sides are present, and the last such row wins.
+        """
+        keys = self.keys
+        source_key = keys[f'{source}_word'][row]
+        if not source_key:
+            return
+        first, second = PAIR_TARGET_MAP[source]
+        has_first = bool(keys[f'{first}_word'][row])
+        has_second = bool(keys[f'{second}_word'][row])
+        if not (has_first or has_second):
+            return
+        if not (has_first and has_second):
+            missing = second if has_first else first
+            previous = self.lookup(source, missing, source_key)
+            if previous is not None:
+                self.fallbacks[lookup_name(source, missing)][source_key] = previous
+        for target, present in ((first, has_first), (second, has_second)):
+            if present:
+                self.fallbacks[lookup_name(source, target)].pop(source_key, None)
+        self.maps[source][source_key] = row
+
+    def with_changes(self, upserts: Iterable[dict], deleted_ids: Iterable[str]) -> 'EntryStore':
+        """Return a new store with documents upserted (by id) and ids removed.
+
+        The current store is never modified, so it can keep serving readers
+        of the snapshot that holds it.  Updated documents keep their row and
+        new ones are appended, the order a full load reads them in, so a
+        word shared by several entries resolves to the same one either way.
+        Only the lookup keys touched by changed or deleted rows are re-indexed.
+        """
+        deleted = {str(entry_id) for entry_id in deleted_ids}
+        dropped = {self.id_rows[entry_id] for entry_id in deleted if entry_id in self.id_rows}
+        # Existing row -> new values, and new ids in arrival order (the last upsert of an id wins)
+        replaced: Dict[int, Dict] = {}
+        appended: Dict[str, Dict] = {}
+        for doc in upserts:
+            entry_id, values = self._row_values(doc)
+            row = self.id_rows.get(entry_id)
+            if row is not None and entry_id not in deleted:
+                replaced[row] = values
+            else:
+                appended.pop(entry_id, None)
+                appended[entry_id] = values
+
+        store = EntryStore()
+        if not dropped and not replaced:
+            store.columns = {field: column[:] for field, column in self.columns.items()}
+            store.keys = {field: column[:] for field, column in self.keys.items()}
+            store.maps = {lang: dict(lookup_map) for lang, lookup_map in self.maps.items()}
+            store.fallbacks = {name: dict(fallback) for name, fallback in self.fallbacks.items()}
+            store.id_rows = dict(self.id_rows)
+            store.type_rows = {word_type: rows[:] for word_type, rows in self.type_rows.items()}
+            store.ipa_counts = dict(self.ipa_counts)
+        else:
+            keep = [row for row in range(len(self)) if row not in dropped]
+            remap = array('l', [-1]) * len(self)
+            for new_row, old_row in enumerate(keep):
+                remap[old_row] = new_row
+
+            for field, column in self.columns.items():
+                kept = [column[row] for row in keep]
+                store.columns[field] = array('d', kept) if isinstance(column, array) else kept
+            for field, column in self.keys.items():
+                store.keys[field] = [column[row] for row in keep]
+            for row, values in replaced.items():
+                for field, value in values.items():
+                    store.columns[field][remap[row]] = value
+                for field in KEY_FIELDS:
+                    store.keys[field][remap[row]] = _lower(values[field])
+
+            # Keys that pointed at (or were shadowed by) a changed row are re-indexed
+            affected = {
+                lang: ({self.keys[f'{lang}_word'][row] for row in dropped.union(replaced)}
+                       | {store.keys[f'{lang}_word'][remap[row]] for row in replaced}) - {''}
+                for lang in LANGUAGES
+            }
+            for lang, lookup_map in self.maps.items():
+                store.maps[lang] = {key: remap[row] for key, row in lookup_map.items()
+                                    if key not in affected[lang]}
+            for name, fallback in self.fallbacks.items():
+                source = name.split('_to_')[0]
+                store.fallbacks[name] = {key: remap[row] for key, row in fallback.items()
+                                         if key not in affected[source]}
+            for lang in LANGUAGES:
+                if not affected[lang]:
+                    continue
+                key_column = store.keys[f'{lang}_word']
+                for row, key in enumerate(key_column):
+                    if key in affected[lang]:
+                        store._index_source(lang, row)
+
+            store.id_rows = dict(zip(store.columns['id'], range(len(keep))))
+            if replaced:
+                # A replaced row may have changed type; rows stay in row order either way
+                for row, word_type in enumerate(store.columns['word_type']):
+                    store.type_rows.setdefault(word_type, []).append(row)
+            else:
+                for word_type, rows in self.type_rows.items():
+                    kept_rows = [remap[row] for row in rows if row not in dropped]
+                    if kept_rows:
+                        store.type_rows[word_type] = kept_rows
+            store.ipa_counts = {
+                lang: count - sum(1 for row in dropped.union(replaced) if self.columns[f'{lang}_ipa'][row])
+                + sum(1 for values in replaced.values() if values[f'{lang}_ipa'])
+                for lang, count in self.ipa_counts.items()
+            }
+
+        for entry_id, values in appended.items():
+            store._append_values(entry_id, values)
+        return store
+
+    def statistics(self) -> Dict:
+        """Totals, word type breakdown and IPA coverage from the maintained counters"""
+        total = len(self)
+        breakdown = sorted(
+            ({'type': word_type, 'count': len(rows)} for word_type, rows in self.type_rows.items()
+             if word_type.strip() and rows),
+            key=lambda item: (-item['count'], item['type'])
+        )
+        return {
+            'total_words': total,
+            'word_types': len(breakdown),
+            'type_breakdown': breakdown,
+            'ipa_coverage': {
+                lang: {
+                    'count': count,
+                    'percent': round(count / total * 100, 2) if total else 0.0
+                }
+                for lang, count in self.ipa_counts.items()
+            }
+        }
+    
+    def entry(self, row: int, fields: Optional[Sequence[str]] = None) -> Dict:
+        """Rebuild the serialized entry dict for *row*, optionally only *fields*"""
+        columns = self.columns
+        return {field: columns[field][row] for field in (fields or ENTRY_FIELDS)}
+
+    def matches(self, row: int, doc: dict) -> bool:
+        """True when *row* already holds exactly what *doc* would be stored as"""
+        return self.entry(row) == EntryStore.from_documents([doc]).entry(0)
+
+    def entries(self, rows: Iterable[int]) -> List[Dict]:
+        return [self.entry(row) for row in rows]
+
+    def lookup(self, source_lang: str, target_lang: str, word_lower: str) -> Optional[int]:
+        """O(1) row lookup for an already lower-cased, stripped word"""
+        source_map = self.maps.get(source_lang)
+        if source_map is None or target_lang not in self.maps or target_lang == source_lang:
+            return None
+        row = source_map.get(word_lower)
+        if row is None:
+            return None
+        if self.keys[f'{target_lang}_word'][row]:
+            return row
+        return self.fallbacks[lookup_name(source_lang, target_lang)].get(word_lower)
+
+    def find(self, source_lang: str, word_lower: str) -> Optional[int]:
+        """O(1) row whose *source_lang* word is the key, whatever it pairs with"""
+        source_map = self.maps.get(source_lang)
+        return source_map.get(word_lower) if source_map is not None else None
+    
+    def row_for_id(self, entry_id: str) -> Optional[int]:
+        return self.id_rows.get(entry_id)
+    
+    def id_order(self) -> Tuple[List[str], List[int]]:
+        """Sorted ids and their rows, for keyset pagination (built once per store)"""
+        if self._id_order is None or len(self._id_order[0]) != len(self):
+            rows = sorted(range(len(self)), key=self.columns['id'].__getitem__)
+            self._id_order = ([self.columns['id'][row] for row in rows], rows)
+        return self._id_order
+
+    def romanized(self, lang: str) -> RomanizedIndex:
+        """Romanized (Singlish) key index of a language's words (built once per store)"""
+        index = self._romanized.get(lang)
+        if index is None or index.size != len(self):
+            # The warm-up thread and the shared snapshot writer may ask at the same time
+            with self._romanized_lock:
+                index = self._romanized.get(lang)
+                if index is None or index.size != len(self):
+                    index = self._romanized[lang] = RomanizedIndex(self.columns[f'{lang}_word'])
+        return index
+
+    def scan(self, query_lower: str, fields: Iterable[str]) -> List[int]:
+        """Return rows (in load order) whose lowered *fields* contain the query"""
+        fields = tuple(fields)
+        if len(fields) == 1:
+            column = self.keys[fields[0]]
+            return [row for row, value in enumerate(column) if query_lower in value]
+
+        matched = set()
+        for field in fields:
+            column = self.keys[field]
+            matched.update(row for row, value in enumerate(column) if query_lower in value)
+        return sorted(matched)
+
+    def is_exact(self, row: int, query_lower: str) -> bool:
+        """True when any of the three words equals the query exactly"""
+        keys = self.keys
+        return (keys['vedda_word'][row] == query_lower or
+                keys['english_word'][row] == query_lower or
+                keys['sinhala_word'][row] == query_lower)
+
+    def frequency(self, row: int) -> float:
+        return self.columns['frequency_score'][row]
@@ -0,0 +1,336 @@
+"""
+Read-only dictionary store served straight from a memory-mapped file.
+
+Unlike the cold-start snapshot file (``snapshot_file``), which is rebuilt
+into Python objects on load, this layout is queried in place: strings are
+UTF-8 blobs with uint32 offset arrays, lookup maps are open-addressing hash
+tables of row ids, and scores are float64 arrays.  Every worker process that
+maps the same file shares its pages through the OS page cache, so memory
+stays flat as workers are added.
+
+Segments (all uint32 unless noted, native byte order):
+
+    str.<field>.offsets / .blob      entry fields, each value NUL-terminated
+    key.<field>.offsets / .blob      lower-cased search keys
+    score.<field>                    float64 scores
+    hash.<lang>, hash.id             lookup tables (slot = row + 1, 0 = empty)
+    hash.fallback.<pair>             per-pair fallbacks (see EntryStore)
+    order.id                         rows sorted by id, for keyset pagination
+    types.rows                       rows grouped by word type
+    roman.<lang>.*                   romanized key index (see RomanizedIndex)
+
+The coordinator builds the romanized indexes once and writes them here, so
+workers search romanized keys in place instead of each building their own.
+"""
+
+import bisect
+import copy
+import mmap
+import sys
+import time
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.entry_store import (
+    ENTRY_FIELDS, EntryStore, INTERNED_FIELDS, KEY_FIELDS, LANGUAGES, SCORE_FIELDS,
+    STRING_FIELDS, lookup_name
+)
+from app.services.romanization import ROMANIZED_LANGUAGES, RomanizedIndex
+from app.services.snapshot_file import SnapshotFileError, read_header, verify_checksum, write_segments
+
+MAGIC = b'VDMAP\x00\x00\x01'
+FORMAT_VERSION = 1
+
+EXACT_FIELDS = ('vedda_word', 'english_word', 'sinhala_word')
+
+
+def _encode_column(values: Sequence[str]) -> Tuple[bytes, bytes]:
+    """NUL-terminated UTF-8 blob and the uint32 start offset of every value (plus the end)"""
+    offsets = array('I', [0])
+    parts = []
+    position = 0
+    for value in values:
+        data = value.replace('\x00', '').encode('utf-8') + b'\x00'
+        parts.append(data)
+        position += len(data)
+        offsets.append(position)
+    return offsets.tobytes(), b''.join(parts)
+
+
+def _hash_table(keys: Dict[str, int]) -> bytes:
+    """Open-addressing table (linear probing, crc32) holding row + 1 per key"""
+    size = 8
+    while size < len(keys) * 2:
+        size *= 2
+    mask = size - 1
+    slots = array('I', [0]) * size
+    for key, row in keys.items():
+        slot = zlib.crc32(key.encode('utf-8')) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = row + 1
+    return slots.tobytes()
+
+
+def save_mapped_store(store: EntryStore, path: str, instance: str, version: int) -> Dict:
+    """Write *store* in the mapped layout; the header records the publishing snapshot"""
+    segments = []
+    for field in STRING_FIELDS:
+        offsets, blob = _encode_column(store.columns[field])
+        segments.append((f'str.{field}.offsets', offsets))
+        segments.append((f'str.{field}.blob', blob))
+    for field in KEY_FIELDS:
+        offsets, blob = _encode_column(store.keys[field])
+        segments.append((f'key.{field}.offsets', offsets))
+        segments.append((f'key.{field}.blob', blob))
+    for field in SCORE_FIELDS:
+        segments.append((f'score.{field}', store.columns[field].tobytes()))
+    for lang in LANGUAGES:
+        segments.append((f'hash.{lang}', _hash_table(store.maps[lang])))
+    for name, fallback in store.fallbacks.items():
+        segments.append((f'hash.fallback.{name}', _hash_table(fallback)))
+    segments.append(('hash.id', _hash_table(store.id_rows)))
+    segments.append(('order.id', array('I', store.id_order()[1]).tobytes()))
+    for lang in ROMANIZED_LANGUAGES:
+        for name, data in store.romanized(lang).segments().items():
+            segments.append((f'roman.{lang}.{name}', data))
+
+    type_groups = []
+    type_rows = array('I')
+    for word_type, rows in store.type_rows.items():
+        type_groups.append([word_type, len(rows)])
+        type_rows.extend(rows)
+    segments.append(('types.rows', type_rows.tobytes()))
+
+    header = {
+        'format': FORMAT_VERSION,
+        'rows': len(store),
+        'instance': instance,
+        'version': version,
+        'created_at': time.time(),
+        'byteorder': sys.byteorder,
+        'type_groups': type_groups,
+        'stats': store.statistics()
+    }
+    return write_segments(path, MAGIC, header, segments)
+
+
+class _Column:
+    """Lazy sequence of decoded strings from one blob, in the order of *rows*"""
+
+    def __init__(self, store: 'MappedEntryStore', field: str, rows: Sequence[int]):
+        self._store = store
+        self._field = field
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> str:
+        return self._store.value(self._field, self._rows[index])
+
+
+class MappedEntryStore:
+    """EntryStore read API over a memory-mapped file; never copied into the Python heap"""
+
+    def __init__(self, mapped: mmap.mmap, header: Dict, start: int):
+        if header.get('byteorder') != sys.byteorder:
+            raise SnapshotFileError('shared snapshot was written with another byte order')
+        self.header = header
+        # Snapshots published from this file keep the coordinator's version
+        self.origin = (header['instance'], header['version'])
+        self._rows = header['rows']
+        self._mapped = mapped
+        view = memoryview(mapped)
+        table = header['segments']
+
+        def segment(name) -> Tuple[int, int]:
+            if name not in table:
+                raise SnapshotFileError(f'missing segment {name}')
+            offset, length = table[name]
+            return start + offset, length
+
+        def numbers(name, typecode):
+            offset, length = segment(name)
+            return view[offset:offset + length].cast(typecode)
+
+        # field -> (absolute blob offset, offsets view)
+        self._strings = {field: (segment(f'str.{field}.blob')[0], numbers(f'str.{field}.offsets', 'I'))
+                         for field in STRING_FIELDS}
+        self._keys = {field: (segment(f'key.{field}.blob')[0], numbers(f'key.{field}.offsets', 'I'))
+                      for field in KEY_FIELDS}
+        self._key_blobs = {field: segment(f'key.{field}.blob') for field in KEY_FIELDS}
+        self._scores = {field: numbers(f'score.{field}', 'd') for field in SCORE_FIELDS}
+        self._tables = {name[len('hash.'):]: numbers(name, 'I') for name in table if name.startswith('hash.')}
+        self._order = numbers('order.id', 'I')
+
+        grouped = numbers('types.rows', 'I')
+        self.type_rows: Dict[str, Sequence[int]] = {}
+        offset = 0
+        for word_type, count in header['type_groups']:
+            self.type_rows[sys.intern(word_type)] = grouped[offset:offset + count]
+            offset += count
+
+        self._romanized: Dict[str, RomanizedIndex] = {}
+        for lang in ROMANIZED_LANGUAGES:
+            if f'roman.{lang}.order' in table:
+                blob_offset, blob_length = segment(f'roman.{lang}.key_blob')
+                self._romanized[lang] = RomanizedIndex.from_segments(
+                    self._rows, view[blob_offset:blob_offset + blob_length],
+                    numbers(f'roman.{lang}.key_offsets', 'I'), numbers(f'roman.{lang}.starts', 'I'),
+                    numbers(f'roman.{lang}.order', 'I')
+                )
+
+        for field, (_, offsets) in list(self._strings.items()) + list(self._keys.items()):
+            if len(offsets) != self._rows + 1:
+                raise SnapshotFileError(f'column {field} has the wrong length')
+
+    @classmethod
+    def open(cls, path: str) -> 'MappedEntryStore':
+        """Map *path* read-only; the mapping lives as long as the store is referenced"""
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotFileError(f'cannot open shared snapshot {path}: {e}')
+        try:
+            header, start = read_header(mapped, MAGIC, FORMAT_VERSION)
+            verify_checksum(mapped, header, start)
+            return cls(mapped, header, start)
+        except (KeyError, IndexError, TypeError) as e:
+            raise SnapshotFileError(f'corrupt shared snapshot {path}: {e}')
+
+    def __len__(self):
+        return self._rows
+
+    # ------------------------------------------------------------------
+    # Raw access
+    # ------------------------------------------------------------------
+
+    def _bytes(self, column, row: int) -> bytes:
+        blob, offsets = column
+        return self._mapped[blob + offsets[row]:blob + offsets[row + 1] - 1]
+
+    def value(self, field: str, row: int) -> str:
+        return self._bytes(self._strings[field], row).decode('utf-8')
+
+    def _has_key(self, field: str, row: int) -> bool:
+        offsets = self._keys[field][1]
+        return offsets[row + 1] - offsets[row] > 1
+
+    def _probe(self, table: str, column, key: bytes) -> Optional[int]:
+        slots = self._tables.get(table)
+        if slots is None or not key:
+            return None
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            stored = slots[slot]
+            if not stored:
+                return None
+            if self._bytes(column, stored - 1) == key:
+                return stored - 1
+            slot = (slot + 1) & mask
+
+    # ------------------------------------------------------------------
+    # EntryStore read API
+    # ------------------------------------------------------------------
+
+    def entry(self, row: int, fields: Optional[Sequence[str]] = None) -> Dict:
+        entry = {}
+        for field in (fields or ENTRY_FIELDS):
+            if field in self._scores:
+                entry[field] = self._scores[field][row]
+            else:
+                entry[field] = self.value(field, row)
+        return entry
+
+    def entries(self, rows: Iterable[int]) -> List[Dict]:
+        return [self.entry(row) for row in rows]
+
+    def find(self, source_lang: str, word_lower: str) -> Optional[int]:
+        if source_lang not in LANGUAGES:
+            return None
+        return self._probe(source_lang, self._keys[f'{source_lang}_word'], word_lower.encode('utf-8'))
+
+    def lookup(self, source_lang: str, target_lang: str, word_lower: str) -> Optional[int]:
+        if source_lang not in LANGUAGES or target_lang not in LANGUAGES or target_lang == source_lang:
+            return None
+        key = word_lower.encode('utf-8')
+        column = self._keys[f'{source_lang}_word']
+        row = self._probe(source_lang, column, key)
+        if row is None:
+            return None
+        if self._has_key(f'{target_lang}_word', row):
+            return row
+        return self._probe(f'fallback.{lookup_name(source_lang, target_lang)}', column, key)
+
+    def row_for_id(self, entry_id: str) -> Optional[int]:
+        return self._probe('id', self._strings['id'], str(entry_id).encode('utf-8'))
+
+    def id_order(self) -> Tuple[Sequence[str], Sequence[int]]:
+        return _Column(self, 'id', self._order), self._order
+
+    def romanized(self, lang: str) -> RomanizedIndex:
+        """Romanized key index read in place from the file (built here only for files without one)"""
+        index = self._romanized.get(lang)
+        if index is None:
+            index = self._romanized[lang] = RomanizedIndex(_Column(self, f'{lang}_word', range(self._rows)))
+        return index
+
+    def scan(self, query_lower: str, fields: Iterable[str]) -> List[int]:
+        """Substring search with mmap.find over the key blobs (UTF-8 matches are exact)"""
+        query = query_lower.encode('utf-8')
+        matched = set()
+        if not self._rows:
+            return []
+        for field in fields:
+            blob, length = self._key_blobs[field]
+            offsets = self._keys[field][1]
+            end = blob + length
+            position = self._mapped.find(query, blob, end)
+            while position != -1 and position < end:
+                row = bisect.bisect_right(offsets, position - blob) - 1
+                matched.add(row)
+                position = self._mapped.find(query, blob + offsets[row + 1], end)
+        return sorted(matched)
+
+    def is_exact(self, row: int, query_lower: str) -> bool:
+        query = query_lower.encode('utf-8')
+        return any(self._bytes(self._keys[field], row) == query for field in EXACT_FIELDS)
+
+    def frequency(self, row: int) -> float:
+        return self._scores['frequency_score'][row]
+
+    def statistics(self) -> Dict:
+        return copy.deepcopy(self.header['stats'])
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+
+    def to_entry_store(self) -> EntryStore:
+        """Copy into a regular EntryStore (for writers that need to modify it)"""
+        def strings(column) -> List[str]:
+            blob, offsets = column
+            if not self._rows:
+                return []
+            return self._mapped[blob:blob + offsets[-1] - 1].decode('utf-8').split('\x00')
+
+        columns = {field: strings(self._strings[field]) for field in STRING_FIELDS}
+        for field in INTERNED_FIELDS:
+            columns[field] = list(map(sys.intern, columns[field]))
+        for field in SCORE_FIELDS:
+            columns[field] = array('d', self._scores[field])
+        keys = {field: strings(self._keys[field]) for field in KEY_FIELDS}
+        map_rows = {lang: [slot - 1 for slot in self._tables[lang] if slot] for lang in LANGUAGES}
+        fallback_rows = {
+            name[len('fallback.'):]: [slot - 1 for slot in slots if slot]
+            for name, slots in self._tables.items() if name.startswith('fallback.')
+        }
+        type_rows = {word_type: list(rows) for word_type, rows in self.type_rows.items()}
+        return EntryStore.from_columns(columns, keys, map_rows, fallback_rows, type_rows)
+
+    def with_changes(self, upserts: Iterable[dict], deleted_ids: Iterable[str]) -> EntryStore:
+        return self.to_entry_store().with_changes(upserts, deleted_ids)
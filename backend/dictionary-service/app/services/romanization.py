@@ -0,0 +1,259 @@
+"""
+Romanized (Singlish) search keys for Sinhala-script dictionary words.
+
+Learners often type Vedda/Sinhala words in Latin script ("amma" for
+අම්මා).  Every Vedda and Sinhala word gets a romanization built from the
+translator's Singlish table (``generate_singlish_romanization``), and the
+romanization and the query are both folded to a search key.  Folding drops
+aspiration and vowel length, merges w/v and collapses doubled letters, so
+"ammaa", "amma" and "ama" all give the same key.  Keys are indexed for
+exact, prefix and fuzzy (small edit distance) lookup.
+"""
+
+import bisect
+import re
+import threading
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+# Same character table as the translator's generate_singlish_romanization
+SINHALA_TO_SINGLISH = {
+    # Vowels
+    'අ': 'a', 'ආ': 'aa', 'ඇ': 'ae', 'ඈ': 'aae', 'ඉ': 'i', 'ඊ': 'ii', 'උ': 'u', 'ඌ': 'uu',
+    'ඍ': 'ru', 'ඎ': 'ruu', 'ඏ': 'lu', 'ඐ': 'luu', 'එ': 'e', 'ඒ': 'ee', 'ඓ': 'ai',
+    'ඔ': 'o', 'ඕ': 'oo', 'ඖ': 'au',
+    # Consonants (Velar)
+    'ක': 'ka', 'ඛ': 'kha', 'ග': 'ga', 'ඝ': 'gha', 'ඞ': 'nga',
+    # Consonants (Palatal)
+    'ච': 'cha', 'ඡ': 'chha', 'ජ': 'ja', 'ඣ': 'jha', 'ඤ': 'gna',
+    # Consonants (Retroflex)
+    'ට': 'ta', 'ඨ': 'tha', 'ඩ': 'da', 'ඪ': 'dha', 'ණ': 'na',
+    # Consonants (Dental)
+    'ත': 'tha', 'ථ': 'thha', 'ද': 'dha', 'ධ': 'dhha', 'න': 'na',
+    # Consonants (Labial)
+    'ප': 'pa', 'ඵ': 'pha', 'බ': 'ba', 'භ': 'bha', 'ම': 'ma',
+    # Consonants (Approximants)
+    'ය': 'ya', 'ර': 'ra', 'ල': 'la', 'ව': 'wa',
+    # Consonants (Sibilants)
+    'ශ': 'sha', 'ෂ': 'sha', 'ස': 'sa', 'හ': 'ha', 'ළ': 'la', 'ෆ': 'fa',
+    # Diacritics and modifiers
+    'ං': 'ng', 'ඃ': 'h', '්': '',
+    'ා': 'aa', 'ැ': 'ae', 'ෑ': 'aae',
+    'ි': 'i', 'ී': 'ii', 'ු': 'u', 'ූ': 'uu',
+    'ෘ': 'ru', 'ෲ': 'ruu', 'ෟ': 'lu', 'ෳ': 'luu',
+    'ෙ': 'e', 'ේ': 'ee', 'ෛ': 'ai',
+    'ො': 'o', 'ෝ': 'oo', 'ෞ': 'au'
+}
+
+# Vowel signs and the virama replace a consonant's inherent 'a'
+_DEPENDENT = '්ාැෑිීුූෘෲෟෳෙේෛොෝෞ'
+_CONSONANT_BASES = {char: value[:-1] for char, value in SINHALA_TO_SINGLISH.items()
+                    if value.endswith('a') and 'ක' <= char <= 'ෆ'}
+_BEFORE_SIGN = re.compile(f"[{''.join(_CONSONANT_BASES)}](?=[{_DEPENDENT}])")
+_SINGLISH_TABLE = str.maketrans(SINHALA_TO_SINGLISH)
+
+_ASPIRATED = re.compile(r'([kgjtdpb])h|(ch)h')
+_NOT_LETTER = re.compile(r'[^a-z]+')
+_REPEATED = re.compile(r'(.)\1+')
+
+# Languages written in Sinhala script, which get romanized keys
+ROMANIZED_LANGUAGES = ('vedda', 'sinhala')
+
+MAX_FUZZY_CANDIDATES = 2000
+
+
+def romanize(text: str) -> str:
+    """Singlish romanization of Sinhala-script text (a consonant's 'a' is dropped before a sign)"""
+    text = _BEFORE_SIGN.sub(lambda match: _CONSONANT_BASES[match.group()], text)
+    return text.translate(_SINGLISH_TABLE).strip()
+
+
+def fold(text: str) -> str:
+    """Search key for romanized text: no aspiration, vowel length, w/v or doubled letters"""
+    key = _NOT_LETTER.sub('', text.lower())
+    key = _ASPIRATED.sub(lambda match: match.group(1) or match.group(2), key)
+    return _REPEATED.sub(r'\1', key.replace('w', 'v'))
+
+
+@lru_cache(maxsize=1 << 18)
+def romanized_key(text: str) -> str:
+    """Search key for a Sinhala-script word (cached; rebuilt indexes reuse it)"""
+    if not text or not any('඀' <= char <= '෿' for char in text):
+        return ''
+    return fold(romanize(text))
+
+
+def is_romanized_query(query: str) -> bool:
+    """Latin-script query that could be a romanized Vedda/Sinhala word"""
+    return query.isascii() and any(char.isalpha() for char in query)
+
+
+def _bigrams(key: str) -> set:
+    padded = f'^{key}$'
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, stopping early once it is certainly above *limit*"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _KeyColumn:
+    """Sorted distinct keys as one ASCII blob with uint32 offsets, readable as a sequence of bytes"""
+
+    def __init__(self, blob, offsets: Sequence[int]):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position: int) -> bytes:
+        return bytes(self._blob[self._offsets[position]:self._offsets[position + 1]])
+
+    def length(self, position: int) -> int:
+        return self._offsets[position + 1] - self._offsets[position]
+
+
+class RomanizedIndex:
+    """Folded romanization keys of one word column, for exact, prefix and fuzzy lookup.
+
+    Stored column-wise so it costs a few bytes per row instead of Python
+    objects: the distinct keys, sorted, as one ASCII blob (``key_blob`` /
+    ``key_offsets``), the rows sorted by key (``order``) and, per distinct
+    key, where its rows start in ``order`` (``starts``, plus the end).  Every
+    key and every prefix is one contiguous slice.  The same arrays can be
+    written to a mapped snapshot and used in place (``from_segments``).
+    """
+
+    SEGMENTS = ('key_blob', 'key_offsets', 'starts', 'order')
+
+    def __init__(self, values: Sequence[str]):
+        keys = list(map(romanized_key, values))
+        order = array('I', sorted(filter(keys.__getitem__, range(len(keys))), key=keys.__getitem__))
+        starts = array('I')
+        key_offsets = array('I', [0])
+        parts = []
+        previous = None
+        for position, row in enumerate(order):
+            key = keys[row]
+            if key != previous:
+                starts.append(position)
+                parts.append(key.encode('ascii'))
+                key_offsets.append(key_offsets[-1] + len(parts[-1]))
+                previous = key
+        starts.append(len(order))
+        self._attach(len(values), b''.join(parts), key_offsets, starts, order)
+
+    @classmethod
+    def from_segments(cls, size: int, key_blob, key_offsets: Sequence[int], starts: Sequence[int],
+                      order: Sequence[int]) -> 'RomanizedIndex':
+        """Index over arrays that are already built (e.g. views into a mapped file)"""
+        index = cls.__new__(cls)
+        index._attach(size, key_blob, key_offsets, starts, order)
+        return index
+
+    def _attach(self, size, key_blob, key_offsets, starts, order):
+        self.size = size
+        self.key_blob = key_blob
+        self.key_offsets = key_offsets
+        self.starts = starts
+        self.order = order
+        self._keys = _KeyColumn(key_blob, key_offsets)
+        self._postings = None
+        self._postings_lock = threading.Lock()
+
+    def segments(self) -> Dict[str, bytes]:
+        """Raw bytes of each array, keyed by SEGMENTS name"""
+        return {
+            'key_blob': bytes(self.key_blob),
+            'key_offsets': array('I', self.key_offsets).tobytes(),
+            'starts': array('I', self.starts).tobytes(),
+            'order': array('I', self.order).tobytes()
+        }
+
+    def __len__(self):
+        return len(self._keys)
+
+    def key(self, position: int) -> str:
+        return self._keys[position].decode('ascii')
+
+    def _rows_at(self, position: int) -> Sequence[int]:
+        return self.order[self.starts[position]:self.starts[position + 1]]
+
+    def _rows(self, key: str) -> Sequence[int]:
+        encoded = key.encode('ascii')
+        position = bisect.bisect_left(self._keys, encoded)
+        if position == len(self._keys) or self._keys[position] != encoded:
+            return ()
+        return self._rows_at(position)
+
+    def exact(self, key: str) -> List[int]:
+        return list(self._rows(key))
+
+    def prefix(self, key: str, limit: int = 50) -> List[int]:
+        """Rows whose key starts with *key* (excluding an exact match), shortest keys first"""
+        encoded = key.encode('ascii')
+        start = bisect.bisect_right(self._keys, encoded)
+        end = bisect.bisect_left(self._keys, encoded + b'{')  # '{' sorts right after 'z'
+        rows = []
+        for position in sorted(range(start, end), key=self._keys.length):
+            rows.extend(self._rows_at(position))
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+    def fuzzy(self, key: str, max_distance: int = 1, limit: int = 50) -> List[int]:
+        """Rows whose key is within *max_distance* edits, closest first.
+
+        Candidates come from a bigram index (an edit changes at most two
+        padded bigrams) and are then checked with a bounded edit distance.
+        """
+        postings = self._bigram_postings()
+        query_grams = _bigrams(key)
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for position in postings.get(gram, ()):
+                counts[position] += 1
+
+        needed = len(query_grams) - 2 * max_distance
+        candidates = [position for position, count in counts.items()
+                      if count >= needed and abs(self._keys.length(position) - len(key)) <= max_distance]
+        candidates.sort(key=counts.__getitem__, reverse=True)
+
+        matches = []
+        for position in candidates[:MAX_FUZZY_CANDIDATES]:
+            distance = edit_distance(key, self.key(position), max_distance)
+            if 0 < distance <= max_distance:
+                matches.append((distance, position))
+        matches.sort()
+        rows = []
+        for _, position in matches:
+            rows.extend(self._rows_at(position))
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+    def _bigram_postings(self) -> Dict[str, array]:
+        """Bigram -> key positions, built on the first fuzzy lookup"""
+        if self._postings is None:
+            with self._postings_lock:
+                if self._postings is None:
+                    postings: Dict[str, array] = defaultdict(lambda: array('I'))
+                    for position in range(len(self)):
+                        for gram in _bigrams(self.key(position)):
+                            postings[gram].append(position)
+                    self._postings = dict(postings)
+        return self._postings
@@ -0,0 +1,240 @@
+"""
+One dictionary shared by every worker process on a host.
+
+The coordinator process (the only one that talks to MongoDB for reads and
+runs the change feed) writes each published snapshot to
+``DICTIONARY_SHARED_DIR`` in the mapped layout and then flips a small
+``current.json`` pointer.  Worker processes attach to the file read-only
+with ``MappedEntryStore`` and follow the pointer, so they never build their
+own indexes and their memory stays flat as more are started.  The pointer
+also carries the ids changed since the previous published version, so
+workers extend their export changelog without diffing the two files.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from app.services.entry_store import EntryStore
+from app.services.mapped_store import MappedEntryStore, save_mapped_store
+from app.services.snapshot_file import SnapshotFileError
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = 'current.json'
+
+# Larger change sets are left out of the pointer; workers then diff in the background
+MAX_SHIPPED_CHANGES = 10000
+DIFF_WAIT_SECONDS = 5.0
+
+
+def read_pointer(directory: str) -> Optional[Dict]:
+    """The coordinator's latest published snapshot, or None before the first publish"""
+    try:
+        with open(os.path.join(directory, POINTER_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def attach_shared_snapshot(directory: str, timeout: float = 0.0) -> Optional[MappedEntryStore]:
+    """Map the current shared snapshot, waiting up to *timeout* seconds for the coordinator"""
+    deadline = time.time() + timeout
+    while True:
+        pointer = read_pointer(directory)
+        if pointer is not None:
+            try:
+                return MappedEntryStore.open(os.path.join(directory, pointer['file']))
+            except (SnapshotFileError, KeyError) as e:
+                logger.warning(f"Cannot attach shared dictionary snapshot: {e}")
+        if time.time() >= deadline:
+            return None
+        time.sleep(0.5)
+
+
+class SharedSnapshotPublisher:
+    """Coordinator side: writes every published snapshot for the workers to map"""
+
+    role = 'coordinator'
+
+    def __init__(self, service, directory: str, keep: int = 3):
+        self.service = service
+        self.directory = directory
+        self.keep = keep
+        self._pending = threading.Event()
+        self._thread = None
+        self.published = None
+        self.last_write_ms = None
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self.service.publish_hooks.append(self.notify)
+            self._thread = threading.Thread(target=self._run, name='dictionary-shared-publisher', daemon=True)
+            self._thread.start()
+            self.notify(self.service.snapshot())
+        return self
+
+    def notify(self, snapshot):
+        """Publish hook; bursts of snapshots are coalesced into one write of the latest"""
+        self._pending.set()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            try:
+                self.write(self.service.snapshot())
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.warning(f"Could not write shared dictionary snapshot: {e}")
+
+    def write(self, snapshot):
+        store = snapshot.store
+        if not isinstance(store, EntryStore) or len(store) == 0:
+            return
+        start = time.perf_counter()
+        name = f'dictionary-{snapshot.instance}-{snapshot.version}.map'
+        save_mapped_store(store, os.path.join(self.directory, name), snapshot.instance, snapshot.version)
+
+        pointer = {
+            'file': name,
+            'instance': snapshot.instance,
+            'version': snapshot.version,
+            'rows': len(store),
+            'published_at': time.time()
+        }
+        changes = self._changes_since_published(snapshot)
+        if changes is not None:
+            pointer['changes'] = changes
+        tmp_path = os.path.join(self.directory, f'{POINTER_FILE}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+        os.replace(tmp_path, os.path.join(self.directory, POINTER_FILE))
+
+        self.published = pointer
+        self.last_write_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Shared dictionary snapshot {snapshot.tag} written in {self.last_write_ms:.0f}ms")
+        self._prune(name)
+
+    def _changes_since_published(self, snapshot) -> Optional[Dict]:
+        """Ids changed between the last pointer and *snapshot*, when known and small enough to ship"""
+        if self.published is None:
+            return None
+        changelog = self.service.changelog
+        # A full reload's diff runs in the background; it is usually done by the time the file is written
+        changelog.wait(DIFF_WAIT_SECONDS)
+        changes = changelog.changes_since(self.published['instance'], self.published['version'], snapshot)
+        if changes is None or len(changes[0]) + len(changes[1]) > MAX_SHIPPED_CHANGES:
+            return None
+        return {
+            'since': [self.published['instance'], self.published['version']],
+            'upserted': sorted(changes[0]),
+            'deleted': sorted(changes[1])
+        }
+
+    def _prune(self, current: str):
+        """Remove old files; workers still mapping one keep it alive until they move on"""
+        files = sorted(
+            (entry for entry in os.scandir(self.directory)
+             if entry.name.startswith('dictionary-') and entry.name.endswith('.map') and entry.name != current),
+            key=lambda entry: entry.stat().st_mtime, reverse=True
+        )
+        for entry in files[self.keep - 1:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def info(self):
+        return {
+            'role': self.role,
+            'directory': self.directory,
+            'published': self.published,
+            'last_write_ms': round(self.last_write_ms, 1) if self.last_write_ms is not None else None,
+            'errors': self.errors
+        }
+
+
+class SharedSnapshotFollower:
+    """Worker side: swaps in the coordinator's latest snapshot when the pointer moves"""
+
+    role = 'worker'
+
+    def __init__(self, service, directory: str, poll_interval: float = 1.0):
+        self.service = service
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.attached_at = None
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dictionary-shared-follower', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.poll_interval)
+
+    def refresh(self):
+        """Attach to the pointed-at snapshot if it is newer than the one being served"""
+        with self._lock:
+            pointer = read_pointer(self.directory)
+            current = self.service.snapshot()
+            if pointer is None or (pointer.get('instance'), pointer.get('version')) == (
+                    current.instance, current.version):
+                return current
+            try:
+                store = MappedEntryStore.open(os.path.join(self.directory, pointer['file']))
+            except (SnapshotFileError, KeyError) as e:
+                self.errors += 1
+                logger.warning(f"Cannot attach shared dictionary snapshot: {e}")
+                return None
+            self.attached_at = time.time()
+            return self.service.publish(store, self._shipped_changes(pointer, current))
+
+    @staticmethod
+    def _shipped_changes(pointer: Dict, current):
+        """The pointer's change set when it starts at the version being served, else None"""
+        shipped = pointer.get('changes')
+        if not shipped or tuple(shipped.get('since', ())) != (current.instance, current.version):
+            return None
+        return shipped.get('upserted', []), shipped.get('deleted', [])
+
+    def info(self):
+        snapshot = self.service.snapshot()
+        return {
+            'role': self.role,
+            'directory': self.directory,
+            'attached': isinstance(snapshot.store, MappedEntryStore),
+            'version': snapshot.tag,
+            'attached_at': self.attached_at,
+            'errors': self.errors
+        }
+
+
+def start_shared_snapshot(service, config):
+    """Start the publisher or follower for DICTIONARY_SHARED_MODE (None when off)"""
+    mode = config.get('DICTIONARY_SHARED_MODE', 'off')
+    directory = config.get('DICTIONARY_SHARED_DIR')
+    if mode == 'coordinator':
+        os.makedirs(directory, exist_ok=True)
+        shared = SharedSnapshotPublisher(service, directory)
+    elif mode == 'worker':
+        shared = SharedSnapshotFollower(service, directory, config.get('DICTIONARY_SHARED_POLL_SECONDS', 1.0))
+    else:
+        return None
+    service.shared = shared
+    return shared.start()
@@ -0,0 +1,251 @@
+"""
+Versioned binary snapshot file for the in-memory dictionary.
+
+A fresh process maps the file and rebuilds its EntryStore from the stored
+columns in milliseconds instead of scanning MongoDB, then reconciles with
+the database in the background.
+
+Layout (all integers little-endian):
+
+    8 bytes   magic
+    4 bytes   header length
+    N bytes   JSON header (format, rows, tag, byteorder, segment table, checksum)
+    ...       segments, each starting on an 8-byte boundary
+
+The checksum is the CRC-32 of everything after the header, so a torn or
+truncated file is rejected on load instead of being served.
+
+String columns are stored as UTF-8 with values separated by NUL, score
+columns as raw float64 arrays, and lookup maps and the word type index as
+uint32 arrays of the rows they point to. Lower-cased key columns only store
+the rows where lower-casing changed the value.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import uuid
+import zlib
+from array import array
+from typing import Dict, Tuple
+
+from app.services.entry_store import (
+    EntryStore, INTERNED_FIELDS, KEY_FIELDS, LANGUAGES, SCORE_FIELDS, STRING_FIELDS
+)
+
+MAGIC = b'VDDICT\x00\x01'
+FORMAT_VERSION = 1
+_LENGTH = struct.Struct('<I')
+_ALIGN = 8
+
+
+class SnapshotFileError(ValueError):
+    """Raised when a snapshot file is missing, corrupt or from another format"""
+
+
+def _encode_strings(values) -> bytes:
+    joined = '\x00'.join(values)
+    if joined.count('\x00') != max(len(values) - 1, 0):
+        # NUL never appears in real entries; drop it rather than corrupt the split
+        joined = '\x00'.join(value.replace('\x00', '') for value in values)
+    return joined.encode('utf-8')
+
+
+def _decode_strings(data: bytes, rows: int) -> list:
+    if rows == 0:
+        return []
+    values = data.decode('utf-8').split('\x00')
+    if len(values) != rows:
+        raise SnapshotFileError(f'column has {len(values)} values, expected {rows}')
+    return values
+
+
+def save_snapshot(store: EntryStore, path: str, tag: str = '') -> Dict:
+    """Write *store* to *path* atomically and return the header that was written"""
+    segments = []
+    for field in STRING_FIELDS:
+        segments.append((f'column.{field}', _encode_strings(store.columns[field])))
+    for field in KEY_FIELDS:
+        # Only rows whose lower-cased key differs from the stored value
+        rows = array('I', (row for row, (key, value) in
+                           enumerate(zip(store.keys[field], store.columns[field]))
+                           if key is not value and key != value))
+        segments.append((f'keydiff.{field}.rows', rows.tobytes()))
+        segments.append((f'keydiff.{field}.values',
+                         _encode_strings([store.keys[field][row] for row in rows])))
+    for field in SCORE_FIELDS:
+        segments.append((f'column.{field}', store.columns[field].tobytes()))
+    for lang in LANGUAGES:
+        segments.append((f'map.{lang}', array('I', store.maps[lang].values()).tobytes()))
+    for name, fallback in store.fallbacks.items():
+        segments.append((f'fallback.{name}', array('I', fallback.values()).tobytes()))
+    type_groups = []
+    type_rows = array('I')
+    for word_type, rows in store.type_rows.items():
+        type_groups.append([word_type, len(rows)])
+        type_rows.extend(rows)
+    segments.append(('types.rows', type_rows.tobytes()))
+
+    header = {
+        'format': FORMAT_VERSION,
+        'rows': len(store),
+        'tag': tag,
+        'created_at': time.time(),
+        'byteorder': sys.byteorder,
+        'type_groups': type_groups
+    }
+    write_segments(path, MAGIC, header, segments)
+    return header
+
+
+def write_segments(path: str, magic: bytes, header: Dict, segments) -> Dict:
+    """Atomically write *magic*, *header* and the named byte *segments* to *path*.
+    
+    The segment table is added to the header; every segment starts on an
+    8-byte boundary so it can be viewed as a typed array in place.
+    """
+    table = {}
+    offset = 0
+    checksum = 0
+    for name, data in segments:
+        table[name] = [offset, len(data)]
+        offset += len(data) + (-len(data) % _ALIGN)
+        checksum = zlib.crc32(b'\x00' * (-len(data) % _ALIGN), zlib.crc32(data, checksum))
+    header['segments'] = table
+    header['checksum'] = checksum
+    
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(len(magic) + _LENGTH.size + len(header_bytes)) % _ALIGN)
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per writer: processes saving to the same path never share a temp file
+    tmp_path = f'{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(magic)
+            f.write(_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for _, data in segments:
+                f.write(data)
+                f.write(b'\x00' * (-len(data) % _ALIGN))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+    return header
+
+
+def _fsync_directory(directory: str):
+    """Make a rename in *directory* durable (not supported on every platform)"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def verify_checksum(mapped, header: Dict, start: int):
+    """Raise SnapshotFileError unless the data after the header matches the stored checksum"""
+    if 'checksum' not in header:
+        raise SnapshotFileError('snapshot has no checksum')
+    with memoryview(mapped) as view, view[start:] as data:
+        checksum = zlib.crc32(data)
+    if checksum != header['checksum']:
+        raise SnapshotFileError('snapshot checksum mismatch (torn or truncated file)')
+
+
+def read_header(mapped, magic: bytes = MAGIC, format_version: int = FORMAT_VERSION) -> Tuple[Dict, int]:
+    """Parse the header of a mapped snapshot; returns (header, data start offset)"""
+    prefix = len(magic) + _LENGTH.size
+    if len(mapped) < prefix or mapped[:len(magic)] != magic:
+        raise SnapshotFileError('not a dictionary snapshot file')
+    (header_length,) = _LENGTH.unpack(mapped[len(magic):prefix])
+    try:
+        header = json.loads(bytes(mapped[prefix:prefix + header_length]))
+    except ValueError as e:
+        raise SnapshotFileError(f'unreadable header: {e}')
+    if header.get('format') != format_version:
+        raise SnapshotFileError(f"unsupported snapshot format {header.get('format')}")
+    return header, prefix + header_length
+
+
+def load_snapshot(path: str) -> Tuple[EntryStore, Dict]:
+    """Memory-map *path* and rebuild an EntryStore from it; returns (store, header)"""
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotFileError(f'cannot open snapshot {path}: {e}')
+
+    try:
+        header, start = read_header(mapped)
+        verify_checksum(mapped, header, start)
+        rows = header['rows']
+        table = header['segments']
+        swap = header.get('byteorder', sys.byteorder) != sys.byteorder
+
+        def segment(name):
+            if name not in table:
+                raise SnapshotFileError(f'missing segment {name}')
+            offset, length = table[name]
+            return mapped[start + offset:start + offset + length]
+
+        def numbers(name, typecode):
+            values = array(typecode)
+            values.frombytes(segment(name))
+            if swap:
+                values.byteswap()
+            return values
+
+        columns = {}
+        for field in STRING_FIELDS:
+            columns[field] = _decode_strings(segment(f'column.{field}'), rows)
+        for field in INTERNED_FIELDS:
+            columns[field] = list(map(sys.intern, columns[field]))
+        for field in SCORE_FIELDS:
+            columns[field] = numbers(f'column.{field}', 'd')
+            if len(columns[field]) != rows:
+                raise SnapshotFileError(f'column {field} has the wrong length')
+
+        keys = {}
+        for field in KEY_FIELDS:
+            # Keys share the value strings except where lower-casing changed them
+            keys[field] = list(columns[field])
+            diff_rows = numbers(f'keydiff.{field}.rows', 'I')
+            diff_keys = _decode_strings(segment(f'keydiff.{field}.values'), len(diff_rows))
+            for row, key in zip(diff_rows, diff_keys):
+                keys[field][row] = key
+
+        map_rows = {lang: numbers(f'map.{lang}', 'I') for lang in LANGUAGES}
+        fallback_rows = {
+            name[len('fallback.'):]: numbers(name, 'I')
+            for name in table if name.startswith('fallback.')
+        }
+        grouped = numbers('types.rows', 'I').tolist()
+        type_rows = {}
+        offset = 0
+        for word_type, count in header['type_groups']:
+            type_rows[sys.intern(word_type)] = grouped[offset:offset + count]
+            offset += count
+        store = EntryStore.from_columns(columns, keys, map_rows, fallback_rows, type_rows)
+        return store, header
+    except (KeyError, IndexError, UnicodeDecodeError) as e:
+        raise SnapshotFileError(f'corrupt snapshot {path}: {e}')
+    finally:
+        mapped.close()
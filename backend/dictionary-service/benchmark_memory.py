@@ -0,0 +1,153 @@
+"""
+Memory Benchmark for the In-Memory Dictionary
+Compares the legacy dict-per-entry layout against the columnar EntryStore
+on a synthetic dictionary (100k entries by default). No service or
+database is required.
+
+Usage: python benchmark_memory.py [entries]
+"""
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from app.services.entry_store import EntryStore
+
+DEFAULT_ENTRIES = 100_000
+WORD_TYPES = ['noun', 'verb', 'adjective', 'adverb', 'pronoun', 'phrase', '']
+
+# Sinhala consonants and vowel signs used to generate realistic words
+SINHALA_CONSONANTS = 'කගචජටඩතදනපබමයරලවසහළ'
+SINHALA_SIGNS = ['', 'ා', 'ි', 'ී', 'ු', 'ූ', 'ෙ', 'ො', '්']
+LATIN = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def _sinhala_word(rng):
+    return ''.join(
+        rng.choice(SINHALA_CONSONANTS) + rng.choice(SINHALA_SIGNS)
+        for _ in range(rng.randint(2, 5))
+    )
+
+
+def _latin_word(rng, capitalize=False):
+    word = ''.join(rng.choice(LATIN) for _ in range(rng.randint(3, 10)))
+    return word.capitalize() if capitalize else word
+
+
+def generate_documents(count, seed=42):
+    """Generate MongoDB-shaped dictionary documents"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        documents.append({
+            '_id': f'{i:024x}',
+            'vedda_word': _sinhala_word(rng),
+            'english_word': _latin_word(rng, capitalize=i % 10 == 0),
+            'sinhala_word': _sinhala_word(rng),
+            'vedda_ipa': '',
+            'sinhala_ipa': 'ˈ' + ''.join(rng.choice(LATIN) for _ in range(6)) if i % 3 else '',
+            'english_ipa': '',
+            'word_type': rng.choice(WORD_TYPES),
+            'usage_example': '' if i % 4 else _sinhala_word(rng) + ' ' + _sinhala_word(rng),
+            'frequency_score': 1.0,
+            'confidence_score': 0.95
+        })
+    return documents
+
+
+def build_legacy(documents):
+    """The pre-columnar layout: one 11-key dict per entry, seven maps, all_words list"""
+    dictionary = {
+        'vedda_to_english': {}, 'english_to_vedda': {},
+        'vedda_to_sinhala': {}, 'sinhala_to_vedda': {},
+        'english_to_sinhala': {}, 'sinhala_to_english': {},
+        'all_words': [], 'word_map': {}
+    }
+    for doc in documents:
+        vedda_word = doc.get('vedda_word', '').strip()
+        english_word = doc.get('english_word', '').strip()
+        sinhala_word = doc.get('sinhala_word', '').strip()
+        word_entry = {
+            'id': str(doc['_id']),
+            'vedda_word': vedda_word,
+            'english_word': english_word,
+            'sinhala_word': sinhala_word,
+            'vedda_ipa': doc.get('vedda_ipa', ''),
+            'sinhala_ipa': doc.get('sinhala_ipa', ''),
+            'english_ipa': doc.get('english_ipa', ''),
+            'word_type': doc.get('word_type', ''),
+            'usage_example': doc.get('usage_example', ''),
+            'frequency_score': doc.get('frequency_score', 1.0),
+            'confidence_score': doc.get('confidence_score', 0.95)
+        }
+        if vedda_word and english_word:
+            dictionary['vedda_to_english'][vedda_word.lower()] = word_entry
+            dictionary['english_to_vedda'][english_word.lower()] = word_entry
+        if vedda_word and sinhala_word:
+            dictionary['vedda_to_sinhala'][vedda_word.lower()] = word_entry
+            dictionary['sinhala_to_vedda'][sinhala_word.lower()] = word_entry
+        if english_word and sinhala_word:
+            dictionary['english_to_sinhala'][english_word.lower()] = word_entry
+            dictionary['sinhala_to_english'][sinhala_word.lower()] = word_entry
+        dictionary['all_words'].append(word_entry)
+        dictionary['word_map'][word_entry['id']] = word_entry
+
+    word_type_index = {}
+    for word in dictionary['all_words']:
+        word_type_index.setdefault(word.get('word_type', 'unknown'), []).append(word)
+    return dictionary, word_type_index
+
+
+def measure(label, builder, documents):
+    """Return (retained bytes, build seconds) for the structure built from *documents*"""
+    # Copy the source documents so their strings are not shared with the result
+    source = [dict((k, (v + ' ')[:-1] if isinstance(v, str) else v) for k, v in doc.items())
+              for doc in documents]
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = builder(source)
+    elapsed = time.perf_counter() - start
+    del source
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {retained / 1024 / 1024:>9.1f} MB  {elapsed * 1000:>9.1f} ms")
+    return retained, elapsed, result
+
+
+def time_scan(label, scan):
+    start = time.perf_counter()
+    for query in ('ka', 'ම', 'ab', 'zz'):
+        scan(query)
+    elapsed = (time.perf_counter() - start) * 1000 / 4
+    print(f"{label:<22} {elapsed:>9.2f} ms per scan")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    print(f"Generating {count:,} synthetic entries...")
+    documents = generate_documents(count)
+
+    print(f"\n{'Layout':<22} {'Memory':>12} {'Build':>12}")
+    print('-' * 48)
+    legacy_bytes, _, (legacy, _) = measure('legacy dict entries', build_legacy, documents)
+    store_bytes, _, store = measure('columnar EntryStore', EntryStore.from_documents, documents)
+    print(f"\nMemory reduction: {legacy_bytes / store_bytes:.1f}x")
+
+    print("\nAll-language substring scan")
+    print('-' * 48)
+    time_scan('legacy dict entries', lambda q: [
+        e for e in legacy['all_words']
+        if (q in e['vedda_word'].lower() or q in e['english_word'].lower() or
+            q in e['sinhala_word'].lower() or q in e.get('usage_example', '').lower())
+    ])
+    time_scan('columnar EntryStore', lambda q: store.scan(q, (
+        'vedda_word', 'english_word', 'sinhala_word', 'usage_example'
+    )))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Multi-Worker Memory Benchmark for the Dictionary Service
+Starts 1, 4 and 8 worker processes that either load a private copy of the
+dictionary (the snapshot file rebuilt into an EntryStore, as a single
+process does today) or attach to one shared memory-mapped snapshot, and
+reports their combined proportional set size (PSS, shared pages split
+between the processes that map them). Linux only; no service or database
+is required.
+
+Usage: python benchmark_shared.py [entries]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from app.services.entry_store import EntryStore
+from app.services.mapped_store import MappedEntryStore, save_mapped_store
+from app.services.snapshot_file import load_snapshot, save_snapshot
+from benchmark_memory import DEFAULT_ENTRIES, generate_documents
+
+WORKER_COUNTS = (1, 4, 8)
+QUERIES = ('ka', 'ම', 'ab', 'zz')
+
+
+def memory_kb():
+    """(PSS, RSS) of this process in kB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Pss', 'Rss'):
+                values[name] = int(rest.split()[0])
+    return values['Pss'], values['Rss']
+
+
+def exercise(store):
+    """Touch the store the way request traffic would"""
+    for query in QUERIES:
+        rows = store.scan(query, ('vedda_word', 'english_word', 'sinhala_word', 'usage_example'))
+        store.entries(rows[:50])
+    for row in range(0, len(store), 97):
+        store.entry(row)
+
+
+def worker(mode, path, ready, release, results):
+    before, _ = memory_kb()
+    if mode == 'shared':
+        store = MappedEntryStore.open(path)
+    else:
+        store, _ = load_snapshot(path)
+    exercise(store)
+    ready.wait()  # every worker has loaded, so shared pages are split between all of them
+    after, rss = memory_kb()
+    results.put((after - before, rss))
+    release.wait()
+
+
+def run(mode, path, workers):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(workers)
+    release = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, path, ready, release, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    release.wait()
+    for process in processes:
+        process.join()
+    total_pss = sum(pss for pss, _ in measured) / 1024
+    max_rss = max(rss for _, rss in measured) / 1024
+    return total_pss, max_rss
+
+
+def main():
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("This benchmark needs Linux /proc/self/smaps_rollup")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    print(f"Generating {count:,} synthetic entries...")
+    store = EntryStore.from_documents(generate_documents(count))
+
+    shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=shm) as tmp:
+        private_path = os.path.join(tmp, 'dictionary.snap')
+        shared_path = os.path.join(tmp, 'dictionary.map')
+        save_snapshot(store, private_path, 'benchmark.1')
+        save_mapped_store(store, shared_path, 'benchmark', 1)
+        print(f"Shared snapshot file: {os.path.getsize(shared_path) / 1024 / 1024:.1f} MB")
+
+        print(f"\n{'Workers':<9} {'Layout':<16} {'Total PSS':>12} {'Max RSS/worker':>16}")
+        print('-' * 56)
+        for workers in WORKER_COUNTS:
+            for mode, path in (('private', private_path), ('shared', shared_path)):
+                total_pss, max_rss = run(mode, path, workers)
+                print(f"{workers:<9} {mode + ' copy' if mode == 'private' else 'shared mmap':<16} "
+                      f"{total_pss:>9.1f} MB {max_rss:>13.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Cold Start Benchmark for the Dictionary Service
+Compares building the in-memory dictionary from documents (what every start
+did before, minus the MongoDB network transfer) against loading the on-disk
+snapshot file. No service or database is required.
+
+Usage: python benchmark_startup.py [entries]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from app.services.entry_store import EntryStore
+from app.services.snapshot_file import load_snapshot, save_snapshot
+from benchmark_memory import DEFAULT_ENTRIES, generate_documents
+
+RUNS = 3
+
+
+def best_of(runs, fn):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    print(f"Generating {count:,} synthetic entries...")
+    documents = generate_documents(count)
+
+    build_ms, store = best_of(RUNS, lambda: EntryStore.from_documents(documents))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dictionary.snap')
+        save_ms, _ = best_of(1, lambda: save_snapshot(store, path, 'benchmark.1'))
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        load_ms, (loaded, _) = best_of(RUNS, lambda: load_snapshot(path))
+
+    assert len(loaded) == len(store)
+
+    print(f"\n{'Step':<40} {'Time':>10}")
+    print('-' * 52)
+    print(f"{'Index build from documents (no network)':<40} {build_ms:>8.1f}ms")
+    print(f"{'Snapshot file save':<40} {save_ms:>8.1f}ms")
+    print(f"{'Snapshot file load':<40} {load_ms:>8.1f}ms")
+    print(f"\nSnapshot file size: {size_mb:.1f} MB")
+    print(f"Cold start speedup (excluding MongoDB transfer): {build_ms / load_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+In-Process Benchmark Suite for the Dictionary Service
+Builds a DictionaryService against an in-memory stand-in for the MongoDB
+collection, filled with a synthetic dictionary (realistic Sinhala-script
+words, see benchmark_memory), and measures load time, memory and the read
+and write paths at each requested size. No service or database is
+required, so results are comparable between runs and machines.
+
+Results are printed as a table and can be written as JSON; --compare checks
+them against an earlier JSON file and exits non-zero on regressions.
+
+Usage: python benchmark_suite.py [--sizes 1000,10000,100000] [--json results.json]
+                                 [--compare baseline.json] [--tolerance 0.25]
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.services import dictionary_service as dictionary_module
+from app.services.dictionary_service import DictionaryService
+from app.services.romanization import romanize
+from benchmark_memory import generate_documents
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+BATCH_SIZE = 100
+
+# Operations per measurement (writes are slower, so they run fewer times)
+ITERATIONS = {
+    'translate_hit': 5000,
+    'translate_miss': 2000,
+    'lookup_batch': 200,
+    'search_substring': 200,
+    'search_romanized': 200,
+    'random_words': 1000,
+    'add_word': 200,
+    'update_word': 200,
+    'apply_changes': 20,
+    'reload': 3
+}
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for DictionaryService, held in memory"""
+
+    def __init__(self, documents):
+        self.documents = {str(doc['_id']): doc for doc in documents}
+        self._next_id = len(documents)
+        # add_word looks words up by all three fields; keep that O(1) like an indexed query
+        self._by_words = {self._words(doc): doc for doc in documents}
+
+    @staticmethod
+    def _words(doc):
+        return doc.get('vedda_word'), doc.get('sinhala_word'), doc.get('english_word')
+
+    def find(self, query=None, projection=None):
+        return iter(list(self.documents.values()))
+
+    def find_one(self, query):
+        if set(query) == {'vedda_word', 'sinhala_word', 'english_word'}:
+            doc = self._by_words.get(self._words(query))
+            return doc if doc is not None and str(doc['_id']) in self.documents else None
+        for doc in self.documents.values():
+            if all(doc.get(field) == value for field, value in query.items()):
+                return doc
+        return None
+
+    def count_documents(self, query):
+        return len(self.documents)
+
+    def insert_one(self, document):
+        document = dict(document, _id=f'{self._next_id:024x}')
+        self._next_id += 1
+        self.documents[document['_id']] = document
+        self._by_words[self._words(document)] = document
+        return SimpleNamespace(inserted_id=document['_id'])
+
+    def update_one(self, query, update):
+        doc = self.documents.get(str(query['_id']))
+        if doc is not None:
+            doc.update(update.get('$set', {}))
+        return SimpleNamespace(matched_count=int(doc is not None), modified_count=int(doc is not None))
+
+    def delete_one(self, query):
+        return SimpleNamespace(deleted_count=int(self.documents.pop(str(query['_id']), None) is not None))
+
+
+def timed(iterations, operation, setup=None):
+    """Run *operation(i)* repeatedly (after untimed *setup(i)*); throughput and latency percentiles in microseconds"""
+    latencies = []
+    for i in range(iterations):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter_ns()
+        operation(i)
+        latencies.append((time.perf_counter_ns() - start) / 1000)
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+    total = sum(latencies)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / (total / 1_000_000), 1) if total else None,
+        'p50_us': percentile(0.50),
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'max_us': round(latencies[-1], 2)
+    }
+
+
+def measure_load(documents):
+    """Cold load time and the memory retained by the loaded service"""
+    collection = FakeCollection(documents)
+    with patch.object(dictionary_module, 'dictionary_collection', lambda: collection):
+        start = time.perf_counter()
+        DictionaryService()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        gc.collect()
+        tracemalloc.start()
+        service = DictionaryService()
+        service._build_romanized()
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return round(load_ms, 1), round(retained / 1024 / 1024, 1)
+
+
+def run_size(count, seed):
+    """All measurements for one dictionary size"""
+    documents = generate_documents(count, seed)
+    rng = random.Random(seed)
+    sample = [documents[rng.randrange(count)] for _ in range(5000)]
+    load_ms, memory_mb = measure_load(documents)
+
+    collection = FakeCollection(documents)
+    results = {'entries': count, 'load_ms': load_ms, 'memory_mb': memory_mb, 'operations': {}}
+    operations = results['operations']
+
+    with patch.object(dictionary_module, 'dictionary_collection', lambda: collection):
+        service = DictionaryService()
+        service._build_romanized()
+
+        def translate(i):
+            doc = sample[i % len(sample)]
+            service.fast_translate(doc['sinhala_word'], 'sinhala', 'vedda')
+
+        def clear_caches(i):
+            for cache in service.caches.values():
+                cache.clear()
+
+        # Uncached: every translation is a probe of the snapshot's word index
+        operations['translate_hit'] = timed(ITERATIONS['translate_hit'], translate)
+        operations['translate_miss'] = timed(
+            ITERATIONS['translate_miss'], lambda i: service.fast_translate(f'missing{i}', 'english', 'vedda'))
+
+        batches = [[doc['english_word'] for doc in sample[i:i + BATCH_SIZE]]
+                   for i in range(0, len(sample) - BATCH_SIZE, BATCH_SIZE)]
+        operations['lookup_batch'] = timed(
+            ITERATIONS['lookup_batch'],
+            lambda i: service.lookup_entries(batches[i % len(batches)], 'english', 'vedda'))
+
+        # Caches are cleared before every search, so each one scans
+        fragments = [doc['sinhala_word'][1:3] if i % 2 else doc['vedda_word'][:3] for i, doc in enumerate(sample)]
+        operations['search_substring'] = timed(
+            ITERATIONS['search_substring'],
+            lambda i: service.search_dictionary(fragments[i % len(fragments)]), clear_caches)
+        romanized = [romanize(doc['sinhala_word']) for doc in sample]
+        operations['search_romanized'] = timed(
+            ITERATIONS['search_romanized'],
+            lambda i: service.search_dictionary(romanized[i % len(romanized)]), clear_caches)
+
+        operations['random_words'] = timed(ITERATIONS['random_words'], lambda i: service.get_random_words(10))
+
+        # Writes: only the request-path part (the snapshot rebuild is measured as 'reload')
+        with patch.object(service, 'request_reload', lambda: None):
+            operations['add_word'] = timed(
+                ITERATIONS['add_word'],
+                lambda i: service.add_word(f'වචන{i}', f'benchmark{i}', f'සිංහල{i}'))
+            operations['update_word'] = timed(
+                ITERATIONS['update_word'],
+                lambda i: service.update_word(str(sample[i % len(sample)]['_id']), {'word_type': 'noun'}))
+
+        operations['apply_changes'] = timed(
+            ITERATIONS['apply_changes'],
+            lambda i: service.apply_changes([dict(sample[i], usage_example=f'changed {i}')], []))
+        operations['reload'] = timed(ITERATIONS['reload'], lambda i: service.reload())
+        service._build_romanized()
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against *baseline*: slower p50 or lower throughput beyond *tolerance*"""
+    previous = {run['entries']: run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in results['runs']:
+        before = previous.get(run['entries'])
+        if before is None:
+            continue
+        if run['load_ms'] > before['load_ms'] * (1 + tolerance):
+            regressions.append(f"{run['entries']:,} entries load: {before['load_ms']}ms -> {run['load_ms']}ms")
+        for name, stats in run['operations'].items():
+            old = before['operations'].get(name)
+            if old and stats['p50_us'] > old['p50_us'] * (1 + tolerance):
+                regressions.append(f"{run['entries']:,} entries {name} p50: "
+                                   f"{old['p50_us']}us -> {stats['p50_us']}us")
+    return regressions
+
+
+def print_run(run):
+    print(f"\n{run['entries']:,} entries - load {run['load_ms']:.1f}ms, {run['memory_mb']:.1f} MB retained")
+    print(f"{'Operation':<18} {'ops/s':>12} {'p50':>10} {'p95':>10} {'p99':>10}")
+    print('-' * 64)
+    for name, stats in run['operations'].items():
+        print(f"{name:<18} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>8.1f}us "
+              f"{stats['p95_us']:>8.1f}us {stats['p99_us']:>8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated dictionary sizes (1000 to 1000000)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'runs': []
+    }
+    for count in sizes:
+        print(f"Benchmarking {count:,} synthetic entries...")
+        run = run_size(count, args.seed)
+        results['runs'].append(run)
+        print_run(run)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
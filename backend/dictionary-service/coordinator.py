@@ -0,0 +1,20 @@
+"""
+Dictionary coordinator for multi-worker deployments.
+
+Loads the dictionary, follows MongoDB changes and publishes every snapshot
+to DICTIONARY_SHARED_DIR; the HTTP workers (DICTIONARY_SHARED_MODE=worker)
+map it read-only. Started automatically by gunicorn.conf.py.
+"""
+
+import os
+import threading
+
+os.environ['DICTIONARY_SHARED_MODE'] = 'coordinator'
+
+from app import create_app  # noqa: E402
+
+app = create_app()
+
+if __name__ == "__main__":
+    print(f"Dictionary coordinator publishing to {app.config['DICTIONARY_SHARED_DIR']}")
+    threading.Event().wait()
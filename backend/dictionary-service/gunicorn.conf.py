@@ -0,0 +1,31 @@
+"""
+Multi-worker setup: gunicorn -c gunicorn.conf.py run:app
+
+A single coordinator process builds and publishes the dictionary; every
+worker maps the same read-only snapshot, so memory stays flat as
+DICTIONARY_WORKERS grows.
+"""
+
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5002')}"
+workers = int(os.getenv('DICTIONARY_WORKERS', '4'))
+threads = int(os.getenv('DICTIONARY_THREADS', '4'))
+raw_env = ['DICTIONARY_SHARED_MODE=worker']
+
+_coordinator = None
+
+
+def on_starting(server):
+    global _coordinator
+    env = dict(os.environ, DICTIONARY_SHARED_MODE='coordinator')
+    _coordinator = subprocess.Popen([sys.executable, 'coordinator.py'], env=env,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def on_exit(server):
+    if _coordinator is not None:
+        _coordinator.terminate()
+        _coordinator.wait(timeout=10)
@@ -6,11 +6,19 @@ without a live database or web server.  bson, pandas, and pymongo are all
 real packages (installed in the project) and are NOT replaced.
 """
 
+import gzip
+import json
+import os
 import sys
 import types
 import pathlib
+import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch, Mock
+from datetime import datetime, timedelta
+
+from pymongo.errors import PyMongoError
 
 # ---------------------------------------------------------------------------
 # Flush any 'app' package left in sys.modules by a previously-run service's
@@ -55,7 +63,17 @@ sys.modules["app.db.mongo"] = _mongo_mod
 
 sys.path.insert(0, _svc_root)
 
-from app.services.dictionary_service import LRUCache, DictionaryService  # noqa: E402
+from app.services.dictionary_service import LRUCache, ShardedLRUCache, DictionaryService  # noqa: E402
+from app.services.entry_store import EntryStore  # noqa: E402
+from app.services.snapshot_file import SnapshotFileError, load_snapshot, save_snapshot  # noqa: E402
+from app.services.change_feed import DictionaryChangeFeed  # noqa: E402
+from app.services import dictionary_export  # noqa: E402
+from app.services.dictionary_export import encode_records  # noqa: E402
+from app.services.romanization import RomanizedIndex, fold, romanize, romanized_key  # noqa: E402
+from app.services.mapped_store import MappedEntryStore, save_mapped_store  # noqa: E402
+from app.services.shared_snapshot import (  # noqa: E402
+    SharedSnapshotFollower, SharedSnapshotPublisher, read_pointer
+)
 
 
 # ---------------------------------------------------------------------------
@@ -127,34 +145,7 @@ def _make_service(words=None):
     if words is None:
         words = [SAMPLE_WORD, SAMPLE_WORD_2]
 
-    svc = object.__new__(DictionaryService)
-
-    # Build the dictionary structure manually (mirrors load_dictionary logic)
-    dictionary = {
-        "vedda_to_english": {},
-        "english_to_vedda": {},
-        "vedda_to_sinhala": {},
-        "sinhala_to_vedda": {},
-        "english_to_sinhala": {},
-        "sinhala_to_english": {},
-        "all_words": [],
-        "word_map": {},
-    }
-    for w in words:
-        v, e, s = w["vedda_word"].lower(), w["english_word"].lower(), w["sinhala_word"].lower()
-        dictionary["vedda_to_english"][v] = w
-        dictionary["english_to_vedda"][e] = w
-        dictionary["vedda_to_sinhala"][v] = w
-        dictionary["sinhala_to_vedda"][s] = w
-        dictionary["english_to_sinhala"][e] = w
-        dictionary["sinhala_to_english"][s] = w
-        dictionary["all_words"].append(w)
-        dictionary["word_map"][w["id"]] = w
-
-    svc.dictionary = dictionary
-    svc.translation_cache = LRUCache(maxsize=10)
-    svc._build_fast_indexes()
-    return svc
+    return DictionaryService(store=EntryStore.from_documents(words))
 
 
 # ---------------------------------------------------------------------------
@@ -229,22 +220,667 @@ class TestLRUCache(unittest.TestCase):
         self.assertEqual(cache.info()["size"], 1)
 
 
+    def test_eviction_is_counted(self):
+        cache = LRUCache(maxsize=1)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.info()["evictions"], 1)
+
+    def test_default_distinguishes_cached_none(self):
+        cache = LRUCache(maxsize=5)
+        marker = object()
+        cache.put("k", None)
+        self.assertIsNone(cache.get("k", marker))
+        self.assertIs(cache.get("missing", marker), marker)
+
+
+class TestShardedLRUCache(unittest.TestCase):
+
+    def test_keys_round_trip_across_shards(self):
+        cache = ShardedLRUCache(maxsize=64, shards=4)
+        for i in range(20):
+            cache.put((1, f"word{i}"), i)
+        for i in range(20):
+            self.assertEqual(cache.get((1, f"word{i}")), i)
+        self.assertEqual(cache.info()["size"], 20)
+
+    def test_info_reports_hit_rate_and_evictions(self):
+        cache = ShardedLRUCache(maxsize=2, shards=1)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+        cache.get("c")
+        cache.get("a")
+        info = cache.info()
+        self.assertEqual(info["evictions"], 1)
+        self.assertEqual(info["hit_rate"], 0.5)
+
+    def test_concurrent_access_keeps_size_bounded(self):
+        import threading
+        cache = ShardedLRUCache(maxsize=32, shards=4)
+
+        def worker(offset):
+            for i in range(500):
+                cache.put((offset, i), i)
+                cache.get((offset, i - 1))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = cache.info()
+        self.assertLessEqual(info["size"], info["maxsize"])
+        self.assertEqual(info["hits"] + info["misses"], 8 * 500)
+
+
 # ---------------------------------------------------------------------------
-# DictionaryService._build_fast_indexes()
+# EntryStore
 # ---------------------------------------------------------------------------
 
-class TestBuildFastIndexes(unittest.TestCase):
+class TestEntryStore(unittest.TestCase):
 
     def test_word_type_index_built_correctly(self):
         svc = _make_service()
-        self.assertIn("noun", svc.word_type_index)
-        self.assertEqual(len(svc.word_type_index["noun"]), 2)
+        self.assertIn("noun", svc.store.type_rows)
+        self.assertEqual(len(svc.store.type_rows["noun"]), 2)
 
-    def test_unknown_type_grouped_together(self):
-        # word_type key is absent entirely → falls back to 'unknown' via .get()
+    def test_missing_type_grouped_as_blank(self):
+        # Mongo documents without word_type are stored (and indexed) as ''
         word_no_type = {k: v for k, v in SAMPLE_WORD.items() if k != "word_type"}
         svc = _make_service(words=[word_no_type])
-        self.assertIn("unknown", svc.word_type_index)
+        self.assertIn("", svc.store.type_rows)
+
+    def test_lookup_maps_hold_row_ids(self):
+        store = EntryStore.from_documents([SAMPLE_WORD, SAMPLE_WORD_2])
+        self.assertEqual(store.maps["english"]["village"], 1)
+        self.assertEqual(store.lookup("english", "vedda", "village"), 1)
+
+    def test_entry_round_trips_all_fields(self):
+        store = EntryStore.from_documents([SAMPLE_WORD])
+        self.assertEqual(store.entry(0), SAMPLE_WORD)
+
+    def test_mongo_document_id_and_defaults(self):
+        store = EntryStore.from_documents([
+            {"_id": "507f1f77bcf86cd799439011", "vedda_word": " Maya ", "english_word": "Me"}
+        ])
+        entry = store.entry(0)
+        self.assertEqual(entry["id"], "507f1f77bcf86cd799439011")
+        self.assertEqual(entry["vedda_word"], "Maya")
+        self.assertEqual(entry["frequency_score"], 1.0)
+        self.assertEqual(entry["confidence_score"], 0.95)
+        self.assertEqual(store.lookup("vedda", "english", "maya"), 0)
+        # No Sinhala word means no Sinhala pairing
+        self.assertIsNone(store.lookup("vedda", "sinhala", "maya"))
+
+    def test_newer_row_without_target_keeps_older_pairing(self):
+        # Legacy per-pair maps kept the last row that had *both* sides
+        partial = {**SAMPLE_WORD_2, "id": "zzz999", "english_word": "water", "vedda_word": ""}
+        store = EntryStore.from_documents([SAMPLE_WORD, partial])
+        self.assertEqual(store.lookup("english", "vedda", "water"), 0)
+        self.assertEqual(store.lookup("english", "sinhala", "water"), 1)
+
+    def test_key_columns_are_lowercased(self):
+        store = EntryStore.from_documents([{**SAMPLE_WORD, "english_word": "Water"}])
+        self.assertEqual(store.keys["english_word"][0], "water")
+        self.assertEqual(store.entry(0)["english_word"], "Water")
+
+    def test_scan_multiple_fields_returns_sorted_unique_rows(self):
+        store = EntryStore.from_documents([SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3])
+        rows = store.scan("a", ["english_word", "vedda_word"])
+        self.assertEqual(rows, [0, 1])
+
+
+# ---------------------------------------------------------------------------
+# DictionaryService snapshots
+# ---------------------------------------------------------------------------
+
+class TestSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service()
+
+    def test_publish_bumps_version_and_swaps_reference(self):
+        before = self.svc.snapshot()
+        after = self.svc.publish(EntryStore.from_documents([SAMPLE_WORD_3]))
+        self.assertEqual(after.version, before.version + 1)
+        self.assertIs(self.svc.snapshot(), after)
+        self.assertNotEqual(before.tag, after.tag)
+
+    def test_pinned_snapshot_is_unaffected_by_publish(self):
+        pinned = self.svc.snapshot()
+        self.svc.publish(EntryStore())
+        result = self.svc.fast_translate("water", "english", "vedda", pinned)
+        self.assertIsNotNone(result)
+        self.assertIsNone(self.svc.fast_translate("water", "english", "vedda"))
+
+    def test_new_snapshot_does_not_serve_cached_results(self):
+        self.assertIsNone(self.svc.fast_translate("mother", "english", "vedda"))
+        self.svc.publish(EntryStore.from_documents([SAMPLE_WORD_3]))
+        self.assertIsNotNone(self.svc.fast_translate("mother", "english", "vedda"))
+
+    def test_failed_reload_keeps_current_snapshot(self):
+        current = self.svc.snapshot()
+        with patch.object(self.svc, "_read_store", side_effect=Exception("DB down")):
+            self.assertIsNone(self.svc.reload())
+        self.assertIs(self.svc.snapshot(), current)
+
+    def test_request_reload_publishes_in_background(self):
+        current = self.svc.snapshot()
+        store = EntryStore.from_documents([SAMPLE_WORD_3])
+        with patch.object(self.svc, "_read_store", return_value=store):
+            self.svc.request_reload()
+            thread = self.svc._reload_thread
+            if thread is not None:
+                thread.join(timeout=5)
+        self.assertIs(self.svc.store, store)
+        self.assertGreater(self.svc.snapshot().version, current.version)
+
+
+# ---------------------------------------------------------------------------
+# Incremental changes and the cross-replica change feed
+# ---------------------------------------------------------------------------
+
+class TestIncrementalChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EntryStore.from_documents([SAMPLE_WORD, SAMPLE_WORD_2])
+
+    def test_insert_is_appended_and_indexed(self):
+        updated = self.store.with_changes([SAMPLE_WORD_3], [])
+        self.assertEqual(len(updated), 3)
+        self.assertIsNotNone(updated.lookup("english", "vedda", "mother"))
+        self.assertIsNone(self.store.lookup("english", "vedda", "mother"))
+
+    def test_replace_reindexes_changed_word(self):
+        changed = dict(SAMPLE_WORD, english_word="river")
+        updated = self.store.with_changes([changed], [])
+        self.assertEqual(len(updated), 2)
+        self.assertIsNone(updated.lookup("english", "vedda", "water"))
+        row = updated.lookup("english", "vedda", "river")
+        self.assertEqual(updated.entry(row)["id"], "abc123")
+        self.assertIsNotNone(self.store.lookup("english", "vedda", "water"))
+
+    def test_delete_restores_shadowed_pairing(self):
+        newer = dict(SAMPLE_WORD_3, id="newer", vedda_word="", english_word="water")
+        store = EntryStore.from_documents([SAMPLE_WORD, SAMPLE_WORD_2, newer])
+        updated = store.with_changes([], ["newer"])
+        row = updated.lookup("english", "sinhala", "water")
+        self.assertEqual(updated.entry(row)["id"], "abc123")
+        self.assertIsNone(updated.row_for_id("newer"))
+
+    def test_result_matches_a_fresh_build(self):
+        changed = dict(SAMPLE_WORD_2, word_type="place")
+        updated = self.store.with_changes([changed, SAMPLE_WORD_4], ["abc123"])
+        fresh = EntryStore.from_documents([changed, SAMPLE_WORD_4])
+        self.assertEqual(updated.entries(range(len(updated))), fresh.entries(range(len(fresh))))
+        self.assertEqual(updated.maps, fresh.maps)
+        self.assertEqual(updated.type_rows, fresh.type_rows)
+
+    def test_updated_entries_keep_their_row(self):
+        twin = dict(SAMPLE_WORD_3, id="twin", english_word="water")
+        store = EntryStore.from_documents([SAMPLE_WORD, twin, SAMPLE_WORD_2])
+        changed = dict(SAMPLE_WORD, usage_example="edited")
+        updated = store.with_changes([changed], [])
+        # A full load reads the edited document where it was, so the later twin still wins
+        fresh = EntryStore.from_documents([changed, twin, SAMPLE_WORD_2])
+        self.assertEqual(updated.entry(updated.lookup("english", "vedda", "water"))["id"], "twin")
+        self.assertEqual(updated.entries(range(len(updated))), fresh.entries(range(len(fresh))))
+        self.assertEqual((updated.maps, updated.fallbacks), (fresh.maps, fresh.fallbacks))
+
+    def test_mixed_changes_match_a_fresh_build_in_load_order(self):
+        documents = [dict(SAMPLE_WORD_3, id=f"w{i}", english_word=f"word{i % 4}", sinhala_word=f"s{i % 3}",
+                          vedda_word="" if i % 5 == 0 else f"v{i}", word_type=f"t{i % 2}",
+                          vedda_ipa="x" if i % 2 else "") for i in range(12)]
+        store = EntryStore.from_documents(documents)
+        upserts = [dict(documents[3], english_word="word1", word_type="t9", vedda_ipa=""),
+                   dict(documents[7], vedda_word=""),
+                   dict(documents[3], english_word="word2", word_type="t9", vedda_ipa="y"),
+                   dict(SAMPLE_WORD_3, id="new", english_word="word2")]
+        updated = store.with_changes(upserts, ["w5", "w9"])
+
+        expected = [doc for doc in documents if doc["id"] not in ("w5", "w9")]
+        expected = [upserts[2] if doc["id"] == "w3" else upserts[1] if doc["id"] == "w7" else doc
+                    for doc in expected] + [upserts[3]]
+        fresh = EntryStore.from_documents(expected)
+        self.assertEqual(updated.entries(range(len(updated))), fresh.entries(range(len(fresh))))
+        self.assertEqual((updated.maps, updated.fallbacks), (fresh.maps, fresh.fallbacks))
+        self.assertEqual((updated.type_rows, updated.ipa_counts), (fresh.type_rows, fresh.ipa_counts))
+        self.assertEqual(updated.id_rows, fresh.id_rows)
+
+    def test_apply_changes_publishes_new_version(self):
+        svc = DictionaryService(store=self.store)
+        before = svc.snapshot()
+        after = svc.apply_changes([SAMPLE_WORD_3], ["def456"])
+        self.assertEqual(after.version, before.version + 1)
+        self.assertIsNotNone(svc.fast_translate("mother", "english", "vedda"))
+        self.assertIsNone(svc.fast_translate("village", "english", "vedda"))
+
+
+class _PollCollection:
+    """The few dictionary collection queries a change feed poll makes, over a list of documents"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, condition in (query or {}).items():
+            value = doc.get(field)
+            if "$exists" in condition and (value is not None) != condition["$exists"]:
+                return False
+            if "$gte" in condition and (value is None or value < condition["$gte"]):
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        return True
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query)
+        return [dict(doc) for doc in self.docs if self._matches(doc, query)]
+
+    def find_one(self, query=None, projection=None, sort=None):
+        docs = [doc for doc in self.docs if self._matches(doc, query)]
+        return max(docs, key=lambda doc: doc["last_updated"]) if docs else None
+
+    def count_documents(self, query):
+        return len(self.docs)
+
+
+class TestChangeFeedPolling(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service()
+        self.feed = DictionaryChangeFeed(self.svc, mode="poll", watermark_overlap=60)
+        self.docs = [dict(SAMPLE_WORD, _id="abc123"), dict(SAMPLE_WORD_2, _id="def456")]
+        self.collection = _PollCollection(self.docs)
+        patcher = patch("app.services.change_feed.dictionary_collection", return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _edit(self, index, when, **fields):
+        self.docs[index] = dict(self.docs[index], last_updated=when, **fields)
+
+    def test_watermark_is_seeded_when_no_document_had_one(self):
+        self.feed.poll_once()
+        self.assertIsNone(self.feed._watermark)
+        edited_at = datetime(2024, 5, 1, 12, 0)
+        self._edit(0, edited_at, english_word="river")
+        self.feed.poll_once()
+        self.assertIsNotNone(self.svc.fast_translate("river", "english", "vedda"))
+        self.assertEqual(self.feed._watermark, edited_at)
+        self.assertEqual(self.collection.queries[0], {"last_updated": {"$exists": True}})
+
+    def test_later_polls_read_from_the_watermark_minus_the_overlap(self):
+        edited_at = datetime(2024, 5, 1, 12, 0)
+        self._edit(0, edited_at)
+        self.feed.poll_once()
+        self.feed.poll_once()
+        self.assertEqual(self.collection.queries[-1], {"last_updated": {"$gte": edited_at - timedelta(seconds=60)}})
+
+    def test_writes_older_than_the_newest_seen_are_picked_up(self):
+        newest = datetime(2024, 5, 1, 12, 0)
+        self._edit(0, newest, english_word="river")
+        self.feed.poll_once()
+        # A concurrent writer (or a replica with a slow clock) commits a slightly older timestamp
+        self._edit(1, newest - timedelta(seconds=10), english_word="town")
+        self.feed.poll_once()
+        self.assertIsNotNone(self.svc.fast_translate("town", "english", "vedda"))
+        self.assertEqual(self.feed._watermark, newest)
+
+    def test_unchanged_documents_in_the_overlap_are_not_reapplied(self):
+        self._edit(0, datetime(2024, 5, 1, 12, 0), english_word="river")
+        self.feed.poll_once()
+        version = self.svc.snapshot().version
+        self.feed.poll_once()
+        self.assertEqual(self.svc.snapshot().version, version)
+
+    def test_failed_poll_leaves_last_sync_and_watermark_behind(self):
+        self.feed.poll_once()
+        synced = self.feed.last_sync = self.feed.last_sync - 60
+        self._edit(0, datetime(2024, 5, 1, 12, 0), english_word="river")
+        with patch.object(self.svc, "apply_changes", side_effect=RuntimeError("publish failed")):
+            with self.assertRaises(RuntimeError):
+                self.feed.poll_once()
+        self.assertEqual(self.feed.last_sync, synced)
+        self.assertIsNone(self.feed._watermark)
+        self.feed.poll_once()
+        self.assertIsNotNone(self.svc.fast_translate("river", "english", "vedda"))
+
+    def test_failing_polls_let_staleness_force_a_resync(self):
+        self.feed.max_staleness = 10
+        self.feed.last_sync -= 60
+        self.collection.find = MagicMock(side_effect=PyMongoError("down"))
+        with patch.object(self.svc, "reload", return_value=None) as reload, \
+                patch.object(self.feed._wake, "wait", side_effect=lambda timeout: self.feed.stop()):
+            self.feed._poll_loop()
+        reload.assert_called_once()
+        self.assertTrue(self.feed.info()["stale"])
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service()
+        self.feed = DictionaryChangeFeed(self.svc, mode="poll")
+
+    def test_change_events_are_applied_in_one_publish(self):
+        version = self.svc.snapshot().version
+        events = [
+            {"operationType": "insert", "documentKey": {"_id": "ghi789"},
+             "fullDocument": dict(SAMPLE_WORD_3, _id="ghi789")},
+            {"operationType": "delete", "documentKey": {"_id": "def456"}},
+        ]
+        self.feed.apply_events(events)
+        self.assertEqual(self.svc.snapshot().version, version + 1)
+        self.assertIsNotNone(self.svc.fast_translate("mother", "english", "vedda"))
+        self.assertIsNone(self.svc.fast_translate("village", "english", "vedda"))
+        self.assertEqual(self.feed.applied_changes, 2)
+
+    def test_drop_event_triggers_full_resync(self):
+        with patch.object(self.svc, "reload", return_value=self.svc.snapshot()) as reload:
+            self.feed.apply_events([{"operationType": "drop"}])
+        reload.assert_called_once()
+        self.assertEqual(self.feed.full_resyncs, 1)
+
+    @patch("app.services.change_feed.dictionary_collection")
+    def test_poll_picks_up_deletes_by_count(self, mock_coll_fn):
+        mock_coll = MagicMock()
+        mock_coll.count_documents.return_value = 1
+        mock_coll.find.return_value = [{"_id": "abc123"}]
+        mock_coll_fn.return_value = mock_coll
+
+        self.feed.poll_once()
+
+        self.assertIsNone(self.svc.store.row_for_id("def456"))
+        self.assertIsNotNone(self.svc.store.row_for_id("abc123"))
+
+    @patch("app.services.change_feed.dictionary_collection")
+    def test_poll_without_changes_keeps_snapshot(self, mock_coll_fn):
+        mock_coll = MagicMock()
+        mock_coll.count_documents.return_value = 2
+        mock_coll_fn.return_value = mock_coll
+        current = self.svc.snapshot()
+
+        self.feed.poll_once()
+
+        self.assertIs(self.svc.snapshot(), current)
+        self.assertLess(self.feed.lag_seconds(), 5)
+
+    def test_exceeding_max_staleness_forces_full_resync(self):
+        self.feed.max_staleness = 10
+        self.feed.last_sync -= 60
+        with patch.object(self.svc, "reload", return_value=self.svc.snapshot()) as reload:
+            self.feed._enforce_staleness()
+        reload.assert_called_once()
+        self.assertFalse(self.feed.info()["stale"])
+
+    @patch("app.services.change_feed.dictionary_collection")
+    def test_ensure_indexes_indexes_watermark(self, mock_coll_fn):
+        self.feed.ensure_indexes()
+        mock_coll_fn.return_value.create_index.assert_called_once_with([("last_updated", 1)])
+
+    def test_write_wakes_running_feed_instead_of_reloading(self):
+        self.svc.change_feed = self.feed
+        with patch.object(self.feed, "is_running", return_value=True), \
+                patch.object(self.svc, "request_reload") as reload:
+            self.svc._after_write()
+        reload.assert_not_called()
+        self.assertTrue(self.feed._wake.is_set())
+
+    def test_write_without_feed_reloads(self):
+        with patch.object(self.svc, "request_reload") as reload:
+            self.svc._after_write()
+        reload.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# On-disk snapshot file
+# ---------------------------------------------------------------------------
+
+class TestSnapshotFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "dictionary.snap")
+        partial = {**SAMPLE_WORD_2, "id": "zzz999", "english_word": "Water", "vedda_word": ""}
+        self.words = [SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3, partial]
+        self.store = EntryStore.from_documents(self.words)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_preserves_entries_and_lookups(self):
+        header = save_snapshot(self.store, self.path, tag="abc.3")
+        loaded, loaded_header = load_snapshot(self.path)
+        self.assertEqual(loaded_header["tag"], "abc.3")
+        self.assertEqual(loaded_header["rows"], header["rows"])
+        self.assertEqual(loaded.entries(range(len(loaded))), self.store.entries(range(len(self.store))))
+        self.assertEqual(loaded.maps, self.store.maps)
+        self.assertEqual(loaded.fallbacks, self.store.fallbacks)
+        self.assertEqual(loaded.type_rows, self.store.type_rows)
+        self.assertEqual(loaded.lookup("english", "vedda", "water"), 0)
+        self.assertEqual(loaded.keys["english_word"][3], "water")
+
+    def test_empty_store_round_trips(self):
+        save_snapshot(EntryStore(), self.path)
+        loaded, _ = load_snapshot(self.path)
+        self.assertEqual(len(loaded), 0)
+
+    def test_bad_magic_raises(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot at all")
+        with self.assertRaises(SnapshotFileError):
+            load_snapshot(self.path)
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(SnapshotFileError):
+            load_snapshot(self.path)
+
+    def test_torn_file_fails_checksum(self):
+        save_snapshot(self.store, self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(-3, os.SEEK_END)
+            f.write(b"\xff\xff\xff")
+        with self.assertRaises(SnapshotFileError):
+            load_snapshot(self.path)
+
+    def test_truncated_file_fails_checksum(self):
+        save_snapshot(self.store, self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 8)
+        with self.assertRaises(SnapshotFileError):
+            load_snapshot(self.path)
+
+    def test_save_leaves_no_temp_files(self):
+        save_snapshot(self.store, self.path)
+        save_snapshot(self.store, self.path)
+        self.assertEqual(os.listdir(self.tmp.name), ["dictionary.snap"])
+
+    def test_service_starts_from_file_and_reconciles_in_background(self):
+        save_snapshot(self.store, self.path)
+        with patch.object(DictionaryService, "request_reload") as reload, \
+                patch.object(DictionaryService, "load_dictionary") as load:
+            svc = DictionaryService(snapshot_path=self.path)
+        load.assert_not_called()
+        reload.assert_called_once()
+        self.assertEqual(len(svc.store), len(self.words))
+
+    def test_service_falls_back_to_mongo_and_writes_file(self):
+        with patch.object(DictionaryService, "load_dictionary", return_value=self.store):
+            svc = DictionaryService(snapshot_path=self.path)
+        self.assertIs(svc.store, self.store)
+        loaded, header = load_snapshot(self.path)
+        self.assertEqual(header["tag"], svc.snapshot().tag)
+        self.assertEqual(len(loaded), len(self.words))
+
+
+# ---------------------------------------------------------------------------
+# Memory-mapped store shared across worker processes
+# ---------------------------------------------------------------------------
+
+class TestMappedEntryStore(unittest.TestCase):
+
+    def setUp(self):
+        shadowing = dict(SAMPLE_WORD_3, id="zz999", vedda_word="", english_word="Water", sinhala_ipa="x")
+        self.store = EntryStore.from_documents(
+            [SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3, dict(SAMPLE_WORD_4, word_type="verb"), shadowing]
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "dictionary.map")
+        save_mapped_store(self.store, self.path, "coord", 7)
+        self.mapped = MappedEntryStore.open(self.path)
+
+    def tearDown(self):
+        self.mapped = None
+        self.tmp.cleanup()
+
+    def test_origin_and_length(self):
+        self.assertEqual(self.mapped.origin, ("coord", 7))
+        self.assertEqual(len(self.mapped), len(self.store))
+
+    def test_entries_match(self):
+        for row in range(len(self.store)):
+            self.assertEqual(self.mapped.entry(row), self.store.entry(row))
+        self.assertEqual(self.mapped.entry(0, ["english_word", "frequency_score"]),
+                         {"english_word": "water", "frequency_score": 2.0})
+
+    def test_lookups_match_including_fallbacks(self):
+        for source in ("vedda", "english", "sinhala"):
+            for target in ("vedda", "english", "sinhala"):
+                for word in ("water", "වතුර", "දිය රැච්ච", "village", "mother", "අම්මා", "nothing"):
+                    self.assertEqual(self.mapped.lookup(source, target, word),
+                                     self.store.lookup(source, target, word), (source, target, word))
+            self.assertEqual(self.mapped.find(source, "water"), self.store.find(source, "water"))
+
+    def test_scan_and_exact_match(self):
+        for query in ("a", "ම", "water", "බොනවා", "zzz"):
+            self.assertEqual(self.mapped.scan(query, ["vedda_word", "english_word", "sinhala_word",
+                                                      "usage_example"]),
+                             self.store.scan(query, ["vedda_word", "english_word", "sinhala_word",
+                                                     "usage_example"]))
+        self.assertTrue(self.mapped.is_exact(0, "water"))
+        self.assertFalse(self.mapped.is_exact(1, "water"))
+
+    def test_ids_types_and_stats(self):
+        self.assertEqual(self.mapped.row_for_id("ghi789"), self.store.row_for_id("ghi789"))
+        self.assertIsNone(self.mapped.row_for_id("missing"))
+        ids, rows = self.mapped.id_order()
+        self.assertEqual([ids[i] for i in range(len(ids))], self.store.id_order()[0])
+        self.assertEqual(list(rows), self.store.id_order()[1])
+        self.assertEqual({t: list(r) for t, r in self.mapped.type_rows.items()}, self.store.type_rows)
+        self.assertEqual(self.mapped.statistics(), self.store.statistics())
+
+    def test_service_reads_from_mapped_store(self):
+        svc = DictionaryService(store=self.mapped)
+        self.assertEqual(svc.snapshot().tag, "coord.7")
+        self.assertEqual(svc.fast_translate("mother", "english", "vedda")["id"], "ghi789")
+        self.assertEqual(svc.search_dictionary("water", "all")[0]["english_word"], "water")
+        self.assertEqual(len(svc.get_all_words(limit=2)["results"]), 2)
+        self.assertEqual(len(svc.get_random_words(count=1, word_type="verb")), 1)
+
+    def test_romanized_index_is_read_from_the_file(self):
+        with patch("app.services.romanization.romanized_key") as romanized_key_mock:
+            index = self.mapped.romanized("sinhala")
+            rows = index.exact(fold("amma"))
+        romanized_key_mock.assert_not_called()
+        self.assertEqual(rows, self.store.romanized("sinhala").exact(fold("amma")))
+        for lang in ("vedda", "sinhala"):
+            for key in ("amma", "ammi", "ga", "vatura"):
+                self.assertEqual(self.mapped.romanized(lang).exact(fold(key)),
+                                 self.store.romanized(lang).exact(fold(key)), (lang, key))
+                self.assertEqual(self.mapped.romanized(lang).prefix(fold(key)),
+                                 self.store.romanized(lang).prefix(fold(key)), (lang, key))
+        self.assertEqual(self.mapped.romanized("sinhala").fuzzy(fold("gamo"), 1), [1])
+
+    def test_to_entry_store_round_trips(self):
+        copy = self.mapped.to_entry_store()
+        self.assertEqual(copy.entries(range(len(copy))), self.store.entries(range(len(self.store))))
+        self.assertEqual(copy.maps, self.store.maps)
+        self.assertEqual(copy.fallbacks, self.store.fallbacks)
+
+
+class TestSharedSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.coordinator = _make_service()
+        self.publisher = SharedSnapshotPublisher(self.coordinator, self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_writes_file_and_pointer(self):
+        self.publisher.write(self.coordinator.snapshot())
+        pointer = read_pointer(self.tmp.name)
+        self.assertEqual(pointer["version"], self.coordinator.snapshot().version)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, pointer["file"])))
+
+    def test_worker_follows_coordinator_versions(self):
+        self.publisher.write(self.coordinator.snapshot())
+        worker = DictionaryService(store=EntryStore())
+        follower = SharedSnapshotFollower(worker, self.tmp.name)
+        worker.shared = follower
+
+        follower.refresh()
+        self.assertEqual(worker.snapshot().tag, self.coordinator.snapshot().tag)
+        self.assertIsInstance(worker.store, MappedEntryStore)
+
+        self.coordinator.apply_changes([SAMPLE_WORD_3], [])
+        self.publisher.write(self.coordinator.snapshot())
+        worker.reload()
+        self.assertEqual(worker.snapshot().tag, self.coordinator.snapshot().tag)
+        self.assertIsNotNone(worker.fast_translate("mother", "english", "vedda"))
+
+    def test_pointer_ships_changed_ids_to_workers(self):
+        self.publisher.write(self.coordinator.snapshot())
+        worker = DictionaryService(store=EntryStore())
+        follower = SharedSnapshotFollower(worker, self.tmp.name)
+        follower.refresh()
+        since = worker.snapshot().tag
+
+        self.coordinator.apply_changes([SAMPLE_WORD_3], ["def456"])
+        self.publisher.write(self.coordinator.snapshot())
+        self.assertEqual(read_pointer(self.tmp.name)["changes"]["upserted"], ["ghi789"])
+
+        with patch.object(dictionary_export, "diff_stores") as diff:
+            follower.refresh()
+        diff.assert_not_called()
+        header, records = worker.export(since)
+        self.assertEqual(header["mode"], "delta")
+        self.assertEqual([r["id"] for r in records if r["type"] == "delete"], ["def456"])
+
+    def test_worker_diffs_in_background_without_shipped_changes(self):
+        self.publisher.write(self.coordinator.snapshot())
+        worker = DictionaryService(store=EntryStore())
+        follower = SharedSnapshotFollower(worker, self.tmp.name)
+        follower.refresh()
+        since = worker.snapshot().tag
+
+        self.coordinator.apply_changes([SAMPLE_WORD_3], [])
+        self.publisher.published = None  # as if the coordinator had restarted
+        self.publisher.write(self.coordinator.snapshot())
+        self.assertNotIn("changes", read_pointer(self.tmp.name))
+
+        follower.refresh()
+        self.assertTrue(worker.changelog.wait(5))
+        header, _ = worker.export(since)
+        self.assertEqual(header["mode"], "delta")
+        self.assertEqual(header["upserts"], 1)
+
+    def test_refresh_without_new_pointer_keeps_snapshot(self):
+        worker = DictionaryService(store=EntryStore())
+        follower = SharedSnapshotFollower(worker, self.tmp.name)
+        current = worker.snapshot()
+        self.assertIs(follower.refresh(), current)
+
+    def test_old_files_are_pruned(self):
+        for _ in range(5):
+            self.coordinator.publish(self.coordinator.store)
+            self.publisher.write(self.coordinator.snapshot())
+        files = [name for name in os.listdir(self.tmp.name) if name.endswith(".map")]
+        self.assertEqual(len(files), self.publisher.keep)
 
 
 # ---------------------------------------------------------------------------
@@ -270,14 +906,16 @@ class TestFastTranslate(unittest.TestCase):
         result = self.svc.fast_translate("nonexistent", "vedda", "english")
         self.assertIsNone(result)
 
-    def test_result_is_cached_on_second_call(self):
+    def test_exact_lookups_bypass_result_caches(self):
         self.svc.fast_translate("දිය රැච්ච", "vedda", "english")
         self.svc.fast_translate("දිය රැච්ච", "vedda", "english")
-        self.assertEqual(self.svc.translation_cache.info()["hits"], 1)
+        info = self.svc.get_cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["size"]), (0, 0, 0))
 
-    def test_cache_miss_on_first_call(self):
-        self.svc.fast_translate("දිය රැච්ච", "vedda", "english")
-        self.assertEqual(self.svc.translation_cache.info()["misses"], 1)
+    def test_repeat_lookup_returns_fresh_entry(self):
+        first = self.svc.fast_translate("දිය රැච්ච", "vedda", "english")
+        first["english_word"] = "changed"
+        self.assertEqual(self.svc.fast_translate("දිය රැච්ච", "vedda", "english")["english_word"], "water")
 
     def test_english_to_vedda(self):
         result = self.svc.fast_translate("water", "english", "vedda")
@@ -285,6 +923,46 @@ class TestFastTranslate(unittest.TestCase):
         self.assertEqual(result["vedda_word"], "දිය රැච්ච")
 
 
+# ---------------------------------------------------------------------------
+# DictionaryService.lookup_entries()
+# ---------------------------------------------------------------------------
+
+class TestLookupEntries(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service([SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3])
+
+    def test_mixed_sources_return_full_entries(self):
+        results = self.svc.lookup_entries([
+            {"word": "Water", "source": "english"},
+            {"word": "ගම", "source": "sinhala"},
+            {"word": "අම්මිලැත්තෝ", "source": "vedda"},
+        ])
+        self.assertTrue(all(r["found"] for r in results))
+        self.assertEqual(results[0]["entry"]["english_ipa"], "wɔːtər")
+        self.assertEqual(results[1]["entry"]["vedda_word"], "පෝරුගං පොජ්ජ")
+        self.assertEqual(results[2]["entry"]["english_word"], "mother")
+
+    def test_source_all_reports_matched_language(self):
+        results = self.svc.lookup_entries(["village", "වතුර"], source_lang="all")
+        self.assertEqual([r["source"] for r in results], ["english", "sinhala"])
+
+    def test_missing_word_is_not_found(self):
+        result = self.svc.lookup_entries(["zzz"], source_lang="english")[0]
+        self.assertFalse(result["found"])
+        self.assertIsNone(result["entry"])
+
+    def test_fields_projection(self):
+        result = self.svc.lookup_entries(["water"], "english", fields=["vedda_word", "word_type"])[0]
+        self.assertEqual(result["entry"], {"vedda_word": "දිය රැච්ච", "word_type": "noun"})
+
+    def test_target_requires_that_pairing(self):
+        store_words = [SAMPLE_WORD, dict(SAMPLE_WORD_3, id="x", vedda_word="", english_word="water")]
+        svc = _make_service(store_words)
+        result = svc.lookup_entries(["water"], "english", target_lang="vedda")[0]
+        self.assertEqual(result["entry"]["id"], "abc123")
+
+
 # ---------------------------------------------------------------------------
 # DictionaryService.search_dictionary()
 # ---------------------------------------------------------------------------
@@ -335,6 +1013,282 @@ class TestSearchDictionary(unittest.TestCase):
         self.assertIn("දිය රැච්ච", vedda_words)
 
 
+# ---------------------------------------------------------------------------
+# Romanized (Singlish) search
+# ---------------------------------------------------------------------------
+
+class TestRomanizedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service([SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3, SAMPLE_WORD_4])
+
+    def test_romanize_drops_inherent_vowel_before_signs(self):
+        self.assertEqual(romanize("අම්මා"), "ammaa")
+        self.assertEqual(romanize("වතුර"), "wathura")
+
+    def test_spelling_variants_fold_to_one_key(self):
+        self.assertEqual(romanized_key("අම්මා"), fold("amma"))
+        self.assertEqual(fold("ammaa"), fold("Ama"))
+        self.assertEqual(romanized_key("වතුර"), fold("vatura"))
+        self.assertEqual(romanized_key("water"), "")
+
+    def test_index_exact_prefix_and_fuzzy(self):
+        index = RomanizedIndex(["අම්මා", "අම්මිලැත්තෝ", "ගම", "water"])
+        self.assertEqual(index.exact(fold("amma")), [0])
+        self.assertEqual(index.prefix(fold("ammi")), [1])
+        self.assertEqual(index.fuzzy(fold("gamo"), 1), [2])
+        self.assertEqual(len(index), 3)
+
+    def test_index_from_segments_matches_built_index(self):
+        built = RomanizedIndex(["අම්මා", "අම්මිලැත්තෝ", "ගම", "ගම", "water"])
+        data = built.segments()
+        arrays = {}
+        for name in ("key_offsets", "starts", "order"):
+            arrays[name] = memoryview(data[name]).cast("I")
+        index = RomanizedIndex.from_segments(built.size, memoryview(data["key_blob"]), **arrays)
+        self.assertEqual(index.exact(fold("gama")), [2, 3])
+        self.assertEqual(index.prefix(fold("am")), built.prefix(fold("am")))
+        self.assertEqual(index.fuzzy(fold("gamo"), 1), [2, 3])
+        self.assertEqual(len(index), 3)
+
+    def test_index_without_sinhala_words_is_empty(self):
+        index = RomanizedIndex(["water", ""])
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.exact("vater"), [])
+        self.assertEqual(index.prefix("v"), [])
+        self.assertEqual(index.fuzzy("vater", 1), [])
+
+    def test_latin_query_finds_sinhala_word(self):
+        results = self.svc.search_dictionary("amma", source_language="sinhala")
+        self.assertEqual(results[0]["sinhala_word"], "අම්මා")
+
+    def test_latin_query_finds_vedda_word_by_prefix(self):
+        results = self.svc.search_dictionary("ammilae")
+        self.assertEqual([r["id"] for r in results], ["ghi789"])
+
+    def test_english_exact_match_still_ranks_first(self):
+        results = self.svc.search_dictionary("water")
+        self.assertEqual(results[0]["english_word"], "water")
+
+    def test_fuzzy_only_when_nothing_else_matches(self):
+        results = self.svc.search_dictionary("wathurx")
+        self.assertEqual([r["id"] for r in results], ["abc123"])
+
+    def test_english_source_does_not_use_romanized_keys(self):
+        self.assertEqual(self.svc.search_dictionary("amma", source_language="english"), [])
+
+
+# ---------------------------------------------------------------------------
+# DictionaryService.get_all_words()
+# ---------------------------------------------------------------------------
+
+class TestGetAllWords(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service([SAMPLE_WORD_4, SAMPLE_WORD, SAMPLE_WORD_3, SAMPLE_WORD_2])
+
+    def test_unpaged_returns_everything_in_id_order(self):
+        result = self.svc.get_all_words()
+        ids = [r["id"] for r in result["results"]]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(result["total_count"], 4)
+        self.assertIsNone(result["next_cursor"])
+
+    def test_cursor_walks_all_pages_without_overlap(self):
+        seen = []
+        cursor = None
+        while True:
+            page = self.svc.get_all_words(limit=3, cursor=cursor)
+            seen.extend(r["id"] for r in page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["abc123", "def456", "ghi789", "jkl012"])
+
+    def test_cursor_survives_deletes(self):
+        cursor = self.svc.get_all_words(limit=2)["next_cursor"]
+        self.svc.apply_changes([], ["def456"])
+        page = self.svc.get_all_words(limit=2, cursor=cursor)
+        self.assertEqual([r["id"] for r in page["results"]], ["ghi789", "jkl012"])
+        self.assertEqual(page["total_count"], 3)
+
+    def test_offset_is_still_supported(self):
+        page = self.svc.get_all_words(limit=1, offset=2)
+        self.assertEqual(page["results"][0]["id"], "ghi789")
+        self.assertEqual(page["next_cursor"], "ghi789")
+
+    def test_does_not_query_mongo(self):
+        with patch("app.services.dictionary_service.dictionary_collection") as mock_coll_fn:
+            self.svc.get_all_words(limit=2)
+        mock_coll_fn.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# DictionaryService.export()
+# ---------------------------------------------------------------------------
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.svc = _make_service([SAMPLE_WORD, SAMPLE_WORD_2])
+
+    def _records(self, since=None):
+        header, records = self.svc.export(since)
+        return header, list(records)
+
+    def test_full_export_streams_every_entry_in_id_order(self):
+        header, records = self._records()
+        self.assertEqual(header["mode"], "full")
+        self.assertEqual(header["version"], self.svc.snapshot().tag)
+        self.assertEqual([r["type"] for r in records], ["header", "upsert", "upsert", "end"])
+        self.assertEqual([r["entry"]["id"] for r in records[1:3]], ["abc123", "def456"])
+        self.assertEqual(records[1]["entry"], SAMPLE_WORD)
+
+    def test_delta_since_version_contains_only_changes(self):
+        since = self.svc.snapshot().tag
+        self.svc.apply_changes([SAMPLE_WORD_3], [])
+        self.svc.apply_changes([dict(SAMPLE_WORD_2, word_type="place")], ["abc123"])
+        header, records = self._records(since)
+        self.assertEqual(header["mode"], "delta")
+        upserts = {r["entry"]["id"] for r in records if r["type"] == "upsert"}
+        deletes = [r["id"] for r in records if r["type"] == "delete"]
+        self.assertEqual(upserts, {"ghi789", "def456"})
+        self.assertEqual(deletes, ["abc123"])
+
+    def test_delta_after_full_reload_is_diffed(self):
+        since = self.svc.snapshot().tag
+        self.svc.publish(EntryStore.from_documents([SAMPLE_WORD, dict(SAMPLE_WORD_2, usage_example="x")]))
+        self.assertTrue(self.svc.changelog.wait(5))
+        header, records = self._records(since)
+        self.assertEqual(header["mode"], "delta")
+        self.assertEqual([r["entry"]["id"] for r in records if r["type"] == "upsert"], ["def456"])
+        self.assertEqual(header["deletes"], 0)
+
+    def test_full_reload_is_not_diffed_on_the_publish_path(self):
+        since = self.svc.snapshot().tag
+        release = threading.Event()
+        real_diff = dictionary_export.diff_stores
+
+        def slow_diff(old, new):
+            release.wait(5)
+            return real_diff(old, new)
+
+        with patch.object(dictionary_export, "diff_stores", side_effect=slow_diff):
+            self.svc.publish(EntryStore.from_documents([SAMPLE_WORD]))
+            # Still being diffed: a delta cannot be promised yet
+            self.assertEqual(self._records(since)[0]["mode"], "full")
+            release.set()
+            self.assertTrue(self.svc.changelog.wait(5))
+        header, records = self._records(since)
+        self.assertEqual(header["mode"], "delta")
+        self.assertEqual([r["id"] for r in records if r["type"] == "delete"], ["def456"])
+
+    def test_burst_of_reloads_only_diffs_the_newest(self):
+        first = self.svc.snapshot().tag
+        started, release = threading.Event(), threading.Event()
+        real_diff = dictionary_export.diff_stores
+
+        def slow_diff(old, new):
+            started.set()
+            release.wait(5)
+            return real_diff(old, new)
+
+        with patch.object(dictionary_export, "diff_stores", side_effect=slow_diff) as diff:
+            self.svc.publish(EntryStore.from_documents([SAMPLE_WORD]))
+            self.assertTrue(started.wait(5))
+            second = self.svc.snapshot().tag
+            self.svc.publish(EntryStore.from_documents([SAMPLE_WORD, SAMPLE_WORD_3]))
+            third = self.svc.snapshot().tag
+            self.svc.publish(EntryStore.from_documents([SAMPLE_WORD_3]))
+            release.set()
+            self.assertTrue(self.svc.changelog.wait(5))
+        # The first diff was already running; the second step was skipped as a break
+        self.assertEqual(diff.call_count, 2)
+        self.assertEqual(self._records(first)[0]["mode"], "full")
+        self.assertEqual(self._records(second)[0]["mode"], "full")
+        self.assertEqual(self._records(third)[0]["mode"], "delta")
+
+    def test_current_version_gives_empty_delta(self):
+        header, records = self._records(self.svc.snapshot().tag)
+        self.assertEqual(header["mode"], "delta")
+        self.assertEqual([r["type"] for r in records], ["header", "end"])
+
+    def test_unknown_version_falls_back_to_full(self):
+        header, records = self._records("otherinstance.3")
+        self.assertEqual(header["mode"], "full")
+        self.assertIn("reason", header)
+        self.assertEqual(header["upserts"], 2)
+
+    def test_encoded_ndjson_is_gzip_compressed(self):
+        _, records = self.svc.export()
+        body = b"".join(encode_records(records, "ndjson", compress=True))
+        lines = gzip.decompress(body).decode("utf-8").splitlines()
+        self.assertEqual(json.loads(lines[0])["type"], "header")
+        self.assertEqual(json.loads(lines[-1])["type"], "end")
+
+
+# ---------------------------------------------------------------------------
+# DictionaryService.get_statistics()
+# ---------------------------------------------------------------------------
+
+class TestGetStatistics(unittest.TestCase):
+
+    def setUp(self):
+        verb = dict(SAMPLE_WORD_4, word_type="verb", vedda_ipa="apːi")
+        self.svc = _make_service([SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3, verb])
+
+    def test_counts_come_from_memory(self):
+        with patch("app.services.dictionary_service.dictionary_collection") as mock_coll_fn:
+            stats = self.svc.get_statistics()
+        mock_coll_fn.assert_not_called()
+        self.assertEqual(stats["total_words"], 4)
+        self.assertEqual(stats["word_types"], 2)
+        self.assertEqual(stats["type_breakdown"][0], {"type": "noun", "count": 3})
+
+    def test_ipa_coverage(self):
+        coverage = self.svc.get_statistics()["ipa_coverage"]
+        self.assertEqual(coverage["english"], {"count": 4, "percent": 100.0})
+        self.assertEqual(coverage["sinhala"]["count"], 2)
+        self.assertEqual(coverage["vedda"], {"count": 1, "percent": 25.0})
+
+    def test_counters_follow_incremental_changes(self):
+        self.svc.apply_changes([dict(SAMPLE_WORD_2, word_type="place", english_ipa="")], ["jkl012"])
+        stats = self.svc.get_statistics()
+        self.assertEqual(stats["total_words"], 3)
+        self.assertEqual(stats["ipa_coverage"]["vedda"]["count"], 0)
+        self.assertEqual(stats["ipa_coverage"]["english"]["count"], 2)
+        self.assertEqual({t["type"]: t["count"] for t in stats["type_breakdown"]},
+                         {"noun": 2, "place": 1})
+
+    def test_counters_survive_snapshot_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dictionary.snap")
+            save_snapshot(self.svc.store, path)
+            loaded, _ = load_snapshot(path)
+        self.assertEqual(loaded.statistics(), self.svc.store.statistics())
+
+    @patch("app.services.dictionary_service.dictionary_collection")
+    def test_verify_reports_differences(self, mock_coll_fn):
+        mock_coll = MagicMock()
+        mock_coll.count_documents.side_effect = lambda query: 5 if not query else 1
+        mock_coll.aggregate.return_value = [{"_id": "noun", "count": 3}, {"_id": "verb", "count": 1},
+                                            {"_id": None, "count": 1}]
+        mock_coll_fn.return_value = mock_coll
+
+        verification = self.svc.get_statistics(verify=True)["verification"]
+
+        self.assertFalse(verification["consistent"])
+        fields = {d["field"] for d in verification["differences"]}
+        self.assertEqual(fields, {"total_words", "ipa_coverage.english", "ipa_coverage.sinhala"})
+
+    @patch("app.services.dictionary_service.dictionary_collection")
+    def test_verify_failure_keeps_stats(self, mock_coll_fn):
+        mock_coll_fn.return_value.count_documents.side_effect = Exception("DB down")
+        stats = self.svc.get_statistics(verify=True)
+        self.assertEqual(stats["total_words"], 4)
+        self.assertIsNone(stats["verification"]["consistent"])
+
+
 # ---------------------------------------------------------------------------
 # DictionaryService.get_random_words()
 # ---------------------------------------------------------------------------
@@ -350,7 +1304,7 @@ class TestGetRandomWords(unittest.TestCase):
 
     def test_count_is_capped_at_total(self):
         result = self.svc.get_random_words(count=100)
-        self.assertLessEqual(len(result), len(self.svc.dictionary["all_words"]))
+        self.assertLessEqual(len(result), len(self.svc.store))
 
     def test_filter_by_word_type(self):
         result = self.svc.get_random_words(count=10, word_type="noun")
@@ -376,8 +1330,8 @@ class TestCacheManagement(unittest.TestCase):
         self.svc = _make_service()
 
     def test_clear_cache_resets_hits_and_misses(self):
-        self.svc.fast_translate("දිය රැච්ච", "vedda", "english")  # 1 miss
-        self.svc.fast_translate("දිය රැච්ච", "vedda", "english")  # 1 hit
+        self.svc.search_dictionary("a", source_language="all")  # 1 miss
+        self.svc.search_dictionary("a", source_language="all")  # 1 hit
         self.svc.clear_cache()
         info = self.svc.get_cache_info()
         self.assertEqual(info["hits"], 0)
@@ -386,9 +1340,23 @@ class TestCacheManagement(unittest.TestCase):
 
     def test_get_cache_info_returns_dict(self):
         info = self.svc.get_cache_info()
-        for key in ("hits", "misses", "size", "maxsize"):
+        for key in ("hits", "misses", "size", "maxsize", "evictions", "hit_rate"):
             self.assertIn(key, info)
 
+    def test_get_cache_info_reports_each_cache(self):
+        self.svc.search_dictionary("a", source_language="all")
+        self.svc.search_dictionary("a", source_language="all")
+        caches = self.svc.get_cache_info()["caches"]
+        self.assertEqual(set(caches), {"search"})
+        self.assertEqual(caches["search"]["hits"], 1)
+        self.assertEqual(caches["search"]["hit_rate"], 0.5)
+
+    def test_cached_search_returns_fresh_entries(self):
+        first = self.svc.search_dictionary("water", source_language="all")
+        first[0]["english_word"] = "changed"
+        second = self.svc.search_dictionary("water", source_language="all")
+        self.assertEqual(second[0]["english_word"], "water")
+
 
 # ---------------------------------------------------------------------------
 # DictionaryService.add_word()
@@ -408,7 +1376,7 @@ class TestAddWord(unittest.TestCase):
         mock_coll.insert_one.return_value = inserted
         mock_coll_fn.return_value = mock_coll
 
-        with patch.object(self.svc, "load_dictionary", return_value=self.svc.dictionary):
+        with patch.object(self.svc, "request_reload"):
             result = self.svc.add_word("hena", "tree", "gas", word_type="noun")
 
         self.assertTrue(result["success"])
@@ -424,7 +1392,7 @@ class TestAddWord(unittest.TestCase):
         mock_coll.insert_one.return_value = inserted
         mock_coll_fn.return_value = mock_coll
 
-        with patch.object(self.svc, "load_dictionary", return_value=self.svc.dictionary):
+        with patch.object(self.svc, "request_reload"):
             result = self.svc.add_word("දිය රැච්ච", "water", "වතුර")
 
         mock_coll.delete_one.assert_called_once_with({"_id": "oldid"})
@@ -463,7 +1431,7 @@ class TestUpdateWord(unittest.TestCase):
         mock_coll.update_one.return_value = update_result
         mock_coll_fn.return_value = mock_coll
 
-        with patch.object(self.svc, "load_dictionary", return_value=self.svc.dictionary):
+        with patch.object(self.svc, "request_reload"):
             result = self.svc.update_word(_VALID_OID, {"vedda_word": "newmaya"})
 
         self.assertTrue(result["success"])
@@ -510,7 +1478,7 @@ class TestDeleteWord(unittest.TestCase):
         mock_coll.delete_one.return_value = del_result
         mock_coll_fn.return_value = mock_coll
 
-        with patch.object(self.svc, "load_dictionary", return_value=self.svc.dictionary):
+        with patch.object(self.svc, "request_reload"):
             result = self.svc.delete_word(_VALID_OID)
 
         self.assertTrue(result["success"])
@@ -540,28 +1508,23 @@ class TestDeleteWord(unittest.TestCase):
 class TestGetWordTypes(unittest.TestCase):
 
     def setUp(self):
-        self.svc = _make_service()
-
-    @patch("app.services.dictionary_service.dictionary_collection")
-    def test_returns_filtered_list(self, mock_coll_fn):
-        mock_coll = MagicMock()
-        mock_coll.distinct.return_value = ["noun", "verb", "", None, "  "]
-        mock_coll_fn.return_value = mock_coll
+        self.svc = _make_service([
+            SAMPLE_WORD, dict(SAMPLE_WORD_2, word_type="verb"),
+            dict(SAMPLE_WORD_3, word_type=""), dict(SAMPLE_WORD_4, word_type="  "),
+        ])
 
+    def test_returns_filtered_list(self):
         result = self.svc.get_word_types()
-        self.assertIn("noun", result)
-        self.assertIn("verb", result)
-        # empty/whitespace entries should be filtered out
-        self.assertNotIn("", result)
+        self.assertEqual(result, ["noun", "verb"])
 
-    @patch("app.services.dictionary_service.dictionary_collection")
-    def test_db_error_returns_empty_list(self, mock_coll_fn):
-        mock_coll = MagicMock()
-        mock_coll.distinct.side_effect = Exception("DB error")
-        mock_coll_fn.return_value = mock_coll
-
-        result = self.svc.get_word_types()
-        self.assertEqual(result, [])
+    def test_reads_the_pinned_snapshot_not_mongo(self):
+        pinned = self.svc.snapshot()
+        self.svc.publish(EntryStore.from_documents([dict(SAMPLE_WORD, word_type="adjective")]))
+        with patch("app.services.dictionary_service.dictionary_collection") as mock_coll_fn:
+            result = self.svc.get_word_types(pinned)
+        mock_coll_fn.assert_not_called()
+        self.assertEqual(result, ["noun", "verb"])
+        self.assertEqual(self.svc.get_word_types(), ["adjective"])
 
 
 # ---------------------------------------------------------------------------
@@ -591,5 +1554,204 @@ class TestUploadCsv(unittest.TestCase):
         self.assertFalse(result["success"])
 
 
+# ---------------------------------------------------------------------------
+# Routes - exercised through the Flask test client
+# ---------------------------------------------------------------------------
+
+from flask import Flask  # noqa: E402
+from app.routes import dictionary_routes  # noqa: E402
+
+
+class RouteTestCase(unittest.TestCase):
+    """Serves dictionary_bp from a bare Flask app backed by an in-memory service"""
+
+    words = [SAMPLE_WORD, SAMPLE_WORD_2]
+    config = {}
+
+    def setUp(self):
+        self.svc = _make_service(self.words)
+        app = Flask(__name__)
+        app.config.update(self.config)
+        app.register_blueprint(dictionary_routes.dictionary_bp, url_prefix="/api/dictionary")
+        patcher = patch.object(dictionary_routes, "get_dictionary_service", return_value=self.svc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+
+class TestLookupBatchRoute(RouteTestCase):
+
+    words = [SAMPLE_WORD, SAMPLE_WORD_2, SAMPLE_WORD_3]
+
+    def _post(self, payload):
+        return self.client.post("/api/dictionary/lookup/batch", json=payload)
+
+    def test_returns_full_entries_and_version(self):
+        response = self._post({"items": ["water", {"word": "ගම", "source": "sinhala"}, "zzz"],
+                               "source": "english", "fields": ["vedda_word"]})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["count"], 3)
+        self.assertEqual(body["found_count"], 2)
+        self.assertEqual(body["results"][0]["entry"], {"vedda_word": "දිය රැච්ච"})
+        self.assertEqual(body["results"][1]["source"], "sinhala")
+        self.assertEqual(body["version"], self.svc.snapshot().tag)
+        self.assertEqual(response.headers[dictionary_routes.VERSION_HEADER], body["version"])
+
+    def test_batch_at_the_limit_is_accepted(self):
+        response = self._post({"items": ["water"] * dictionary_routes.MAX_LOOKUP_BATCH})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["found_count"], dictionary_routes.MAX_LOOKUP_BATCH)
+
+    def test_batch_over_the_limit_is_rejected(self):
+        response = self._post({"items": ["water"] * (dictionary_routes.MAX_LOOKUP_BATCH + 1)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(dictionary_routes.MAX_LOOKUP_BATCH), response.get_json()["error"])
+
+    def test_bad_payloads_are_rejected(self):
+        payloads = [
+            {},
+            {"items": []},
+            {"items": "water"},
+            {"items": ["water"], "source": "klingon"},
+            {"items": [{"word": "water", "source": "klingon"}]},
+            {"items": ["water"], "target": "klingon"},
+            {"items": ["water"], "fields": []},
+            {"items": ["water"], "fields": "vedda_word"},
+            {"items": ["water"], "fields": ["vedda_word", "password"]},
+            ["water"],
+            "water",
+            7,
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                response = self._post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.get_json())
+
+    def test_non_json_body_is_rejected(self):
+        response = self.client.post("/api/dictionary/lookup/batch", data="water",
+                                    content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestAllWordsRoute(RouteTestCase):
+
+    words = [SAMPLE_WORD_4, SAMPLE_WORD, SAMPLE_WORD_3, SAMPLE_WORD_2]
+
+    def test_cursor_walks_every_page(self):
+        seen = []
+        query = "limit=3"
+        while True:
+            body = self.client.get(f"/api/dictionary/all?{query}").get_json()
+            seen.extend(r["id"] for r in body["results"])
+            if body["next_cursor"] is None:
+                break
+            query = f"limit=3&cursor={body['next_cursor']}"
+        self.assertEqual(seen, ["abc123", "def456", "ghi789", "jkl012"])
+
+    def test_each_page_has_its_own_etag(self):
+        first = self.client.get("/api/dictionary/all?limit=2")
+        second = self.client.get(f"/api/dictionary/all?limit=2&cursor={first.get_json()['next_cursor']}")
+        self.assertTrue(first.headers["ETag"].startswith('W/"'))
+        self.assertNotEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertEqual(first.headers["Cache-Control"], "no-cache")
+
+    def test_unchanged_page_revalidates_to_304(self):
+        etag = self.client.get("/api/dictionary/all?limit=2").headers["ETag"]
+        response = self.client.get("/api/dictionary/all?limit=2", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_snapshot_change_invalidates_etag(self):
+        etag = self.client.get("/api/dictionary/all?limit=2").headers["ETag"]
+        self.svc.apply_changes([], ["def456"])
+        response = self.client.get("/api/dictionary/all?limit=2", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()["total_count"], 3)
+
+    def test_bad_paging_parameters_are_rejected(self):
+        for query in ("limit=-1", "offset=-5", "limit=ten"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/dictionary/all?{query}")
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn("ETag", response.headers)
+
+
+class TestConditionalRoutes(RouteTestCase):
+
+    def test_read_endpoint_sets_snapshot_etag(self):
+        response = self.client.get("/api/dictionary/translate?word=water&source=english&target=vedda")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith(f'W/"{self.svc.snapshot().tag}-'))
+        other = self.client.get("/api/dictionary/translate?word=village&source=english&target=vedda")
+        self.assertNotEqual(other.headers["ETag"], etag)
+
+    def test_if_none_match_returns_304_without_running_the_view(self):
+        url = "/api/dictionary/search?q=water"
+        etag = self.client.get(url).headers["ETag"]
+        with patch.object(self.svc, "search_dictionary") as search:
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        search.assert_not_called()
+
+    def test_stale_etag_gets_a_full_response(self):
+        url = "/api/dictionary/types"
+        etag = self.client.get(url).headers["ETag"]
+        self.svc.apply_changes([dict(SAMPLE_WORD_3, word_type="verb")], [])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("verb", response.get_json()["word_types"])
+
+    def test_cache_control_defaults_to_revalidation(self):
+        response = self.client.get("/api/dictionary/types")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    def test_errors_are_not_conditional(self):
+        response = self.client.get("/api/dictionary/translate?word=zzz&source=english&target=vedda")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response.headers)
+
+
+class TestConditionalRoutesMaxAge(RouteTestCase):
+
+    config = {"DICTIONARY_CACHE_MAX_AGE": 60}
+
+    def test_cacheable_routes_use_max_age(self):
+        response = self.client.get("/api/dictionary/types")
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+
+    def test_revalidated_routes_ignore_max_age(self):
+        response = self.client.get("/api/dictionary/all")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+
+class TestStatsRoute(RouteTestCase):
+
+    def test_stats_is_never_conditional(self):
+        response = self.client.get("/api/dictionary/stats", headers={"If-None-Match": "*"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
+        self.assertEqual(response.headers["Cache-Control"], "no-store")
+        self.assertEqual(response.get_json()["stats"]["total_words"], 2)
+
+    def test_verify_always_reaches_the_database(self):
+        self.client.get("/api/dictionary/stats?verify=true")
+        with patch.object(self.svc, "verify_statistics", return_value={"consistent": True}) as verify:
+            response = self.client.get("/api/dictionary/stats?verify=true")
+        verify.assert_called_once()
+        self.assertEqual(response.get_json()["stats"]["verification"], {"consistent": True})
+
+    def test_live_counters_are_fresh_on_the_same_snapshot(self):
+        first = self.client.get("/api/dictionary/stats").get_json()["stats"]["cache"]["misses"]
+        self.client.get("/api/dictionary/search?q=nothing-here")
+        second = self.client.get("/api/dictionary/stats").get_json()["stats"]["cache"]["misses"]
+        self.assertGreater(second, first)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -6,6 +6,7 @@ from app.db.mongo import init_mongo
 from app.routes.health_routes import health_bp
 from app.routes.history_routes import history_bp
 from app.routes.feedback_routes import feedback_bp
+from app.routes.memory_routes import memory_bp
 
 
 def create_app():
@@ -22,6 +23,7 @@ def create_app():
     app.register_blueprint(health_bp)
     app.register_blueprint(history_bp, url_prefix="/api/history")
     app.register_blueprint(feedback_bp, url_prefix="/api/feedback")
+    app.register_blueprint(memory_bp, url_prefix="/api/memory")
 
     return app
 
@@ -11,3 +11,34 @@ class Config:
     # MongoDB Configuration
     MONGODB_URI = os.getenv('MONGODB_URI')
     DATABASE_NAME = os.getenv('DATABASE_NAME')
+
+    # History ingestion
+    # Write concern for history inserts; 0 = unacknowledged (fastest, errors are not reported)
+    HISTORY_WRITE_CONCERN = int(os.getenv('HISTORY_WRITE_CONCERN', '1'))
+    HISTORY_BULK_MAX_RECORDS = int(os.getenv('HISTORY_BULK_MAX_RECORDS', '5000'))
+    # Optional server-side buffer: flush every N records or T seconds
+    HISTORY_BUFFER_ENABLED = os.getenv('HISTORY_BUFFER_ENABLED', 'false').lower() == 'true'
+    HISTORY_BUFFER_MAX_SIZE = int(os.getenv('HISTORY_BUFFER_MAX_SIZE', '1000'))
+    HISTORY_BUFFER_FLUSH_SECONDS = float(os.getenv('HISTORY_BUFFER_FLUSH_SECONDS', '1.0'))
+    # Add search terms to history written before indexed search, in the background at startup
+    HISTORY_SEARCH_BACKFILL = os.getenv('HISTORY_SEARCH_BACKFILL', 'true').lower() == 'true'
+    # Documents per round trip when streaming exports from a server-side cursor
+    HISTORY_EXPORT_BATCH_SIZE = int(os.getenv('HISTORY_EXPORT_BATCH_SIZE', '1000'))
+    # Retention: history older than this many days is moved to compressed
+    # per-month archive files (0 keeps everything in MongoDB)
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '0'))
+    # Must be a volume shared by all replicas: every replica runs the retention
+    # loop (kept exclusive by a lock file there) and reads the same index
+    HISTORY_ARCHIVE_DIR = os.getenv('HISTORY_ARCHIVE_DIR', 'archive')
+    HISTORY_ARCHIVE_BATCH_SIZE = int(os.getenv('HISTORY_ARCHIVE_BATCH_SIZE', '10000'))
+    HISTORY_ARCHIVE_INTERVAL_SECONDS = int(os.getenv('HISTORY_ARCHIVE_INTERVAL_SECONDS', '3600'))
+    # Translation memory answers exact lookups only with outputs that have at least
+    # MIN_AGREEMENT translator uses, endorsements and suggestions net of corrections,
+    # and that were given or rated within MAX_AGE_DAYS
+    TRANSLATION_MEMORY_MIN_AGREEMENT = int(os.getenv('TRANSLATION_MEMORY_MIN_AGREEMENT', '3'))
+    TRANSLATION_MEMORY_MAX_AGE_DAYS = int(os.getenv('TRANSLATION_MEMORY_MAX_AGE_DAYS', '30'))
+    # Popular inputs and unmatched words (Count-Min sketch + top-k per language pair)
+    HEAVY_HITTERS_TOP_K = int(os.getenv('HEAVY_HITTERS_TOP_K', '100'))
+    HEAVY_HITTERS_SAVE_SECONDS = int(os.getenv('HEAVY_HITTERS_SAVE_SECONDS', '60'))
+    # Counts halve this often, so popularity follows current traffic
+    HEAVY_HITTERS_HALF_LIFE_HOURS = int(os.getenv('HEAVY_HITTERS_HALF_LIFE_HOURS', '168'))
@@ -34,3 +34,24 @@ def feedback_collection():
     if _db is not None:
         return _db.feedback
     return None
+
+
+def history_rollups_collection():
+    """Get history statistics rollup collection"""
+    if _db is not None:
+        return _db.history_rollups
+    return None
+
+
+def translation_memory_collection():
+    """Get translation memory collection"""
+    if _db is not None:
+        return _db.translation_memory
+    return None
+
+
+def heavy_hitters_collection():
+    """Get popular query sketch collection"""
+    if _db is not None:
+        return _db.heavy_hitters
+    return None
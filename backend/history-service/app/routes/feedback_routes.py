@@ -1,5 +1,7 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from app.services.history_service import get_history_service
+from app.services.pagination import parse_time
 
 feedback_bp = Blueprint('feedback', __name__)
 
@@ -40,19 +42,49 @@ def add_feedback():
 
 @feedback_bp.route('', methods=['GET'])
 def get_feedback():
-    """Get user feedback"""
+    """Get user feedback, newest first; pass next_cursor as ?cursor= for the next page"""
     try:
         history_service = get_history_service()
         limit = int(request.args.get('limit', 50))
-        feedback_type = request.args.get('type')
         
-        feedback = history_service.get_user_feedback(limit, feedback_type)
+        page = history_service.page_user_feedback(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            feedback_type=request.args.get('type'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until'))
+        )
         
         return jsonify({
             'success': True,
-            'feedback': feedback,
-            'count': len(feedback)
+            'feedback': page['feedback'],
+            'count': len(page['feedback']),
+            'next_cursor': page['next_cursor']
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@feedback_bp.route('/export', methods=['GET'])
+def export_feedback():
+    """Stream user feedback as NDJSON, oldest first"""
+    try:
+        history_service = get_history_service()
+        records = history_service.export_user_feedback(
+            feedback_type=request.args.get('type'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            batch_size=current_app.config.get('HISTORY_EXPORT_BATCH_SIZE', 1000)
+        )
+        lines = (json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': 'attachment; filename=feedback.ndjson'})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
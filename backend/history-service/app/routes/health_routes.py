@@ -13,10 +13,13 @@ def health_check():
         db = get_db()
         db.client.admin.command('ping')
         
+        from app.services.history_service import get_history_service
+        
         return jsonify({
             'status': 'healthy',
             'service': 'History Service (MongoDB)',
-            'database': 'connected'
+            'database': 'connected',
+            'write_buffer': get_history_service().get_buffer_info()
         })
     except Exception as e:
         return jsonify({
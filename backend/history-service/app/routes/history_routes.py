@@ -1,5 +1,8 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.services.heavy_hitters import KINDS
 from app.services.history_service import get_history_service
+from app.services.pagination import parse_time
 
 history_bp = Blueprint('history', __name__)
 
@@ -22,7 +25,9 @@ def add_history():
             source_language=data['source_language'],
             target_language=data['target_language'],
             translation_method=data.get('translation_method', ''),
-            confidence_score=data.get('confidence_score')
+            confidence_score=data.get('confidence_score'),
+            unmatched_words=data.get('unmatched_words'),
+            unmatched_language=data.get('unmatched_language')
         )
         
         if history_id:
@@ -38,27 +43,129 @@ def add_history():
         return jsonify({'error': str(e)}), 500
 
 
+@history_bp.route('/bulk', methods=['POST'])
+def add_history_bulk():
+    """Add many translations to history in one request"""
+    try:
+        history_service = get_history_service()
+        data = request.get_json()
+        
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'records (array) is required'}), 400
+        
+        max_records = current_app.config.get('HISTORY_BULK_MAX_RECORDS', 5000)
+        if len(records) > max_records:
+            return jsonify({'error': f'At most {max_records} records per request'}), 413
+        
+        result = history_service.add_translation_history_bulk(records)
+        
+        if not result['success']:
+            return jsonify({'error': result['error']}), 500
+        
+        # Buffered records are accepted but not yet written
+        return jsonify(result), 202 if result['buffered'] else 201
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @history_bp.route('', methods=['GET'])
 def get_history():
-    """Get translation history"""
+    """Get translation history, newest first; pass next_cursor as ?cursor= for the next page"""
     try:
         history_service = get_history_service()
         limit = int(request.args.get('limit', 50))
-        source_language = request.args.get('source_language')
-        target_language = request.args.get('target_language')
         
-        history = history_service.get_translation_history(
+        page = history_service.page_translation_history(
             limit=limit,
-            source_language=source_language,
-            target_language=target_language
+            cursor=request.args.get('cursor'),
+            source_language=request.args.get('source_language'),
+            target_language=request.args.get('target_language'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until'))
         )
         
         return jsonify({
             'success': True,
-            'history': history,
-            'count': len(history)
+            'history': page['history'],
+            'count': len(page['history']),
+            'next_cursor': page['next_cursor']
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@history_bp.route('/export', methods=['GET'])
+def export_history():
+    """Stream translation history as NDJSON, oldest first"""
+    try:
+        history_service = get_history_service()
+        records = history_service.export_translation_history(
+            source_language=request.args.get('source_language'),
+            target_language=request.args.get('target_language'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            batch_size=current_app.config.get('HISTORY_EXPORT_BATCH_SIZE', 1000)
+        )
+        lines = (json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': 'attachment; filename=history.ndjson'})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@history_bp.route('/archive', methods=['GET'])
+def query_archive():
+    """Stream archived (past retention) history as NDJSON, oldest first"""
+    try:
+        history_service = get_history_service()
+        records = history_service.query_archive(
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            source_language=request.args.get('source_language'),
+            target_language=request.args.get('target_language'),
+            query=request.args.get('q', '').strip() or None
+        )
+        lines = (json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@history_bp.route('/archive/info', methods=['GET'])
+def archive_info():
+    """Archive contents: records, parts and size per month"""
+    try:
+        history_service = get_history_service()
+        return jsonify({
+            'success': True,
+            'archive': history_service.get_archive_info()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@history_bp.route('/archive', methods=['POST'])
+def run_archive():
+    """Archive history past retention now instead of waiting for the next scheduled run"""
+    try:
+        history_service = get_history_service()
+        result = history_service.apply_retention()
+        if not result['success']:
+            return jsonify({'error': result['error']}), 409
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -87,6 +194,29 @@ def search_history():
         return jsonify({'error': str(e)}), 500
 
 
+@history_bp.route('/popular', methods=['GET'])
+def get_popular():
+    """Most frequent inputs per language pair (kind=inputs) or unmatched words per language (kind=unmatched)"""
+    try:
+        history_service = get_history_service()
+        kind = request.args.get('kind', 'inputs')
+        limit = int(request.args.get('limit', 20))
+        
+        if kind not in KINDS:
+            return jsonify({'error': 'kind must be inputs or unmatched'}), 400
+        
+        group = request.args.get('language')
+        source_language = request.args.get('source_language')
+        target_language = request.args.get('target_language')
+        if kind == 'inputs' and source_language and target_language:
+            group = f'{source_language}|{target_language}'
+        
+        return jsonify(dict(history_service.get_popular(kind, group, limit), success=True))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @history_bp.route('/stats', methods=['GET'])
 def get_statistics():
     """Get history and feedback statistics"""
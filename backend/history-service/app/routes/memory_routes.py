@@ -0,0 +1,50 @@
+from flask import Blueprint, request, jsonify
+from app.services.history_service import get_history_service
+
+memory_bp = Blueprint('memory', __name__)
+
+
+@memory_bp.route('/lookup', methods=['GET'])
+def lookup():
+    """Exact translation memory match for an input (cheap: one primary key read)"""
+    try:
+        history_service = get_history_service()
+        text = request.args.get('text', '').strip()
+        source_language = request.args.get('source_language', '').lower()
+        target_language = request.args.get('target_language', '').lower()
+        
+        if not text or not source_language or not target_language:
+            return jsonify({'error': 'text, source_language and target_language are required'}), 400
+        
+        result = history_service.lookup_translation_memory(text, source_language, target_language)
+        return jsonify(dict(result, success=True))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@memory_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Remembered translations of similar inputs (fuzzy matches)"""
+    try:
+        history_service = get_history_service()
+        text = request.args.get('text', '').strip()
+        source_language = request.args.get('source_language', '').lower()
+        target_language = request.args.get('target_language', '').lower()
+        limit = int(request.args.get('limit', 5))
+        min_similarity = float(request.args.get('min_similarity', 0.6))
+        
+        if not text or not source_language or not target_language:
+            return jsonify({'error': 'text, source_language and target_language are required'}), 400
+        
+        suggestions = history_service.suggest_from_translation_memory(
+            text, source_language, target_language, limit, min_similarity
+        )
+        return jsonify({
+            'success': True,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,234 @@
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import groupby
+
+from app.services.pagination import OLDEST_FIRST
+from app.services.search_terms import index_terms, query_terms
+
+# Layout: <directory>/index.json plus <directory>/<YYYY-MM>/part-NNNNN.ndjson.gz.
+# Each part holds one batch of records from a single month, oldest first, and
+# its index entry carries the time range and per-pair counts so queries only
+# open the parts that can match.
+INDEX_FILE = 'index.json'
+LOCK_FILE = '.archive.lock'
+# A lock older than this is left over from a crashed run
+LOCK_STALE_SECONDS = 6 * 3600
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _month(doc):
+    return _utc(doc['created_at']).strftime('%Y-%m')
+
+
+def _pair(source, target):
+    return f'{source}|{target}'
+
+
+class HistoryArchive:
+    """Compressed, month-partitioned archive for history records past retention
+
+    The directory must be shared by every replica (a common volume): each one
+    runs the retention loop, which only stays exclusive through the lock file,
+    and each one serves archive queries from the same index.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._index = None
+        # (inode, mtime, size) of the index file the cached index was read from
+        self._index_stat = None
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _stat_index(self):
+        try:
+            stat = os.stat(self._path(INDEX_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def index(self):
+        """The archive index, re-read whenever another process has replaced index.json"""
+        stat = self._stat_index()
+        if self._index is None or stat != self._index_stat:
+            try:
+                with open(self._path(INDEX_FILE), encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {'parts': [], 'pending': None}
+            self._index_stat = stat
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp = self._path(INDEX_FILE + '.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self._path(INDEX_FILE))
+        # Our own write is what the cached index already holds
+        self._index_stat = self._stat_index()
+
+    def info(self):
+        parts = self.index()['parts']
+        months = Counter()
+        for part in parts:
+            months[part['month']] += part['count']
+        return {
+            'directory': self.directory,
+            'records': sum(months.values()),
+            'parts': len(parts),
+            'bytes': sum(part['bytes'] for part in parts),
+            'first': parts[0]['first'] if parts else None,
+            'last': parts[-1]['last'] if parts else None,
+            'months': dict(sorted(months.items()))
+        }
+
+    @contextmanager
+    def lock(self):
+        """Exclusive archiving across processes sharing the directory; yields False when another run holds it"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(LOCK_FILE)
+        try:
+            if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            yield False
+            return
+        try:
+            # Another process may have archived since this one read the index
+            self._index = None
+            yield True
+        finally:
+            os.remove(path)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _write_part(self, month, items, docs):
+        number = sum(1 for part in self.index()['parts'] if part['month'] == month) + 1
+        name = f'{month}/part-{number:05d}.ndjson.gz'
+        os.makedirs(self._path(month), exist_ok=True)
+        with open(self._path(name), 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        pairs = Counter(_pair(doc.get('source_language'), doc.get('target_language')) for doc in docs)
+        return {
+            'file': name,
+            'month': month,
+            'count': len(docs),
+            'first': _utc(docs[0]['created_at']).isoformat(),
+            'last': _utc(docs[-1]['created_at']).isoformat(),
+            'bytes': os.path.getsize(self._path(name)),
+            'pairs': dict(pairs)
+        }
+
+    def _delete_archived(self, collection, ids, batch_size=1000):
+        for start in range(0, len(ids), batch_size):
+            collection.delete_many({'_id': {'$in': ids[start:start + batch_size]}})
+
+    def _finish_pending(self, collection, id_type):
+        """Delete from MongoDB the records of a part written by a run that stopped before deleting them"""
+        index = self.index()
+        pending = index.get('pending')
+        if not pending:
+            return
+        part = next((part for part in index['parts'] if part['file'] == pending), None)
+        if part is not None:
+            self._delete_archived(collection, [id_type(item['id']) for item in self.read_part(part)])
+        index['pending'] = None
+        self._save_index()
+
+    def archive_before(self, collection, cutoff, serialize, id_type, projection=None, batch_size=10000):
+        """Move records created before *cutoff* from *collection* into the archive, oldest first.
+
+        Each batch is written and fsynced, recorded in the index as pending,
+        deleted from MongoDB and then marked done, so an interrupted run
+        neither loses nor duplicates records. Returns how many were moved.
+        """
+        self._finish_pending(collection, id_type)
+        archived = 0
+        while True:
+            docs = list(collection.find({'created_at': {'$lt': cutoff}}, projection)
+                        .sort(OLDEST_FIRST)
+                        .limit(batch_size))
+            if not docs:
+                break
+            for month, group in groupby(docs, key=_month):
+                group = list(group)
+                part = self._write_part(month, [serialize(doc) for doc in group], group)
+                index = self.index()
+                index['parts'].append(part)
+                index['pending'] = part['file']
+                self._save_index()
+
+                self._delete_archived(collection, [doc['_id'] for doc in group])
+                index['pending'] = None
+                self._save_index()
+                archived += len(group)
+        return archived
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def read_part(self, part):
+        with gzip.open(self._path(part['file']), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def parts(self, since=None, until=None, source_language=None, target_language=None):
+        """Index entries of the parts that can hold records matching the filters"""
+        selected = []
+        for part in self.index()['parts']:
+            if since and datetime.fromisoformat(part['last']) < since:
+                continue
+            if until and datetime.fromisoformat(part['first']) >= until:
+                continue
+            if source_language or target_language:
+                if not any((not source_language or source == source_language) and
+                           (not target_language or target == target_language)
+                           for source, _, target in (pair.partition('|') for pair in part['pairs'])):
+                    continue
+            selected.append(part)
+        return selected
+
+    def query(self, since=None, until=None, source_language=None, target_language=None, query=None):
+        """Archived records matching the filters, oldest first, read one part at a time"""
+        terms = set(query_terms(query)) if query else None
+        for part in self.parts(since, until, source_language, target_language):
+            for item in self.read_part(part):
+                if source_language and item['source_language'] != source_language:
+                    continue
+                if target_language and item['target_language'] != target_language:
+                    continue
+                if since or until:
+                    created_at = _utc(datetime.fromisoformat(item['created_at']))
+                    if (since and created_at < since) or (until and created_at >= until):
+                        continue
+                if terms and not terms.issubset(index_terms(item['input_text'], item['output_text'])):
+                    continue
+                yield item
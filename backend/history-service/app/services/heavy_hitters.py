@@ -0,0 +1,279 @@
+import hashlib
+import math
+import operator
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError
+
+from app.services.translation_memory import normalize
+
+# Sketch ids: 'inputs:<source>|<target>' counts normalized inputs per language
+# pair, 'unmatched:<language>' counts words the dictionary had no entry for
+# (each one sent the translator to a Google or passthrough fallback).
+KINDS = ('inputs', 'unmatched')
+# Unmatched words kept per history record
+MAX_UNMATCHED = 50
+# Attempts at merging a sketch into its saved document before giving up until the next save
+SAVE_ATTEMPTS = 5
+
+
+class CountMinSketch:
+    """Count-Min sketch with conservative update: estimates never undercount,
+    and overcount by at most e/width of the total with probability 1 - e^-depth"""
+
+    def __init__(self, width=2048, depth=4, counts=None):
+        self.width = width
+        self.depth = depth
+        self.counts = array('Q', bytes(8 * width * depth))
+        if counts:
+            self.counts = array('Q')
+            self.counts.frombytes(counts)
+
+    def _cells(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, item, count=1):
+        """Count *item* and return its new estimate"""
+        cells = self._cells(item)
+        estimate = min(self.counts[cell] for cell in cells) + count
+        for cell in cells:
+            if self.counts[cell] < estimate:
+                self.counts[cell] = estimate
+        return estimate
+
+    def estimate(self, item):
+        return min(self.counts[cell] for cell in self._cells(item))
+
+    def halve(self):
+        self.counts = array('Q', (count >> 1 for count in self.counts))
+
+    def merge(self, other):
+        """Add another sketch's counts cell by cell (sums of upper bounds stay upper bounds)"""
+        self.counts = array('Q', map(operator.add, self.counts, other.counts))
+
+
+class HeavyHitterSketch:
+    """Count-Min sketch plus the k items with the highest estimates"""
+
+    def __init__(self, width=2048, depth=4, k=100):
+        self.sketch = CountMinSketch(width, depth)
+        self.k = k
+        self.total = 0
+        # item -> [estimate, text as last submitted]
+        self.items = {}
+        self._floor = 0
+
+    def add(self, item, text, count=1):
+        self.total += count
+        estimate = self.sketch.add(item, count)
+        if item in self.items or len(self.items) < self.k:
+            self.items[item] = [estimate, text]
+            return
+        if estimate <= self._floor:
+            return
+        # The floor only rises, so it is recomputed just when an item may displace it
+        victim = min(self.items, key=lambda key: self.items[key][0])
+        self._floor = self.items[victim][0]
+        if estimate > self._floor:
+            del self.items[victim]
+            self.items[item] = [estimate, text]
+
+    def top(self, limit=None):
+        error = math.ceil(math.e / self.sketch.width * self.total)
+        ranked = sorted(self.items.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [{'text': text, 'normalized': item, 'count': estimate, 'error_bound': error}
+                for item, (estimate, text) in ranked[:limit]]
+
+    def halve(self):
+        self.sketch.halve()
+        self.total >>= 1
+        self._floor >>= 1
+        for entry in self.items.values():
+            entry[0] >>= 1
+        self.items = {item: entry for item, entry in self.items.items() if entry[0]}
+
+    def merge(self, other):
+        """Add the counts of another sketch of the same shape; items are re-ranked on the merged counts"""
+        self.sketch.merge(other.sketch)
+        self.total += other.total
+        texts = {item: text for item, (_, text) in self.items.items()}
+        texts.update((item, text) for item, (_, text) in other.items.items())
+        ranked = sorted(((self.sketch.estimate(item), item) for item in texts), reverse=True)[:self.k]
+        self.items = {item: [estimate, texts[item]] for estimate, item in ranked}
+        self._floor = 0
+
+    def copy(self):
+        return HeavyHitterSketch.from_document(self.to_document())
+
+    def to_document(self):
+        return {
+            'width': self.sketch.width,
+            'depth': self.sketch.depth,
+            'k': self.k,
+            'total': self.total,
+            'counts': Binary(self.sketch.counts.tobytes()),
+            'items': [[item, estimate, text] for item, (estimate, text) in self.items.items()]
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        sketch = cls(doc['width'], doc['depth'], doc['k'])
+        sketch.sketch = CountMinSketch(doc['width'], doc['depth'], bytes(doc['counts']))
+        sketch.total = doc.get('total', 0)
+        sketch.items = {item: [estimate, text] for item, estimate, text in doc.get('items', [])}
+        return sketch
+
+
+class HeavyHitters:
+    """Popular inputs per language pair and most frequent unmatched words, kept in memory
+    and saved to MongoDB periodically so they survive restarts.
+
+    Every process serving the app counts its own traffic. Saves merge the
+    counts added since the last save into the saved sketches (an optimistic
+    read-add-write on a version field), then reload them, so each process
+    reports the traffic of all of them.
+    """
+
+    def __init__(self, collection, width=2048, depth=4, k=100, half_life_hours=168):
+        self._collection = collection
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.half_life_hours = half_life_hours
+        # Saved counts plus this process's counts since the last save
+        self._sketches = {}
+        # This process's counts since the last save
+        self._pending = {}
+        # Saved sketches this process has claimed to halve on its next save
+        self._halve = set()
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return HeavyHitterSketch(self.width, self.depth, self.k)
+
+    def _load_documents(self):
+        return {doc['_id']: HeavyHitterSketch.from_document(doc) for doc in self._collection().find()
+                if doc['_id'] != 'meta' and doc.get('width') == self.width and doc.get('depth') == self.depth}
+
+    def load(self):
+        """Restore sketches saved by earlier runs and other processes"""
+        sketches = self._load_documents()
+        with self._lock:
+            self._sketches = sketches
+            for sketch_id, pending in self._pending.items():
+                self._sketches.setdefault(sketch_id, self._new()).merge(pending)
+        return len(sketches)
+
+    def _add(self, sketch_id, item, text):
+        for sketches in (self._sketches, self._pending):
+            sketch = sketches.get(sketch_id)
+            if sketch is None:
+                sketch = sketches[sketch_id] = self._new()
+            sketch.add(item, text)
+
+    def record_translations(self, documents):
+        with self._lock:
+            for doc in documents:
+                normalized = normalize(doc.get('input_text'))
+                if normalized:
+                    pair = f"{doc.get('source_language')}|{doc.get('target_language')}"
+                    self._add(f'inputs:{pair}', normalized, doc['input_text'].strip())
+                words = doc.get('unmatched_words') or []
+                if words:
+                    language = doc.get('unmatched_language') or doc.get('source_language')
+                    for word in words:
+                        if normalize(word):
+                            self._add(f'unmatched:{language}', normalize(word), word)
+
+    def top(self, kind, group=None, limit=20):
+        """{group: [{'text', 'count', 'error_bound'}, ...]} for every sketch of *kind* (or just *group*)"""
+        with self._lock:
+            return {
+                sketch_id.partition(':')[2]: sketch.top(limit)
+                for sketch_id, sketch in sorted(self._sketches.items())
+                if sketch_id.partition(':')[0] == kind and (group is None or sketch_id.partition(':')[2] == group)
+            }
+
+    def totals(self, kind):
+        with self._lock:
+            return {sketch_id.partition(':')[2]: sketch.total
+                    for sketch_id, sketch in self._sketches.items() if sketch_id.partition(':')[0] == kind}
+
+    def decay(self, now=None):
+        """Halve every saved count once per half-life, so popularity follows current traffic.
+
+        The half-life is claimed on the meta document, so one process halves
+        (on its next save) however many run.
+        """
+        now = now or datetime.now(timezone.utc)
+        collection = self._collection()
+        collection.update_one({'_id': 'meta'}, {'$setOnInsert': {'decayed_at': now}}, upsert=True)
+        claimed = collection.find_one_and_update(
+            {'_id': 'meta', 'decayed_at': {'$lte': now - timedelta(hours=self.half_life_hours)}},
+            {'$set': {'decayed_at': now}}
+        )
+        if claimed is None:
+            return False
+        with self._lock:
+            self._halve.update(doc['_id'] for doc in collection.find({'_id': {'$ne': 'meta'}}, {'_id': 1}))
+        return True
+
+    def _merge_into_saved(self, sketch_id, pending, halve):
+        """Add pending counts to the saved sketch (halving it first if claimed); False after lost races"""
+        collection = self._collection()
+        for _ in range(SAVE_ATTEMPTS):
+            doc = collection.find_one({'_id': sketch_id})
+            saved = self._new()
+            if doc is not None and (doc.get('width'), doc.get('depth')) == (self.width, self.depth):
+                saved = HeavyHitterSketch.from_document(doc)
+            if halve:
+                saved.halve()
+            if pending is not None:
+                saved.merge(pending)
+            version = doc.get('version', 0) if doc is not None else 0
+            document = dict(saved.to_document(), version=version + 1)
+            if doc is None:
+                try:
+                    collection.insert_one(dict(document, _id=sketch_id))
+                    return True
+                except DuplicateKeyError:
+                    continue
+            # Written only if no other process saved the sketch since it was read
+            query = {'_id': sketch_id, 'version': version if version else {'$exists': False}}
+            if collection.replace_one(query, document).matched_count:
+                return True
+        return False
+
+    def save(self):
+        """Merge counts added since the last save into the saved sketches; returns how many were written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            halve = set(self._halve)
+        saved = set()
+        try:
+            for sketch_id in sorted(set(pending) | halve):
+                if self._merge_into_saved(sketch_id, pending.get(sketch_id), sketch_id in halve):
+                    saved.add(sketch_id)
+                    with self._lock:
+                        self._halve.discard(sketch_id)
+            sketches = self._load_documents()
+        finally:
+            # Counts not saved are tried again on the next save
+            with self._lock:
+                for sketch_id, sketch in pending.items():
+                    if sketch_id in saved:
+                        continue
+                    if sketch_id in self._pending:
+                        sketch.merge(self._pending[sketch_id])
+                    self._pending[sketch_id] = sketch
+        with self._lock:
+            for sketch_id, sketch in self._pending.items():
+                sketches.setdefault(sketch_id, self._new()).merge(sketch)
+            self._sketches = sketches
+        return len(saved)
@@ -1,96 +1,413 @@
-from datetime import datetime, timezone
-from app.db.mongo import get_db, translation_history_collection, feedback_collection
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from flask import current_app, has_app_context
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from app.db.mongo import (get_db, translation_history_collection, feedback_collection, history_rollups_collection,
+                          translation_memory_collection, heavy_hitters_collection)
+from app.services.archive import HistoryArchive
+from app.services.heavy_hitters import MAX_UNMATCHED, HeavyHitters
+from app.services.pagination import NEWEST_FIRST, OLDEST_FIRST, after_cursor, encode_cursor, time_range
+from app.services.rollups import HistoryRollups
+from app.services.search_terms import index_terms, query_terms
+from app.services.translation_memory import TranslationMemory
+from app.services.write_buffer import HistoryWriteBuffer
+
+REQUIRED_HISTORY_FIELDS = ['input_text', 'output_text', 'source_language', 'target_language']
+
+# Search terms are only for the index; never send them back
+HISTORY_PROJECTION = {'search_terms': 0}
+
+
+def history_item(doc):
+    """JSON-ready history record"""
+    return {
+        'id': str(doc['_id']),
+        'input_text': doc['input_text'],
+        'output_text': doc['output_text'],
+        'source_language': doc['source_language'],
+        'target_language': doc['target_language'],
+        'translation_method': doc.get('translation_method', ''),
+        'confidence_score': doc.get('confidence_score'),
+        'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None
+    }
+
+
+def feedback_item(doc):
+    """JSON-ready feedback record"""
+    return {
+        'id': str(doc['_id']),
+        'original_text': doc['original_text'],
+        'suggested_translation': doc['suggested_translation'],
+        'current_translation': doc.get('current_translation', ''),
+        'feedback_type': doc['feedback_type'],
+        'user_rating': doc.get('user_rating'),
+        'comments': doc.get('comments', ''),
+        'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None
+    }
+
+
+def build_history_document(record, created_at=None):
+    """History document for one submitted record (raises ValueError when a field is missing)"""
+    for field in REQUIRED_HISTORY_FIELDS:
+        if not record.get(field):
+            raise ValueError(f'{field} is required')
+    document = {
+        # Assigned here so buffered records have an id before they are written
+        '_id': ObjectId(),
+        'input_text': record['input_text'],
+        'output_text': record['output_text'],
+        'source_language': record['source_language'],
+        'target_language': record['target_language'],
+        'translation_method': record.get('translation_method', ''),
+        'confidence_score': record.get('confidence_score'),
+        'created_at': created_at or datetime.now(timezone.utc),
+        # Word and word-prefix terms for indexed search
+        'search_terms': index_terms(record['input_text'], record['output_text'])
+    }
+    # Words the translator found no dictionary entry for
+    unmatched_words = record.get('unmatched_words')
+    if isinstance(unmatched_words, list) and unmatched_words:
+        document['unmatched_words'] = [str(word) for word in unmatched_words[:MAX_UNMATCHED]]
+        document['unmatched_language'] = record.get('unmatched_language') or record['source_language']
+    return document
 
 
 class HistoryService:
-    def __init__(self):
+    def __init__(self, config=None):
         self.db = get_db()
+        config = config or {}
+        self.write_concern = WriteConcern(w=config.get('HISTORY_WRITE_CONCERN', 1))
+        self.buffer = None
+        if config.get('HISTORY_BUFFER_ENABLED'):
+            self.buffer = HistoryWriteBuffer(
+                self._insert_documents,
+                max_size=config.get('HISTORY_BUFFER_MAX_SIZE', 1000),
+                flush_seconds=config.get('HISTORY_BUFFER_FLUSH_SECONDS', 1.0)
+            ).start()
+        self.rollups = HistoryRollups(history_rollups_collection, self.write_concern)
+        self.memory = TranslationMemory(
+            translation_memory_collection, self.write_concern,
+            min_agreement=config.get('TRANSLATION_MEMORY_MIN_AGREEMENT', 3),
+            max_age_days=config.get('TRANSLATION_MEMORY_MAX_AGE_DAYS', 30)
+        )
+        self.heavy_hitters = HeavyHitters(
+            heavy_hitters_collection,
+            k=config.get('HEAVY_HITTERS_TOP_K', 100),
+            half_life_hours=config.get('HEAVY_HITTERS_HALF_LIFE_HOURS', 168)
+        )
+        # Records older than retention_days move from MongoDB to the archive (0 keeps everything)
+        self.retention_days = config.get('HISTORY_RETENTION_DAYS', 0)
+        self.archive = HistoryArchive(config.get('HISTORY_ARCHIVE_DIR', 'archive'))
+        self.archive_batch_size = config.get('HISTORY_ARCHIVE_BATCH_SIZE', 10000)
+        self.ensure_indexes()
+        try:
+            # Live rollup counting starts now; older records are counted by the backfill
+            self.rollups.start()
+            self.memory.start()
+        except Exception as e:
+            print(f"❌ Error starting history rollups: {e}")
+        try:
+            self.heavy_hitters.load()
+        except Exception as e:
+            print(f"❌ Error loading popular query sketches: {e}")
+        threading.Thread(
+            target=self._heavy_hitters_loop, args=(config.get('HEAVY_HITTERS_SAVE_SECONDS', 60),),
+            name='history-heavy-hitters', daemon=True
+        ).start()
+        atexit.register(self.save_heavy_hitters)
+        threading.Thread(
+            target=self._backfill, args=(config.get('HISTORY_SEARCH_BACKFILL', True),),
+            name='history-backfill', daemon=True
+        ).start()
+        if self.retention_days:
+            threading.Thread(
+                target=self._retention_loop, args=(config.get('HISTORY_ARCHIVE_INTERVAL_SECONDS', 3600),),
+                name='history-retention', daemon=True
+            ).start()
         print("History Service initialized")
     
+    def _backfill(self, search_terms=True):
+        """Bring records written by older versions up to date (background, at startup)"""
+        if search_terms:
+            self.backfill_search_terms()
+        self.backfill_rollups()
+        self.backfill_memory()
+    
+    def _heavy_hitters_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.save_heavy_hitters(decay=True)
+    
+    def save_heavy_hitters(self, decay=False):
+        try:
+            if decay:
+                self.heavy_hitters.decay()
+            self.heavy_hitters.save()
+        except Exception as e:
+            print(f"❌ Error saving popular query sketches: {e}")
+    
+    def get_popular(self, kind='inputs', group=None, limit=20):
+        """Most frequent inputs per language pair, or unmatched words per language, with estimated counts"""
+        return {
+            'kind': kind,
+            'popular': self.heavy_hitters.top(kind, group, limit),
+            'totals': self.heavy_hitters.totals(kind)
+        }
+    
+    def _retention_loop(self, interval):
+        while True:
+            self.apply_retention()
+            time.sleep(interval)
+    
+    def apply_retention(self, now=None):
+        """Archive history older than the retention period, keeping the hot collection bounded"""
+        if not self.retention_days:
+            return {'success': False, 'error': 'Retention is disabled (HISTORY_RETENTION_DAYS is 0)'}
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        try:
+            with self.archive.lock() as locked:
+                if not locked:
+                    return {'success': False, 'error': 'Archiving is already running'}
+                archived = self.archive.archive_before(
+                    translation_history_collection(), cutoff, history_item, ObjectId,
+                    projection=HISTORY_PROJECTION, batch_size=self.archive_batch_size
+                )
+            if archived:
+                print(f"✅ Archived {archived} history records from before {cutoff.isoformat()}")
+            return {'success': True, 'archived': archived, 'cutoff': cutoff.isoformat()}
+        except Exception as e:
+            print(f"❌ Error archiving history: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def get_archive_info(self):
+        return dict(self.archive.info(), retention_days=self.retention_days)
+    
+    def query_archive(self, since=None, until=None, source_language=None, target_language=None, query=None):
+        """Archived history matching the filters, oldest first (streamed from the archive files)"""
+        return self.archive.query(since, until, source_language, target_language, query)
+    
+    def backfill_rollups(self):
+        """Count records from before rollups into them; statistics use rollups once this is done"""
+        try:
+            written = self.rollups.backfill(translation_history_collection(), feedback_collection())
+            if written:
+                print(f"✅ History statistics rollups backfilled ({written} rollup documents)")
+        except Exception as e:
+            print(f"❌ Error backfilling history rollups: {e}")
+    
+    def backfill_memory(self):
+        """Build translation memory from history written before it existed"""
+        try:
+            counted = self.memory.backfill(translation_history_collection(), feedback_collection())
+            if counted:
+                print(f"✅ Translation memory backfilled from {counted} history records")
+        except Exception as e:
+            print(f"❌ Error backfilling translation memory: {e}")
+    
+    def ensure_indexes(self):
+        """Create the indexes history reads rely on (no-op when they already exist)"""
+        try:
+            collection = translation_history_collection()
+            # Keyset pagination and export walk (created_at, _id) in either direction
+            collection.create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
+            collection.create_index([('source_language', ASCENDING), ('target_language', ASCENDING),
+                                     ('created_at', DESCENDING), ('_id', DESCENDING)])
+            # Search matches terms and returns the newest first straight from this index
+            collection.create_index([('search_terms', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)])
+            feedback_collection().create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
+            feedback_collection().create_index([('feedback_type', ASCENDING), ('created_at', DESCENDING),
+                                                ('_id', DESCENDING)])
+            self.memory.ensure_indexes()
+        except Exception as e:
+            print(f"❌ Error creating history indexes: {e}")
+    
+    def backfill_search_terms(self, batch_size=1000):
+        """Add search terms to records written before they existed; returns how many were updated"""
+        updated = 0
+        try:
+            collection = translation_history_collection()
+            while True:
+                batch = list(collection.find(
+                    {'search_terms': {'$exists': False}},
+                    {'input_text': 1, 'output_text': 1}
+                ).limit(batch_size))
+                if not batch:
+                    break
+                collection.bulk_write([
+                    UpdateOne({'_id': doc['_id']},
+                              {'$set': {'search_terms': index_terms(doc.get('input_text'), doc.get('output_text'))}})
+                    for doc in batch
+                ], ordered=False)
+                updated += len(batch)
+                if len(batch) < batch_size:
+                    break
+            if updated:
+                print(f"✅ Added search terms to {updated} history records")
+        except Exception as e:
+            print(f"❌ Error backfilling history search terms: {e}")
+        return updated
+    
+    def _insert_documents(self, documents):
+        """Write history documents in one unordered batch; returns how many were inserted"""
+        if not documents:
+            return 0
+        collection = translation_history_collection().with_options(write_concern=self.write_concern)
+        try:
+            collection.insert_many(documents, ordered=False)
+            inserted = documents
+        except BulkWriteError as e:
+            # Unordered: every document without an error was still written
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            print(f"❌ {len(failed)} history records failed to insert")
+            inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+        try:
+            self.rollups.record_translations(inserted)
+        except Exception as e:
+            print(f"❌ Error updating history rollups: {e}")
+        try:
+            self.memory.record_translations(inserted)
+        except Exception as e:
+            print(f"❌ Error updating translation memory: {e}")
+        try:
+            self.heavy_hitters.record_translations(inserted)
+        except Exception as e:
+            print(f"❌ Error updating popular query sketches: {e}")
+        return len(inserted)
+    
+    def _store(self, documents):
+        """Buffer documents when buffering is on (writing the overflow directly when it is full), else write them"""
+        if self.buffer is None:
+            return self._insert_documents(documents), False
+        accepted = self.buffer.add(documents)
+        if accepted < len(documents):
+            # Written now, not dropped: returns the count actually stored
+            return accepted + self._insert_documents(documents[accepted:]), True
+        return len(documents), True
+    
     def add_translation_history(self, input_text, output_text, source_language, 
-                              target_language, translation_method, confidence_score=None):
+                              target_language, translation_method, confidence_score=None,
+                              unmatched_words=None, unmatched_language=None):
         """Add translation to history"""
         try:
-            history_doc = {
+            history_doc = build_history_document({
                 'input_text': input_text,
                 'output_text': output_text,
                 'source_language': source_language,
                 'target_language': target_language,
                 'translation_method': translation_method,
                 'confidence_score': confidence_score,
-                'created_at': datetime.now(timezone.utc)
-            }
+                'unmatched_words': unmatched_words,
+                'unmatched_language': unmatched_language
+            })
             
-            result = translation_history_collection().insert_one(history_doc)
-            return str(result.inserted_id)
+            stored, _ = self._store([history_doc])
+            return str(history_doc['_id']) if stored else None
             
         except Exception as e:
             print(f"❌ Error adding translation history: {e}")
             return None
     
-    def get_translation_history(self, limit=50, source_language=None, target_language=None):
-        """Get recent translation history"""
+    def add_translation_history_bulk(self, records):
+        """Add many translations at once; invalid records are skipped and reported by index"""
         try:
-            query_filter = {}
+            created_at = datetime.now(timezone.utc)
+            documents = []
+            rejected = []
+            for index, record in enumerate(records):
+                try:
+                    if not isinstance(record, dict):
+                        raise ValueError('record must be an object')
+                    documents.append(build_history_document(record, created_at))
+                except ValueError as e:
+                    rejected.append({'index': index, 'error': str(e)})
             
-            if source_language:
-                query_filter['source_language'] = source_language
-            if target_language:
-                query_filter['target_language'] = target_language
+            stored, buffered = self._store(documents)
+            return {
+                'success': True,
+                'inserted': stored,
+                'buffered': buffered,
+                'rejected': rejected
+            }
             
-            cursor = translation_history_collection().find(query_filter)\
-                .sort('created_at', -1)\
-                .limit(limit)
+        except Exception as e:
+            print(f"❌ Error adding translation history in bulk: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def get_buffer_info(self):
+        """Write buffer counters (None when buffering is off)"""
+        return self.buffer.info() if self.buffer is not None else None
+    
+    def get_translation_history(self, limit=50, source_language=None, target_language=None):
+        """Get recent translation history"""
+        return self.page_translation_history(limit, source_language=source_language,
+                                             target_language=target_language).get('history', [])
+    
+    def _history_filter(self, source_language=None, target_language=None, since=None, until=None):
+        query_filter = time_range(since, until)
+        if source_language:
+            query_filter['source_language'] = source_language
+        if target_language:
+            query_filter['target_language'] = target_language
+        return query_filter
+    
+    def page_translation_history(self, limit=50, cursor=None, source_language=None,
+                                 target_language=None, since=None, until=None):
+        """One page of history, newest first; pass next_cursor back to get the following page"""
+        try:
+            query_filter = self._history_filter(source_language, target_language, since, until)
+            if cursor:
+                query_filter = {'$and': [query_filter, after_cursor(cursor)]}
             
-            history = []
-            for doc in cursor:
-                history_item = {
-                    'id': str(doc['_id']),
-                    'input_text': doc['input_text'],
-                    'output_text': doc['output_text'],
-                    'source_language': doc['source_language'],
-                    'target_language': doc['target_language'],
-                    'translation_method': doc.get('translation_method', ''),
-                    'confidence_score': doc.get('confidence_score'),
-                    'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None
-                }
-                history.append(history_item)
+            # One extra record tells whether there is another page
+            docs = list(translation_history_collection().find(query_filter, HISTORY_PROJECTION)
+                        .sort(NEWEST_FIRST)
+                        .limit(limit + 1))
+            page = docs[:limit]
             
-            return history
+            return {
+                'history': [history_item(doc) for doc in page],
+                'next_cursor': encode_cursor(page[-1]) if len(docs) > limit and page else None
+            }
             
+        except ValueError:
+            raise
         except Exception as e:
             print(f"❌ Error getting translation history: {e}")
-            return []
+            return {'history': [], 'next_cursor': None}
+    
+    def export_translation_history(self, source_language=None, target_language=None,
+                                   since=None, until=None, batch_size=1000):
+        """Yield history records oldest first from a server-side cursor, one batch in memory at a time"""
+        query_filter = self._history_filter(source_language, target_language, since, until)
+        cursor = translation_history_collection().find(query_filter, HISTORY_PROJECTION)\
+            .sort(OLDEST_FIRST)\
+            .batch_size(batch_size)
+        try:
+            for doc in cursor:
+                yield history_item(doc)
+        finally:
+            cursor.close()
     
     def search_translation_history(self, query, limit=50):
-        """Search translation history"""
+        """Search translation history by words (or word starts) in the input or output text"""
         try:
-            search_filter = {
-                '$or': [
-                    {'input_text': {'$regex': query, '$options': 'i'}},
-                    {'output_text': {'$regex': query, '$options': 'i'}}
-                ]
-            }
+            # Every query word must start a word of the record; terms are matched
+            # exactly against the index, so user input is never run as a regex
+            terms = query_terms(query)
+            if not terms:
+                return []
+            search_filter = {'search_terms': {'$all': terms}}
             
-            cursor = translation_history_collection().find(search_filter)\
-                .sort('created_at', -1)\
+            cursor = translation_history_collection().find(search_filter, HISTORY_PROJECTION)\
+                .sort(NEWEST_FIRST)\
                 .limit(limit)
             
-            results = []
-            for doc in cursor:
-                result = {
-                    'id': str(doc['_id']),
-                    'input_text': doc['input_text'],
-                    'output_text': doc['output_text'],
-                    'source_language': doc['source_language'],
-                    'target_language': doc['target_language'],
-                    'translation_method': doc.get('translation_method', ''),
-                    'confidence_score': doc.get('confidence_score'),
-                    'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None
-                }
-                results.append(result)
-            
-            return results
+            return [history_item(doc) for doc in cursor]
             
         except Exception as e:
             print(f"❌ Error searching translation history: {e}")
@@ -111,6 +428,14 @@ class HistoryService:
             }
             
             result = feedback_collection().insert_one(feedback_doc)
+            try:
+                self.rollups.record_feedback([feedback_doc])
+            except Exception as e:
+                print(f"❌ Error updating history rollups: {e}")
+            try:
+                self.memory.record_feedback([feedback_doc])
+            except Exception as e:
+                print(f"❌ Error updating translation memory: {e}")
             return str(result.inserted_id)
             
         except Exception as e:
@@ -119,37 +444,95 @@ class HistoryService:
     
     def get_user_feedback(self, limit=50, feedback_type=None):
         """Get user feedback"""
+        return self.page_user_feedback(limit, feedback_type=feedback_type).get('feedback', [])
+    
+    def page_user_feedback(self, limit=50, cursor=None, feedback_type=None, since=None, until=None):
+        """One page of feedback, newest first; pass next_cursor back to get the following page"""
         try:
-            query_filter = {}
+            query_filter = time_range(since, until)
             if feedback_type:
                 query_filter['feedback_type'] = feedback_type
+            if cursor:
+                query_filter = {'$and': [query_filter, after_cursor(cursor)]}
             
-            cursor = feedback_collection().find(query_filter)\
-                .sort('created_at', -1)\
-                .limit(limit)
-            
-            feedback_list = []
-            for doc in cursor:
-                feedback_item = {
-                    'id': str(doc['_id']),
-                    'original_text': doc['original_text'],
-                    'suggested_translation': doc['suggested_translation'],
-                    'current_translation': doc.get('current_translation', ''),
-                    'feedback_type': doc['feedback_type'],
-                    'user_rating': doc.get('user_rating'),
-                    'comments': doc.get('comments', ''),
-                    'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None
-                }
-                feedback_list.append(feedback_item)
+            docs = list(feedback_collection().find(query_filter)
+                        .sort(NEWEST_FIRST)
+                        .limit(limit + 1))
+            page = docs[:limit]
             
-            return feedback_list
+            return {
+                'feedback': [feedback_item(doc) for doc in page],
+                'next_cursor': encode_cursor(page[-1]) if len(docs) > limit and page else None
+            }
             
+        except ValueError:
+            raise
         except Exception as e:
             print(f"❌ Error getting user feedback: {e}")
+            return {'feedback': [], 'next_cursor': None}
+    
+    def export_user_feedback(self, feedback_type=None, since=None, until=None, batch_size=1000):
+        """Yield feedback oldest first from a server-side cursor"""
+        query_filter = time_range(since, until)
+        if feedback_type:
+            query_filter['feedback_type'] = feedback_type
+        cursor = feedback_collection().find(query_filter).sort(OLDEST_FIRST).batch_size(batch_size)
+        try:
+            for doc in cursor:
+                yield feedback_item(doc)
+        finally:
+            cursor.close()
+    
+    def lookup_translation_memory(self, text, source_language, target_language):
+        """Remembered translation of exactly this input, or {'found': False}"""
+        try:
+            return self.memory.lookup(text, source_language, target_language) or {'found': False}
+        except Exception as e:
+            print(f"❌ Error looking up translation memory: {e}")
+            return {'found': False}
+    
+    def suggest_from_translation_memory(self, text, source_language, target_language, limit=5, min_similarity=0.6):
+        """Remembered translations of similar inputs"""
+        try:
+            return self.memory.suggest(text, source_language, target_language, limit, min_similarity)
+        except Exception as e:
+            print(f"❌ Error searching translation memory: {e}")
             return []
     
     def get_statistics(self):
-        """Get history and feedback statistics"""
+        """Get history and feedback statistics from the rollups (a few small documents)"""
+        try:
+            if not self.rollups.is_backfilled():
+                # Older records are not counted in the rollups yet
+                return self.aggregate_statistics()
+            
+            total, recent_translations = self.rollups.read()
+            pairs = []
+            for key, count in total['pairs'].most_common(10):
+                source, _, target = key.partition('|')
+                pairs.append({'pair': f"{source} → {target}", 'count': count})
+            
+            return {
+                'total_translations': total['translations'],
+                'total_feedback': total['feedback'],
+                'recent_translations': recent_translations,
+                'top_language_pairs': pairs,
+                'translation_methods': [
+                    {'method': method, 'count': count}
+                    for method, count in total['methods'].most_common()
+                ],
+                'feedback_types': [
+                    {'type': feedback_type, 'count': count}
+                    for feedback_type, count in total['feedback_types'].most_common()
+                ]
+            }
+            
+        except Exception as e:
+            print(f"❌ Error getting statistics: {e}")
+            return {}
+    
+    def aggregate_statistics(self):
+        """Get history and feedback statistics by aggregating the full collections"""
         try:
             # Translation history stats
             total_translations = translation_history_collection().count_documents({})
@@ -227,5 +610,5 @@ def get_history_service():
     """Get history service instance"""
     global _history_service
     if _history_service is None:
-        _history_service = HistoryService()
+        _history_service = HistoryService(current_app.config if has_app_context() else None)
     return _history_service
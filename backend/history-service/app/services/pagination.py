@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Newest first, with _id breaking ties between records from the same millisecond
+NEWEST_FIRST = [('created_at', -1), ('_id', -1)]
+OLDEST_FIRST = [('created_at', 1), ('_id', 1)]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def encode_cursor(doc):
+    """Opaque cursor for the position just after *doc*: '<created_at ms>-<_id>'"""
+    # MongoDB stores milliseconds; integer arithmetic keeps the value exact
+    millis = (_utc(doc['created_at']) - EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}-{doc['_id']}"
+
+
+def decode_cursor(token):
+    """(created_at, _id) from a cursor (raises ValueError when it is malformed)"""
+    try:
+        millis, _, object_id = token.partition('-')
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId, OverflowError):
+        raise ValueError('Invalid cursor')
+
+
+def after_cursor(token):
+    """Filter for records after *token* in newest-first order"""
+    created_at, object_id = decode_cursor(token)
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': object_id}}
+    ]}
+
+
+def parse_time(value):
+    """ISO 8601 time (UTC when no offset is given), or None for an empty value"""
+    if not value:
+        return None
+    try:
+        return _utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        raise ValueError(f'Invalid time: {value}')
+
+
+def time_range(since=None, until=None):
+    """created_at filter for [since, until)"""
+    bounds = {}
+    if since:
+        bounds['$gte'] = since
+    if until:
+        bounds['$lt'] = until
+    return {'created_at': bounds} if bounds else {}
@@ -0,0 +1,197 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+
+# Rollup documents: '_id' is 'total', 'day:YYYY-MM-DD' or 'hour:YYYY-MM-DDTHH'.
+# Counters written on insert live under 'live' ($inc); counts for records
+# that existed before live counting began are under 'backfill' ($set, so a
+# repeated backfill is harmless). Reads add the two together.
+#
+# Known gap: during a rolling deploy, records inserted after live_since by
+# replicas still running a version without rollups are counted by neither
+# path (the backfill stops at live_since and those replicas never $inc).
+# The undercount is limited to the deploy window; roll the upgrade out
+# quickly, or stop the old replicas before the first new one starts, if
+# exact totals matter.
+META_ID = 'meta'
+COUNTERS = ('translations', 'feedback')
+BREAKDOWNS = ('pairs', 'methods', 'feedback_types')
+
+
+def _key(value):
+    """A value usable as a MongoDB field name"""
+    return str(value).replace('.', '_').replace('$', '_')
+
+
+def _periods(created_at):
+    """Rollup ids (and period starts) that a record created at *created_at* counts towards"""
+    created_at = created_at.astimezone(timezone.utc) if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+    day = hour.replace(hour=0)
+    return [
+        ('total', 'total', None),
+        (f"day:{day.strftime('%Y-%m-%d')}", 'day', day),
+        (f"hour:{hour.strftime('%Y-%m-%dT%H')}", 'hour', hour)
+    ]
+
+
+def _empty():
+    return {'translations': 0, 'feedback': 0, 'pairs': Counter(), 'methods': Counter(), 'feedback_types': Counter()}
+
+
+def _count_translation(counts, source, target, method, n=1):
+    counts['translations'] += n
+    if source and target:
+        counts['pairs'][f'{_key(source)}|{_key(target)}'] += n
+    if method:
+        counts['methods'][_key(method)] += n
+
+
+def _count_feedback(counts, feedback_type, n=1):
+    counts['feedback'] += n
+    if feedback_type:
+        counts['feedback_types'][_key(feedback_type)] += n
+
+
+def _fields(counts, prefix):
+    """Flatten counts into {'<prefix>.pairs.english|vedda': n, ...}"""
+    fields = {f'{prefix}.{name}': counts[name] for name in COUNTERS if counts[name]}
+    for name in BREAKDOWNS:
+        fields.update({f'{prefix}.{name}.{key}': n for key, n in counts[name].items()})
+    return fields
+
+
+class HistoryRollups:
+    """Per-hour, per-day and all-time counters, so statistics never scan history"""
+
+    def __init__(self, collection, write_concern=None):
+        self._collection = collection
+        self.write_concern = write_concern
+        self._backfilled = False
+
+    def _writes(self):
+        collection = self._collection()
+        if self.write_concern is None:
+            return collection
+        return collection.with_options(write_concern=self.write_concern)
+
+    def record_translations(self, documents):
+        increments = defaultdict(_empty)
+        for doc in documents:
+            for period in _periods(doc['created_at']):
+                _count_translation(increments[period], doc.get('source_language'),
+                                   doc.get('target_language'), doc.get('translation_method'))
+        self._increment(increments)
+
+    def record_feedback(self, documents):
+        increments = defaultdict(_empty)
+        for doc in documents:
+            for period in _periods(doc['created_at']):
+                _count_feedback(increments[period], doc.get('feedback_type'))
+        self._increment(increments)
+
+    def _increment(self, increments):
+        if increments:
+            self._writes().bulk_write([
+                UpdateOne({'_id': rollup_id},
+                          {'$inc': _fields(counts, 'live'), '$setOnInsert': {'period': period, 'start': start}},
+                          upsert=True)
+                for (rollup_id, period, start), counts in increments.items()
+            ], ordered=False)
+
+    # ------------------------------------------------------------------
+    # Backfill of records written before rollups existed
+    # ------------------------------------------------------------------
+
+    def start(self, now=None):
+        """Record when live counting began (once); returns the meta document"""
+        now = now or datetime.now(timezone.utc)
+        self._collection().update_one({'_id': META_ID}, {'$setOnInsert': {'live_since': now}}, upsert=True)
+        return self._collection().find_one({'_id': META_ID})
+
+    def is_backfilled(self):
+        if not self._backfilled:
+            meta = self._collection().find_one({'_id': META_ID})
+            self._backfilled = bool(meta and meta.get('backfilled_at'))
+        return self._backfilled
+
+    def backfill(self, history, feedback):
+        """Count everything created before live counting began, per hour, in MongoDB
+
+        Records that older-version replicas insert after live_since are not
+        covered (see the note at the top of this module).
+        """
+        meta = self.start()
+        if meta.get('backfilled_at'):
+            return 0
+        before = {'created_at': {'$lt': meta['live_since']}}
+        hour = {'$dateToString': {'format': '%Y-%m-%dT%H', 'date': '$created_at'}}
+        counts = defaultdict(_empty)
+
+        for row in history.aggregate([
+            {'$match': before},
+            {'$group': {'_id': {'hour': hour, 'source': '$source_language', 'target': '$target_language',
+                                'method': '$translation_method'}, 'count': {'$sum': 1}}}
+        ], allowDiskUse=True):
+            group = row['_id']
+            for period in _periods(datetime.strptime(group['hour'], '%Y-%m-%dT%H')):
+                _count_translation(counts[period], group.get('source'), group.get('target'),
+                                   group.get('method'), row['count'])
+
+        for row in feedback.aggregate([
+            {'$match': before},
+            {'$group': {'_id': {'hour': hour, 'type': '$feedback_type'}, 'count': {'$sum': 1}}}
+        ], allowDiskUse=True):
+            group = row['_id']
+            for period in _periods(datetime.strptime(group['hour'], '%Y-%m-%dT%H')):
+                _count_feedback(counts[period], group.get('type'), row['count'])
+
+        operations = [
+            UpdateOne({'_id': rollup_id},
+                      {'$set': {'backfill': {name: dict(value) if isinstance(value, Counter) else value
+                                             for name, value in totals.items()}},
+                       '$setOnInsert': {'period': period, 'start': start}},
+                      upsert=True)
+            for (rollup_id, period, start), totals in counts.items()
+        ]
+        for offset in range(0, len(operations), 1000):
+            self._collection().bulk_write(operations[offset:offset + 1000], ordered=False)
+        self._collection().update_one({'_id': META_ID}, {'$set': {'backfilled_at': datetime.now(timezone.utc)}})
+        return len(operations)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _merge(docs):
+        merged = _empty()
+        for doc in docs:
+            for part in ('live', 'backfill'):
+                values = doc.get(part) or {}
+                for name in COUNTERS:
+                    merged[name] += values.get(name, 0)
+                for name in BREAKDOWNS:
+                    merged[name].update(values.get(name) or {})
+        return merged
+
+    def read(self, now=None, recent_days=7):
+        """All-time counts plus translations in the last *recent_days* days.
+
+        The recent window is whole days after its first day plus the hours
+        of that first day, so it is exact to the hour and reads at most
+        recent_days + 24 small documents.
+        """
+        now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        since = (now - timedelta(days=recent_days)).replace(minute=0, second=0, microsecond=0)
+        first_day = since.replace(hour=0)
+        ids = ['total']
+        ids += [f"day:{(first_day + timedelta(days=n)).strftime('%Y-%m-%d')}"
+                for n in range(1, recent_days + 1)]
+        ids += [f"hour:{(since + timedelta(hours=n)).strftime('%Y-%m-%dT%H')}"
+                for n in range(24 - since.hour)]
+        docs = {doc['_id']: doc for doc in self._collection().find({'_id': {'$in': ids}})}
+
+        total = self._merge([docs['total']] if 'total' in docs else [])
+        recent = self._merge(doc for rollup_id, doc in docs.items() if rollup_id != 'total')
+        return total, recent['translations']
@@ -0,0 +1,60 @@
+import unicodedata
+
+# Prefixes shorter than this are not indexed (a query token that short must match a whole word)
+MIN_PREFIX = 2
+# Longer words are indexed (and queried) by their first MAX_PREFIX characters, so
+# each word adds at most MAX_PREFIX - MIN_PREFIX + 1 index keys
+MAX_PREFIX = 8
+# Upper bound on distinct words indexed per history record
+MAX_WORDS = 64
+# Upper bound on index keys per history record
+MAX_TERMS = 160
+
+# Zero-width non-joiner and joiner, used inside Sinhala conjuncts
+JOINERS = '\u200c\u200d'
+
+
+def _is_word_char(char):
+    # Sinhala vowel signs are marks (Mn/Mc) and conjuncts use ZWJ, so \w is not enough
+    return unicodedata.category(char)[0] in 'LMN' or char in JOINERS
+
+
+def tokenize(text):
+    """Normalized words of *text*: NFC, case-folded, split on anything that is not a letter, mark or digit"""
+    if not text:
+        return []
+    words = []
+    current = []
+    for char in unicodedata.normalize('NFC', str(text)).casefold():
+        if _is_word_char(char):
+            current.append(char)
+        elif current:
+            words.append(''.join(current))
+            current = []
+    if current:
+        words.append(''.join(current))
+    words = [word.strip(JOINERS) for word in words]
+    return [word for word in words if word]
+
+
+def index_terms(*texts):
+    """Search terms stored with a record: every word's prefixes up to MAX_PREFIX, so queries match word starts.
+
+    Words are indexed whole: one whose new terms would go past MAX_TERMS is skipped.
+    """
+    terms = set()
+    words = list(dict.fromkeys(word for text in texts for word in tokenize(text)))
+    for word in words[:MAX_WORDS]:
+        word = word[:MAX_PREFIX]
+        word_terms = {word[:length] for length in range(MIN_PREFIX, len(word))}
+        word_terms.add(word)
+        if len(terms) + len(word_terms - terms) > MAX_TERMS:
+            continue
+        terms |= word_terms
+    return sorted(terms)
+
+
+def query_terms(query):
+    """Terms a record must all contain to match *query* (each query word matches a word start;
+    words longer than MAX_PREFIX match on their first MAX_PREFIX characters)"""
+    return sorted({word[:MAX_PREFIX] for word in tokenize(query)})
@@ -0,0 +1,358 @@
+import hashlib
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from app.services.pagination import OLDEST_FIRST
+from app.services.search_terms import index_terms, query_terms, tokenize
+
+# Translations served from memory are saved to history with this method and
+# not counted again, otherwise one answer would keep reinforcing itself
+MEMORY_METHOD = 'translation_memory'
+META_ID = 'meta'
+
+# Counting is not idempotent, so one process at a time holds the backfill. The
+# lease is renewed after each batch; a holder that dies is taken over once it lapses
+BACKFILL_LEASE_SECONDS = 300
+
+# Weight of feedback against plain repeated use when ranking outputs
+SUGGESTED_WEIGHT = 3
+ENDORSED_WEIGHT = 2
+CORRECTED_WEIGHT = 3
+
+# Fuzzy lookups score at most this many entries sharing a word with the query
+FUZZY_CANDIDATES = 200
+
+# Exact lookups (which the translator serves without translating) only return
+# outputs with this many agreeing signals - translator uses, endorsements and
+# suggestions - net of corrections, so no single feedback post decides an answer
+MIN_AGREEMENT = 3
+# Outputs neither given by the translator nor rated for this long are not served:
+# memory hits are not counted, so a served answer expires and is translated again
+# against the current dictionary, and a suggestion nobody confirms drops out
+MAX_AGE_DAYS = 30
+
+
+def normalize(text):
+    """Input as matched by memory: NFC, case-folded words without punctuation"""
+    return ' '.join(tokenize(text))
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def memory_key(text, source_language, target_language):
+    """Memory entry id: language pair plus a hash of the normalized input"""
+    return f'{source_language}|{target_language}|{_digest(normalize(text))}'
+
+
+def _output_key(text):
+    return _digest(normalize(text) or str(text).strip())[:16]
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def score_outputs(entry, min_agreement=MIN_AGREEMENT):
+    """Outputs of an entry, best first, each with its share of the weighted votes as confidence"""
+    ranked = []
+    for output in (entry.get('outputs') or {}).values():
+        votes = (output.get('uses', 0) + SUGGESTED_WEIGHT * output.get('suggested', 0)
+                 + ENDORSED_WEIGHT * output.get('endorsed', 0) - CORRECTED_WEIGHT * output.get('corrected', 0))
+        ranked.append((max(votes, 0), output))
+    total = sum(votes for votes, _ in ranked)
+    results = []
+    for votes, output in sorted(ranked, key=lambda item: item[0], reverse=True):
+        # Scale by the translator's confidence; user suggestions have none, so by how many users agree
+        if output.get('confidence') is not None:
+            quality = min(output['confidence'], 1.0)
+        else:
+            quality = min((output.get('suggested', 0) + output.get('endorsed', 0)) / max(min_agreement, 1), 1.0)
+        results.append(dict(output, confidence=round(votes / total * quality, 3) if total else 0.0))
+    return results
+
+
+def servable(output, now, min_agreement=MIN_AGREEMENT, max_age_days=MAX_AGE_DAYS):
+    """Whether an output has enough agreement, and is recent enough, to answer for the translator"""
+    agreement = output.get('uses', 0) + output.get('suggested', 0) + output.get('endorsed', 0)
+    if agreement - output.get('corrected', 0) < min_agreement:
+        return False
+    seen = [_utc(value) for value in (output.get('last_used'), output.get('last_feedback')) if value is not None]
+    return bool(seen) and now - max(seen) <= timedelta(days=max_age_days)
+
+
+def memory_match(entry, match, similarity=None, min_agreement=MIN_AGREEMENT):
+    """API shape of the best output of a memory entry"""
+    outputs = score_outputs(entry, min_agreement)
+    best = outputs[0]
+    result = {
+        'found': True,
+        'match': match,
+        'translation': best['text'],
+        'confidence': best['confidence'],
+        'input_text': entry.get('input_text'),
+        'source_language': entry.get('source_language'),
+        'target_language': entry.get('target_language'),
+        'uses': entry.get('uses', 0),
+        'alternatives': len(outputs) - 1,
+        'unmatched_words': best.get('unmatched_words') or [],
+        'unmatched_language': best.get('unmatched_language'),
+        'provenance': {
+            'history_id': best.get('history_id'),
+            'translation_method': best.get('method'),
+            'last_used': best['last_used'].isoformat() if best.get('last_used') else None,
+            'uses': best.get('uses', 0),
+            'suggested': best.get('suggested', 0),
+            'endorsed': best.get('endorsed', 0),
+            'corrected': best.get('corrected', 0)
+        }
+    }
+    if similarity is not None:
+        result['similarity'] = round(similarity, 3)
+    return result
+
+
+class TranslationMemory:
+    """Past translations keyed by normalized input per language pair, ranked by use and feedback"""
+
+    def __init__(self, collection, write_concern=None, min_agreement=MIN_AGREEMENT, max_age_days=MAX_AGE_DAYS):
+        self._collection = collection
+        self.write_concern = write_concern
+        self.min_agreement = min_agreement
+        self.max_age_days = max_age_days
+
+    def _writes(self):
+        collection = self._collection()
+        if self.write_concern is None:
+            return collection
+        return collection.with_options(write_concern=self.write_concern)
+
+    def ensure_indexes(self):
+        collection = self._collection()
+        # Feedback carries no language pair, so it finds entries by normalized input
+        collection.create_index([('normalized', ASCENDING)])
+        collection.create_index([('source_language', ASCENDING), ('target_language', ASCENDING),
+                                 ('terms', ASCENDING)])
+
+    # ------------------------------------------------------------------
+    # Writers
+    # ------------------------------------------------------------------
+
+    def record_translations(self, documents):
+        """Count history records into their memory entries"""
+        updates = defaultdict(lambda: {'$inc': {}, '$max': {}, '$set': {}, '$setOnInsert': {}})
+        for doc in documents:
+            normalized = normalize(doc.get('input_text'))
+            if not normalized or not doc.get('output_text') or doc.get('translation_method') == MEMORY_METHOD:
+                continue
+            source, target = doc['source_language'], doc['target_language']
+            update = updates[memory_key(doc['input_text'], source, target)]
+            output = f"outputs.{_output_key(doc['output_text'])}"
+            created_at = _utc(doc['created_at'])
+
+            update['$inc']['uses'] = update['$inc'].get('uses', 0) + 1
+            update['$inc'][f'{output}.uses'] = update['$inc'].get(f'{output}.uses', 0) + 1
+            update['$max']['last_used'] = max(update['$max'].get('last_used', created_at), created_at)
+            update['$max'][f'{output}.last_used'] = max(update['$max'].get(f'{output}.last_used', created_at),
+                                                        created_at)
+            if doc.get('confidence_score') is not None:
+                update['$max'][f'{output}.confidence'] = max(update['$max'].get(f'{output}.confidence', 0),
+                                                             float(doc['confidence_score']))
+            update['$set'].update({
+                'input_text': doc['input_text'],
+                f'{output}.text': doc['output_text'],
+                f'{output}.method': doc.get('translation_method', ''),
+                f'{output}.history_id': str(doc['_id']),
+                # Returned with memory hits, so words still missing from the dictionary keep being counted
+                f'{output}.unmatched_words': doc.get('unmatched_words') or [],
+                f'{output}.unmatched_language': doc.get('unmatched_language')
+            })
+            update['$setOnInsert'].update({
+                'source_language': source,
+                'target_language': target,
+                'normalized': normalized,
+                'terms': index_terms(doc['input_text'])
+            })
+        if updates:
+            self._writes().bulk_write([
+                UpdateOne({'_id': key}, update, upsert=True) for key, update in updates.items()
+            ], ordered=False)
+        return len(updates)
+
+    def record_feedback(self, documents):
+        """Apply feedback to entries for the same input that gave the translation it is about.
+
+        A differing suggestion counts against the current translation and
+        for the suggestion; a rating of 4-5 without one endorses the current
+        translation and a rating of 1-2 counts against it.
+        """
+        operations = []
+        for doc in documents:
+            normalized = normalize(doc.get('original_text'))
+            if not normalized:
+                continue
+            current = (doc.get('current_translation') or '').strip()
+            suggested = (doc.get('suggested_translation') or '').strip()
+            rating = doc.get('user_rating')
+            try:
+                rating = int(rating) if rating is not None else None
+            except (TypeError, ValueError):
+                rating = None
+
+            entries = list(self._collection().find({'normalized': normalized}, {'outputs': 1}))
+            if current:
+                entries = [entry for entry in entries if _output_key(current) in (entry.get('outputs') or {})]
+            elif len(entries) != 1:
+                # Without the current translation the language pair is only known when there is one
+                continue
+
+            update = {'$inc': {}, '$set': {}, '$max': {}}
+            if suggested and normalize(suggested) != normalize(current):
+                if current:
+                    update['$inc'][f'outputs.{_output_key(current)}.corrected'] = 1
+                output = f'outputs.{_output_key(suggested)}'
+                update['$inc'][f'{output}.suggested'] = 1
+                update['$set'][f'{output}.text'] = suggested
+                update['$set'][f'{output}.method'] = 'user_suggestion'
+            elif current and rating is not None and rating >= 4:
+                output = f'outputs.{_output_key(current)}'
+                update['$inc'][f'{output}.endorsed'] = 1
+            elif current and rating is not None and rating <= 2:
+                update['$inc'][f'outputs.{_output_key(current)}.corrected'] = 1
+                output = None
+            else:
+                continue
+            if output is not None:
+                # Suggestions and endorsements expire like translator outputs unless users keep confirming them
+                created_at = doc.get('created_at') or datetime.now(timezone.utc)
+                update['$max'][f'{output}.last_feedback'] = _utc(created_at)
+            for operator in ('$set', '$max'):
+                if not update[operator]:
+                    del update[operator]
+            operations.extend(UpdateOne({'_id': entry['_id']}, update) for entry in entries)
+        if operations:
+            self._writes().bulk_write(operations, ordered=False)
+        return len(operations)
+
+    # ------------------------------------------------------------------
+    # Backfill of history written before the memory existed
+    # ------------------------------------------------------------------
+
+    def start(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        self._collection().update_one({'_id': META_ID}, {'$setOnInsert': {'live_since': now}}, upsert=True)
+        return self._collection().find_one({'_id': META_ID})
+
+    def _claim_backfill(self, owner, now=None):
+        """Take or renew the backfill lease; the meta document when held by owner, else None"""
+        now = now or datetime.now(timezone.utc)
+        return self._collection().find_one_and_update(
+            {'_id': META_ID, 'backfilled_at': {'$exists': False}, '$or': [
+                {'backfill_owner': {'$exists': False}},
+                {'backfill_owner': owner},
+                {'backfill_lease': {'$lt': now}}
+            ]},
+            {'$set': {'backfill_owner': owner, 'backfill_lease': now + timedelta(seconds=BACKFILL_LEASE_SECONDS)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _checkpoint(self, owner, name, value):
+        """Save a checkpoint and renew the lease; False when another process has taken the backfill"""
+        now = datetime.now(timezone.utc)
+        result = self._collection().update_one(
+            {'_id': META_ID, 'backfill_owner': owner},
+            {'$set': {name: value, 'backfill_lease': now + timedelta(seconds=BACKFILL_LEASE_SECONDS)}}
+        )
+        return result.matched_count > 0
+
+    def backfill(self, history, feedback, batch_size=1000, owner=None):
+        """Count history and feedback from before live recording began, resuming from checkpoints.
+
+        Only the process holding the backfill lease on the meta document
+        counts, so concurrent starts (e.g. the reloader's two processes) do
+        not count history twice. Checkpoints are saved after each batch, so
+        a backfill taken over from a process that died counts at most one
+        batch twice. Returns how many history records were counted.
+        """
+        self.start()
+        owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        meta = self._claim_backfill(owner)
+        if meta is None:
+            # Finished, or another process holds the lease
+            return 0
+        before = {'created_at': {'$lt': meta['live_since']}}
+        counted = 0
+        for name, source, record in (('checkpoint', history, self.record_translations),
+                                     ('feedback_checkpoint', feedback, self.record_feedback)):
+            checkpoint = meta.get(name)
+            while True:
+                query = before
+                if checkpoint:
+                    query = {'$and': [before, {'$or': [
+                        {'created_at': {'$gt': checkpoint['created_at']}},
+                        {'created_at': checkpoint['created_at'], '_id': {'$gt': checkpoint['_id']}}
+                    ]}]}
+                batch = list(source.find(query, {'search_terms': 0}).sort(OLDEST_FIRST).limit(batch_size))
+                if not batch:
+                    break
+                record(batch)
+                if source is history:
+                    counted += len(batch)
+                checkpoint = {'created_at': batch[-1]['created_at'], '_id': batch[-1]['_id']}
+                if not self._checkpoint(owner, name, checkpoint):
+                    return counted
+
+        self._collection().update_one(
+            {'_id': META_ID, 'backfill_owner': owner},
+            {'$set': {'backfilled_at': datetime.now(timezone.utc)}, '$unset': {'backfill_lease': ''}}
+        )
+        return counted
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def lookup(self, text, source_language, target_language, now=None):
+        """Best remembered translation of exactly this (normalized) input, or None.
+
+        None as well when the best output is not servable: too little
+        agreement, or a translator output older than max_age_days.
+        """
+        if not normalize(text):
+            return None
+        entry = self._collection().find_one({'_id': memory_key(text, source_language, target_language)})
+        if not entry or not entry.get('outputs'):
+            return None
+        best = score_outputs(entry, self.min_agreement)[0]
+        if not servable(best, now or datetime.now(timezone.utc), self.min_agreement, self.max_age_days):
+            return None
+        return memory_match(entry, 'exact', min_agreement=self.min_agreement)
+
+    def suggest(self, text, source_language, target_language, limit=5, min_similarity=0.6):
+        """Remembered translations of similar inputs, most similar first"""
+        normalized = normalize(text)
+        words = query_terms(text)
+        if not words:
+            return []
+        candidates = self._collection().find(
+            {'source_language': source_language, 'target_language': target_language, 'terms': {'$in': words}},
+            {'input_text': 1, 'source_language': 1, 'target_language': 1, 'normalized': 1, 'uses': 1, 'outputs': 1}
+        ).limit(FUZZY_CANDIDATES)
+
+        scored = []
+        for entry in candidates:
+            if not entry.get('outputs'):
+                continue
+            similarity = SequenceMatcher(None, normalized, entry.get('normalized', '')).ratio()
+            if similarity >= min_similarity:
+                scored.append((similarity, entry))
+        scored.sort(key=lambda item: (item[0], item[1].get('uses', 0)), reverse=True)
+        return [memory_match(entry, 'exact' if similarity == 1.0 else 'fuzzy', similarity, self.min_agreement)
+                for similarity, entry in scored[:limit]]
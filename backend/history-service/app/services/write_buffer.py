@@ -0,0 +1,92 @@
+import atexit
+import threading
+import time
+
+
+class HistoryWriteBuffer:
+    """Collects history documents and writes them in batches.
+
+    A batch is flushed when it reaches ``max_size`` documents or when the
+    oldest buffered document is ``flush_seconds`` old, whichever comes
+    first. Documents carry their ObjectId already, so callers get an id
+    back before the write happens. When ``max_pending`` documents are
+    waiting the buffer takes no more and the caller writes the overflow
+    itself (counted as ``overflowed``). Anything still buffered is flushed
+    at interpreter exit; a crash can lose up to one batch, which is
+    acceptable for history.
+    """
+
+    def __init__(self, write, max_size=1000, flush_seconds=1.0, max_pending=100000):
+        self._write = write
+        self.max_size = max_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.batches = 0
+        self.overflowed = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='history-write-buffer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        return self
+
+    def add(self, documents):
+        """Buffer documents; returns how many were accepted (the caller writes the rest when full)"""
+        with self._lock:
+            room = max(self.max_pending - len(self._buffer), 0)
+            accepted = documents[:room]
+            self.overflowed += len(documents) - len(accepted)
+            if accepted and not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.extend(accepted)
+            full = len(self._buffer) >= self.max_size
+        if full:
+            self._wake.set()
+        return len(accepted)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                wait = (self.flush_seconds if self._oldest is None
+                        else self._oldest + self.flush_seconds - time.monotonic())
+            if wait > 0:
+                self._wake.wait(wait)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far, in batches of at most max_size"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer, self._oldest = self._buffer, [], None
+            for start in range(0, len(pending), self.max_size):
+                batch = pending[start:start + self.max_size]
+                try:
+                    self._write(batch)
+                    self.flushed += len(batch)
+                    self.batches += 1
+                except Exception as e:
+                    self.errors += 1
+                    print(f"❌ Error flushing {len(batch)} history records: {e}")
+
+    def info(self):
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            'pending': pending,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'overflowed': self.overflowed,
+            'errors': self.errors,
+            'max_size': self.max_size,
+            'flush_seconds': self.flush_seconds
+        }
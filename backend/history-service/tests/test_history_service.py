@@ -0,0 +1,881 @@
+"""
+Unit tests for the history service: write buffer, cursors, archive,
+statistics rollups, translation memory and the popular-query sketches.
+
+MongoDB is replaced by a small in-memory FakeCollection that understands
+the queries and update operators these services use, so the tests run
+without a live database.  bson, flask and pymongo are real packages.
+"""
+
+import copy
+import os
+import sys
+import types
+import pathlib
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# ---------------------------------------------------------------------------
+# Flush any 'app' package left in sys.modules by a previously-run service's
+# test file so that this service's own 'app' package is imported cleanly.
+# ---------------------------------------------------------------------------
+for _k in list(sys.modules.keys()):
+    if _k == "app" or _k.startswith("app."):
+        del sys.modules[_k]
+
+# ---------------------------------------------------------------------------
+# Pre-stub the app package and app.db.mongo so nothing connects to MongoDB
+# or builds the Flask application.
+# ---------------------------------------------------------------------------
+
+_svc_root = str(pathlib.Path(__file__).resolve().parents[1])
+_app_dir = _svc_root + "/app"
+
+
+def _pkg(name, real_path):
+    """Return a minimal package stub with __path__ pointing to *real_path*."""
+    mod = types.ModuleType(name)
+    mod.__path__ = [real_path]
+    mod.__package__ = name
+    return mod
+
+
+sys.modules["app"] = _pkg("app", _app_dir)
+sys.modules["app.db"] = _pkg("app.db", _app_dir + "/db")
+
+_mongo_mod = types.ModuleType("app.db.mongo")
+for _name in ("get_db", "translation_history_collection", "feedback_collection", "history_rollups_collection",
+              "translation_memory_collection", "heavy_hitters_collection"):
+    setattr(_mongo_mod, _name, MagicMock(return_value=None))
+_mongo_mod.init_mongo = MagicMock()
+sys.modules["app.db.mongo"] = _mongo_mod
+
+sys.path.insert(0, _svc_root)
+
+from app.services.archive import HistoryArchive  # noqa: E402
+from app.services.heavy_hitters import CountMinSketch, HeavyHitterSketch, HeavyHitters  # noqa: E402
+from app.services.history_service import HistoryService, build_history_document, history_item  # noqa: E402
+from app.services.pagination import after_cursor, decode_cursor, encode_cursor  # noqa: E402
+from app.services.rollups import HistoryRollups  # noqa: E402
+from app.services.search_terms import MAX_PREFIX, MAX_TERMS, MAX_WORDS, index_terms, query_terms  # noqa: E402
+from app.services.translation_memory import (  # noqa: E402
+    MEMORY_METHOD, TranslationMemory, memory_key, score_outputs
+)
+from app.services.write_buffer import HistoryWriteBuffer  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# In-memory stand-in for a pymongo collection
+# ---------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _set(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _condition(value, op, arg):
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$in":
+        values = value if isinstance(value, list) else [value]
+        return any(v in arg for v in values)
+    if op == "$all":
+        return isinstance(value, list) and all(v in value for v in arg)
+    if op == "$ne":
+        return value != arg
+    if value is _MISSING:
+        return False
+    return {"$lt": value < arg, "$lte": value <= arg, "$gt": value > arg, "$gte": value >= arg}[op]
+
+
+def _matches(doc, query):
+    for key, cond in (query or {}).items():
+        if key == "$and":
+            if not all(_matches(doc, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        else:
+            value = _get(doc, key)
+            if isinstance(cond, dict) and cond and all(op.startswith("$") for op in cond):
+                if not all(_condition(value, op, arg) for op, arg in cond.items()):
+                    return False
+            elif isinstance(value, list) and not isinstance(cond, list):
+                if cond not in value:
+                    return False
+            elif value != cond:
+                return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if all(not flag for key, flag in projection.items() if key != "_id"):
+        return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+    keep = {k for k, flag in projection.items() if flag} | ({"_id"} if projection.get("_id", 1) else set())
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k in keep}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for key, order in reversed(keys):
+            self._docs.sort(key=lambda doc: _get(doc, key), reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class FakeCollection:
+    """Just enough of pymongo's Collection for the history services"""
+
+    def __init__(self, docs=()):
+        self.docs = {}
+        for doc in docs:
+            self.insert_one(doc)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create_index(self, *args, **kwargs):
+        return "index"
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(f"duplicate _id {doc['_id']}")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return MagicMock(inserted_id=doc["_id"])
+
+    def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.insert_one(doc)
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_project(doc, projection) for doc in self.docs.values() if _matches(doc, query)])
+
+    def find_one(self, query=None, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        return next(iter(cursor), None)
+
+    def count_documents(self, query):
+        return sum(1 for doc in self.docs.values() if _matches(doc, query))
+
+    def delete_many(self, query):
+        for key in [key for key, doc in self.docs.items() if _matches(doc, query)]:
+            del self.docs[key]
+
+    def replace_one(self, query, replacement, upsert=False):
+        existing = next((doc for doc in self.docs.values() if _matches(doc, query)), None)
+        if existing is None and not upsert:
+            return MagicMock(matched_count=0)
+        _id = existing["_id"] if existing is not None else query.get("_id", ObjectId())
+        self.docs[_id] = dict(copy.deepcopy(replacement), _id=_id)
+        return MagicMock(matched_count=0 if existing is None else 1)
+
+    def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs.values() if _matches(doc, query)), None)
+        inserting = doc is None
+        if inserting:
+            if not upsert:
+                return MagicMock(matched_count=0, modified_count=0, upserted_id=None)
+            doc = {key: value for key, value in query.items() if not key.startswith("$")
+                   and not isinstance(value, dict)}
+            doc.setdefault("_id", ObjectId())
+        for op, fields in update.items():
+            for path, value in fields.items():
+                current = _get(doc, path)
+                if op == "$set" or (op == "$setOnInsert" and inserting):
+                    _set(doc, path, copy.deepcopy(value))
+                elif op == "$inc":
+                    _set(doc, path, (0 if current is _MISSING else current) + value)
+                elif op == "$max" and (current is _MISSING or value > current):
+                    _set(doc, path, value)
+                elif op == "$min" and (current is _MISSING or value < current):
+                    _set(doc, path, value)
+                elif op == "$unset":
+                    parent = _get(doc, path.rpartition(".")[0]) if "." in path else doc
+                    if isinstance(parent, dict):
+                        parent.pop(path.rpartition(".")[2], None)
+        self.docs[doc["_id"]] = doc
+        return MagicMock(matched_count=0 if inserting else 1, modified_count=0 if inserting else 1,
+                         upserted_id=doc["_id"] if inserting else None)
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=False, projection=None):
+        before = next((copy.deepcopy(doc) for doc in self.docs.values() if _matches(doc, query)), None)
+        if before is None and not upsert:
+            return None
+        result = self.update_one(query, update, upsert=upsert)
+        after = self.docs[before["_id"] if before is not None else result.upserted_id]
+        return _project(after if return_document else before, projection) if (before or return_document) else None
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        """$match then $group on field references, hourly $dateToString and {"$sum": 1}"""
+        match, group = pipeline[0]["$match"], pipeline[1]["$group"]
+
+        def evaluate(doc, expression):
+            if isinstance(expression, dict):
+                date = _get(doc, expression["$dateToString"]["date"][1:])
+                return date.astimezone(timezone.utc).strftime(expression["$dateToString"]["format"])
+            value = _get(doc, expression[1:])
+            return None if value is _MISSING else value
+
+        counts = {}
+        for doc in self.docs.values():
+            if _matches(doc, match):
+                key = tuple((name, evaluate(doc, expression)) for name, expression in group["_id"].items())
+                counts[key] = counts.get(key, 0) + 1
+        return [{"_id": dict(key), "count": count} for key, count in counts.items()]
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            if isinstance(operation, UpdateOne):
+                self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, ReplaceOne):
+                self.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, InsertOne):
+                self.insert_one(operation._doc)
+
+
+def _history(input_text, output_text, created_at=None, method="dictionary", confidence=0.9,
+             source="english", target="vedda", **extra):
+    record = {
+        "input_text": input_text,
+        "output_text": output_text,
+        "source_language": source,
+        "target_language": target,
+        "translation_method": method,
+        "confidence_score": confidence,
+    }
+    record.update(extra)
+    return build_history_document(record, created_at or datetime.now(timezone.utc))
+
+
+# ---------------------------------------------------------------------------
+# HistoryWriteBuffer and HistoryService._store
+# ---------------------------------------------------------------------------
+
+class TestWriteBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.written = []
+        self.buffer = HistoryWriteBuffer(self.written.append, max_size=3, flush_seconds=60, max_pending=5)
+
+    def test_flush_writes_in_batches_of_max_size(self):
+        self.assertEqual(self.buffer.add(list(range(5))), 5)
+        self.buffer.flush()
+        self.assertEqual(self.written, [[0, 1, 2], [3, 4]])
+        info = self.buffer.info()
+        self.assertEqual((info["pending"], info["flushed"], info["batches"]), (0, 5, 2))
+
+    def test_full_batch_wakes_the_writer(self):
+        self.buffer.add([1, 2])
+        self.assertFalse(self.buffer._wake.is_set())
+        self.buffer.add([3])
+        self.assertTrue(self.buffer._wake.is_set())
+
+    def test_overflow_is_reported_not_dropped(self):
+        self.assertEqual(self.buffer.add(list(range(4))), 4)
+        self.assertEqual(self.buffer.add([4, 5, 6]), 1)
+        info = self.buffer.info()
+        self.assertEqual(info["pending"], 5)
+        self.assertEqual(info["overflowed"], 2)
+        self.assertNotIn("dropped", info)
+
+    def test_failed_batch_is_counted_and_later_batches_still_written(self):
+        calls = []
+
+        def write(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise RuntimeError("down")
+
+        buffer = HistoryWriteBuffer(write, max_size=2, max_pending=10)
+        buffer.add([1, 2, 3])
+        buffer.flush()
+        self.assertEqual(calls, [[1, 2], [3]])
+        self.assertEqual((buffer.errors, buffer.flushed), (1, 1))
+
+    def test_background_thread_flushes_after_flush_seconds(self):
+        buffer = HistoryWriteBuffer(self.written.append, max_size=100, flush_seconds=0.05)
+        with patch("app.services.write_buffer.atexit"):
+            buffer.start()
+        buffer.add(["a"])
+        for _ in range(100):
+            if self.written:
+                break
+            buffer._wake.wait(0.02)
+        self.assertEqual(self.written, [["a"]])
+
+
+class TestStore(unittest.TestCase):
+
+    def _service(self, buffer):
+        service = HistoryService.__new__(HistoryService)
+        service.buffer = buffer
+        service._insert_documents = MagicMock(side_effect=len)
+        return service
+
+    def test_overflow_is_written_directly(self):
+        buffer = HistoryWriteBuffer(MagicMock(), max_size=10, max_pending=2)
+        service = self._service(buffer)
+        stored, buffered = service._store([1, 2, 3, 4])
+        self.assertEqual((stored, buffered), (4, True))
+        service._insert_documents.assert_called_once_with([3, 4])
+        self.assertEqual(buffer.info()["overflowed"], 2)
+
+    def test_without_buffer_writes_straight_through(self):
+        service = self._service(None)
+        self.assertEqual(service._store([1, 2]), (2, False))
+
+
+# ---------------------------------------------------------------------------
+# Keyset pagination cursors
+# ---------------------------------------------------------------------------
+
+class TestCursors(unittest.TestCase):
+
+    def test_round_trip(self):
+        doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)}
+        self.assertEqual(decode_cursor(encode_cursor(doc)), (doc["created_at"], doc["_id"]))
+
+    def test_naive_times_are_utc_and_truncated_to_milliseconds(self):
+        doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 0, 0, 999999)}
+        created_at, _ = decode_cursor(encode_cursor(doc))
+        self.assertEqual(created_at, datetime(2024, 5, 1, 12, 0, 0, 999000, tzinfo=timezone.utc))
+
+    def test_malformed_cursors_are_rejected(self):
+        for token in ("", "abc", "123-nothex", "123", "-" + str(ObjectId())):
+            with self.subTest(token=token):
+                with self.assertRaises(ValueError):
+                    decode_cursor(token)
+
+    def test_pages_do_not_overlap_within_one_millisecond(self):
+        moment = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        collection = FakeCollection([{"_id": ObjectId(), "created_at": moment} for _ in range(5)])
+        seen, cursor = [], None
+        while True:
+            query = after_cursor(cursor) if cursor else {}
+            page = list(collection.find(query).sort([("created_at", -1), ("_id", -1)]).limit(2))
+            seen.extend(doc["_id"] for doc in page)
+            if len(page) < 2:
+                break
+            cursor = encode_cursor(page[-1])
+        self.assertEqual(sorted(seen, reverse=True), seen)
+        self.assertEqual(len(set(seen)), 5)
+
+
+# ---------------------------------------------------------------------------
+# Search terms
+# ---------------------------------------------------------------------------
+
+class TestSearchTerms(unittest.TestCase):
+
+    def test_prefixes_match_word_starts(self):
+        terms = index_terms("Hello world", "හෙලෝ")
+        for query in ("hel", "HELLO wor", "හෙ"):
+            self.assertTrue(set(query_terms(query)) <= set(terms), query)
+        self.assertFalse(set(query_terms("ello")) <= set(terms))
+
+    def test_distinct_words_are_capped(self):
+        text = " ".join(f"w{i}" for i in range(MAX_WORDS + 10))
+        self.assertNotIn(f"w{MAX_WORDS + 5}", index_terms(text))
+
+    def test_prefixes_stop_at_max_prefix(self):
+        terms = index_terms("internationalization")
+        self.assertEqual(max(map(len, terms)), MAX_PREFIX)
+        self.assertEqual(len(terms), MAX_PREFIX - 1)
+        for query in ("internationalization", "internationally", "internat"):
+            self.assertTrue(set(query_terms(query)) <= set(terms), query)
+
+    def test_terms_per_record_are_capped(self):
+        words = [f"{chr(97 + i % 26)}{chr(97 + i // 26)}qwertyuiop" for i in range(MAX_WORDS)]
+        terms = index_terms(" ".join(words))
+        self.assertLessEqual(len(terms), MAX_TERMS)
+        # Indexed words keep every prefix, so they stay fully searchable
+        self.assertTrue(set(query_terms(words[0])) <= set(terms))
+        self.assertTrue(set(query_terms(words[0][:3])) <= set(terms))
+
+    def test_records_indexed_with_longer_prefixes_still_match(self):
+        word = "internationalization"
+        old_terms = {word} | {word[:length] for length in range(2, len(word))}
+        self.assertTrue(set(query_terms("internationalisation")) <= old_terms)
+
+
+# ---------------------------------------------------------------------------
+# HistoryArchive
+# ---------------------------------------------------------------------------
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive = HistoryArchive(os.path.join(self.tmp.name, "archive"))
+        start = datetime(2024, 1, 30, tzinfo=timezone.utc)
+        self.docs = [_history(f"word {i}", f"out {i}", start + timedelta(days=i)) for i in range(6)]
+        self.collection = FakeCollection(self.docs)
+        self.cutoff = start + timedelta(days=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _archive(self, **kwargs):
+        return self.archive.archive_before(self.collection, self.cutoff, history_item, ObjectId,
+                                           projection={"search_terms": 0}, **kwargs)
+
+    def test_moves_old_records_into_month_parts(self):
+        self.assertEqual(self._archive(batch_size=10), 4)
+        self.assertEqual(self.collection.count_documents({}), 2)
+        info = self.archive.info()
+        self.assertEqual(info["records"], 4)
+        self.assertEqual(info["months"], {"2024-01": 2, "2024-02": 2})
+        self.assertIsNone(self.archive.index()["pending"])
+
+    def test_query_reads_archived_records(self):
+        self._archive()
+        items = list(self.archive.query(query="word"))
+        self.assertEqual([item["input_text"] for item in items], [f"word {i}" for i in range(4)])
+        self.assertEqual(len(list(self.archive.query(source_language="sinhala"))), 0)
+
+    def test_interrupted_run_resumes_pending_part(self):
+        real_delete = self.collection.delete_many
+        with patch.object(self.collection, "delete_many", side_effect=RuntimeError("connection lost")):
+            with self.assertRaises(RuntimeError):
+                self._archive(batch_size=10)
+        pending = self.archive.index()["pending"]
+        self.assertIsNotNone(pending)
+        self.assertEqual(self.collection.count_documents({}), 6)
+
+        # A new run (fresh index read) deletes what the pending part holds, then carries on
+        archive = HistoryArchive(self.archive.directory)
+        self.collection.delete_many = real_delete
+        archive.archive_before(self.collection, self.cutoff, history_item, ObjectId,
+                               projection={"search_terms": 0})
+        self.assertIsNone(archive.index()["pending"])
+        self.assertEqual(self.collection.count_documents({}), 2)
+        archived = [item["id"] for item in archive.query()]
+        self.assertEqual(len(archived), len(set(archived)))
+        self.assertEqual(len(archived), 4)
+
+    def test_index_is_reloaded_after_another_process_archives(self):
+        # Another worker serving queries has already read the (empty) index
+        reader = HistoryArchive(self.archive.directory)
+        self.assertEqual(reader.info()["records"], 0)
+        self._archive()
+        self.assertEqual(reader.info()["records"], 4)
+        self.assertEqual(len(list(reader.query())), 4)
+
+    def test_own_writes_do_not_force_a_reload(self):
+        self._archive()
+        index = self.archive.index()
+        self.assertIs(self.archive.index(), index)
+
+    def test_lock_is_exclusive(self):
+        with self.archive.lock() as first:
+            with self.archive.lock() as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+        with self.archive.lock() as again:
+            self.assertTrue(again)
+
+
+# ---------------------------------------------------------------------------
+# HistoryRollups
+# ---------------------------------------------------------------------------
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = FakeCollection()
+        self.rollups = HistoryRollups(lambda: self.collection)
+        self.live_since = datetime(2024, 3, 10, 12, 0, tzinfo=timezone.utc)
+        self.rollups.start(now=self.live_since)
+
+    def _feedback(self, created_at, feedback_type="correction"):
+        return {"_id": ObjectId(), "created_at": created_at, "feedback_type": feedback_type}
+
+    def test_live_and_backfill_counts_are_added_together(self):
+        old = [_history("water", "diya", self.live_since - timedelta(hours=2)),
+               _history("tree", "gaha", self.live_since - timedelta(days=3), method="google", source="sinhala")]
+        new = [_history("water", "diya", self.live_since + timedelta(minutes=5))]
+        history = FakeCollection(old + new)
+        feedback = FakeCollection([self._feedback(self.live_since - timedelta(hours=1))])
+        self.rollups.record_translations(new)
+        self.rollups.record_feedback([self._feedback(self.live_since + timedelta(hours=1), "endorsement")])
+
+        self.assertFalse(self.rollups.is_backfilled())
+        self.assertGreater(self.rollups.backfill(history, feedback), 0)
+        self.assertTrue(self.rollups.is_backfilled())
+
+        total, recent = self.rollups.read(now=self.live_since + timedelta(hours=1))
+        self.assertEqual(total["translations"], 3)
+        self.assertEqual(total["pairs"], {"english|vedda": 2, "sinhala|vedda": 1})
+        self.assertEqual(total["methods"], {"dictionary": 2, "google": 1})
+        self.assertEqual(total["feedback"], 2)
+        self.assertEqual(total["feedback_types"], {"correction": 1, "endorsement": 1})
+        self.assertEqual(recent, 3)
+        # Records written after live counting began are not backfilled again
+        today = self.collection.docs[f"day:{self.live_since:%Y-%m-%d}"]
+        self.assertEqual((today["live"]["translations"], today["backfill"]["translations"]), (1, 1))
+
+    def test_recent_window_is_exact_to_the_hour(self):
+        now = datetime(2024, 3, 12, 14, 30, tzinfo=timezone.utc)
+        since = datetime(2024, 3, 11, 14, 0, tzinfo=timezone.utc)
+        self.rollups.record_translations([
+            _history("a", "a", since - timedelta(days=1)),         # previous day
+            _history("b", "b", since - timedelta(minutes=1)),      # first day, hour before the window
+            _history("c", "c", since),                             # first hour of the window
+            _history("d", "d", since.replace(hour=23, minute=59)),  # last hour of the first day
+            _history("e", "e", now.replace(hour=0)),                # start of the next (whole) day
+            _history("f", "f", now),                                # the current hour
+        ])
+        total, recent = self.rollups.read(now=now, recent_days=1)
+        self.assertEqual(total["translations"], 6)
+        self.assertEqual(recent, 4)
+
+    def test_repeated_backfill_does_not_double_count(self):
+        history = FakeCollection([_history("water", "diya", self.live_since - timedelta(hours=2))])
+        feedback = FakeCollection()
+        self.rollups.backfill(history, feedback)
+        self.assertEqual(self.rollups.backfill(history, feedback), 0)
+
+        # Even a forced re-run (backfilled_at cleared) replaces its counts rather than adding to them
+        self.collection.update_one({"_id": "meta"}, {"$unset": {"backfilled_at": ""}})
+        self.assertGreater(self.rollups.backfill(history, feedback), 0)
+        total, _ = self.rollups.read(now=self.live_since)
+        self.assertEqual(total["translations"], 1)
+
+    def test_start_keeps_the_first_live_since(self):
+        meta = self.rollups.start(now=self.live_since + timedelta(days=1))
+        self.assertEqual(meta["live_since"], self.live_since)
+
+
+# ---------------------------------------------------------------------------
+# TranslationMemory
+# ---------------------------------------------------------------------------
+
+class TestTranslationMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = FakeCollection()
+        self.memory = TranslationMemory(lambda: self.collection)
+
+    def _entry(self, text="water", source="english", target="vedda"):
+        return self.collection.docs[memory_key(text, source, target)]
+
+    def test_repeated_translations_add_uses(self):
+        self.memory.record_translations([_history("Water", "diya"), _history("water!", "diya"),
+                                         _history("water", "watura", confidence=0.5)])
+        entry = self._entry()
+        self.assertEqual(entry["uses"], 3)
+        outputs = {output["text"]: output for output in entry["outputs"].values()}
+        self.assertEqual(outputs["diya"]["uses"], 2)
+        self.assertEqual(outputs["watura"]["confidence"], 0.5)
+
+    def test_memory_served_translations_are_not_counted(self):
+        self.memory.record_translations([_history("water", "diya", method=MEMORY_METHOD)])
+        self.assertEqual(self.collection.docs, {})
+
+    def test_vote_math(self):
+        entry = {"outputs": {
+            "a": {"text": "diya", "uses": 3, "endorsed": 1, "confidence": 1.0},
+            "b": {"text": "watura", "uses": 1, "suggested": 1, "corrected": 0},
+            "c": {"text": "bad", "uses": 1, "corrected": 2},
+        }}
+        ranked = score_outputs(entry)
+        # diya: 3 + 2*1 = 5, watura: 1 + 3*1 = 4, bad: max(1 - 6, 0) = 0
+        self.assertEqual([output["text"] for output in ranked], ["diya", "watura", "bad"])
+        # watura has no translator confidence: scaled by 1 of MIN_AGREEMENT users agreeing
+        self.assertEqual([output["confidence"] for output in ranked], [round(5 / 9, 3), round(4 / 9 / 3, 3), 0.0])
+
+    def test_suggestion_corrects_current_and_counts_for_itself(self):
+        self.memory.record_translations([_history("water", "diya")])
+        self.memory.record_feedback([{"original_text": "Water", "current_translation": "diya",
+                                      "suggested_translation": "watura", "user_rating": 2}])
+        outputs = {output["text"]: output for output in self._entry()["outputs"].values()}
+        self.assertEqual(outputs["diya"]["corrected"], 1)
+        self.assertEqual(outputs["watura"]["suggested"], 1)
+        self.assertEqual(outputs["watura"]["method"], "user_suggestion")
+
+    def test_ratings_endorse_or_correct_the_current_translation(self):
+        self.memory.record_translations([_history("water", "diya")])
+        self.memory.record_feedback([
+            {"original_text": "water", "current_translation": "diya", "user_rating": 5},
+            {"original_text": "water", "current_translation": "diya", "user_rating": "4"},
+            {"original_text": "water", "current_translation": "diya", "user_rating": 1},
+            {"original_text": "water", "current_translation": "diya", "user_rating": 3},
+        ])
+        output = next(iter(self._entry()["outputs"].values()))
+        self.assertEqual((output.get("endorsed"), output.get("corrected")), (2, 1))
+
+    def test_feedback_only_touches_entries_that_gave_that_translation(self):
+        self.memory.record_translations([_history("water", "diya"),
+                                         _history("water", "වතුර", target="sinhala")])
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya",
+                                      "user_rating": 5}])
+        sinhala = next(iter(self._entry(target="sinhala")["outputs"].values()))
+        self.assertNotIn("endorsed", sinhala)
+
+    def test_lookup_needs_repeated_agreement(self):
+        self.memory.record_translations([_history("water", "diya", confidence=1.0)])
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya", "user_rating": 5}])
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+        # Endorsements count as agreement alongside the translator's uses
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya", "user_rating": 4}])
+        self.assertEqual(self.memory.lookup("water", "english", "vedda")["translation"], "diya")
+
+        self.memory.record_translations([_history("fire", "gini")] * 2)
+        self.assertIsNone(self.memory.lookup("fire", "english", "vedda"))
+        self.memory.record_translations([_history("fire", "gini")])
+        self.assertEqual(self.memory.lookup("fire", "english", "vedda")["translation"], "gini")
+
+    def test_one_suggestion_does_not_replace_the_translation(self):
+        self.memory.record_translations([_history("water", "diya")])
+        suggestion = {"original_text": "water", "current_translation": "diya", "suggested_translation": "watura"}
+        self.memory.record_feedback([suggestion])
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+        best = score_outputs(self._entry())[0]
+        self.assertEqual((best["text"], best["confidence"]), ("watura", round(1 / 3, 3)))
+        self.memory.record_feedback([suggestion, suggestion])
+        hit = self.memory.lookup("water", "english", "vedda")
+        self.assertEqual((hit["translation"], hit["confidence"]), ("watura", 1.0))
+
+    def test_hits_return_the_unmatched_words_of_the_output(self):
+        self.memory.record_translations([_history("water stream", "diya stream", unmatched_words=["stream"])] * 3)
+        hit = self.memory.lookup("water stream", "english", "vedda")
+        self.assertEqual((hit["unmatched_words"], hit["unmatched_language"]), (["stream"], "english"))
+
+    def test_corrected_outputs_are_not_served(self):
+        self.memory.record_translations([_history("water", "diya")] * 3)
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya", "user_rating": 1}])
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+
+    def test_stale_translator_outputs_expire(self):
+        created_at = datetime.now(timezone.utc) - timedelta(days=40)
+        self.memory.record_translations([_history("water", "diya", created_at=created_at)] * 3)
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+        self.assertIsNotNone(self.memory.lookup("water", "english", "vedda", now=created_at + timedelta(days=29)))
+        # Users confirming the answer keep it fresh
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya", "user_rating": 5}])
+        self.assertEqual(self.memory.lookup("water", "english", "vedda")["translation"], "diya")
+
+    def test_suggestions_expire_too(self):
+        self.memory.record_translations([_history("water", "diya")])
+        suggested_at = datetime.now(timezone.utc) - timedelta(days=40)
+        self.memory.record_feedback([{"original_text": "water", "current_translation": "diya",
+                                      "suggested_translation": "watura", "created_at": suggested_at}] * 3)
+        self.assertIsNone(self.memory.lookup("water", "english", "vedda"))
+        hit = self.memory.lookup("water", "english", "vedda", now=suggested_at + timedelta(days=1))
+        self.assertEqual(hit["translation"], "watura")
+
+    def _backfill_sources(self):
+        self.memory.start()
+        live_since = self.collection.docs["meta"]["live_since"]
+        history = FakeCollection([_history("water", "diya", created_at=live_since - timedelta(minutes=i))
+                                  for i in range(1, 6)])
+        feedback = FakeCollection([{"original_text": "water", "current_translation": "diya", "user_rating": 5,
+                                    "created_at": live_since - timedelta(minutes=1)}])
+        return history, feedback
+
+    def test_backfill_counts_once(self):
+        history, feedback = self._backfill_sources()
+        self.assertEqual(self.memory.backfill(history, feedback, batch_size=2, owner="a"), 5)
+        self.assertEqual(self.memory.backfill(history, feedback, batch_size=2, owner="b"), 0)
+        output = next(iter(self._entry()["outputs"].values()))
+        self.assertEqual((output["uses"], output["endorsed"]), (5, 1))
+        self.assertNotIn("backfill_lease", self.collection.docs["meta"])
+
+    def test_backfill_lease_keeps_other_processes_out(self):
+        history, feedback = self._backfill_sources()
+        self.assertIsNotNone(self.memory._claim_backfill("a"))
+        self.assertEqual(self.memory.backfill(history, feedback, owner="b"), 0)
+        self.assertEqual(self._entry_count(), 0)
+
+    def test_lapsed_lease_is_taken_over_from_the_checkpoint(self):
+        history, feedback = self._backfill_sources()
+        original = self.memory._checkpoint
+        # Owner "a" dies after its first batch is saved
+        with patch.object(self.memory, "_checkpoint",
+                          side_effect=lambda owner, name, value: original(owner, name, value) and False):
+            self.assertEqual(self.memory.backfill(history, feedback, batch_size=2, owner="a"), 2)
+        self.assertIsNone(self.memory._claim_backfill("b"))
+        self.collection.docs["meta"]["backfill_lease"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        self.assertEqual(self.memory.backfill(history, feedback, batch_size=2, owner="b"), 3)
+        self.assertEqual(next(iter(self._entry()["outputs"].values()))["uses"], 5)
+
+    def _entry_count(self):
+        return sum(1 for key in self.collection.docs if key != "meta")
+
+    def test_suggest_finds_similar_inputs(self):
+        self.memory.record_translations([_history("drink water", "diya bonawa")])
+        matches = self.memory.suggest("drink waters", "english", "vedda")
+        self.assertEqual(matches[0]["translation"], "diya bonawa")
+        self.assertEqual(matches[0]["match"], "fuzzy")
+
+
+# ---------------------------------------------------------------------------
+# Popular query sketches
+# ---------------------------------------------------------------------------
+
+class TestHeavyHitters(unittest.TestCase):
+
+    def test_count_min_never_undercounts(self):
+        sketch = CountMinSketch(width=16, depth=3)
+        for i in range(200):
+            sketch.add(f"item{i % 20}")
+        for i in range(20):
+            self.assertGreaterEqual(sketch.estimate(f"item{i}"), 10)
+
+    def test_top_ranks_by_estimate_and_keeps_k(self):
+        sketch = HeavyHitterSketch(width=256, depth=4, k=2)
+        for item, count in (("a", 5), ("b", 3), ("c", 1), ("d", 7)):
+            sketch.add(item, item.upper(), count)
+        top = sketch.top()
+        self.assertEqual([entry["normalized"] for entry in top], ["d", "a"])
+        self.assertEqual(top[0]["text"], "D")
+        self.assertEqual(sketch.total, 16)
+
+    def test_halve_decays_counts_and_forgets_zeroes(self):
+        sketch = HeavyHitterSketch(width=256, depth=4, k=10)
+        sketch.add("a", "a", 4)
+        sketch.add("b", "b", 1)
+        sketch.halve()
+        self.assertEqual(sketch.top(), [{"text": "a", "normalized": "a", "count": 2,
+                                         "error_bound": sketch.top()[0]["error_bound"]}])
+        self.assertEqual(sketch.sketch.estimate("a"), 2)
+        self.assertEqual(sketch.total, 2)
+
+    def test_document_round_trip(self):
+        sketch = HeavyHitterSketch(width=64, depth=2, k=5)
+        for word in ("maya", "maya", "diya"):
+            sketch.add(word, word.title())
+        restored = HeavyHitterSketch.from_document(sketch.to_document())
+        self.assertEqual(restored.top(), sketch.top())
+        self.assertEqual(restored.sketch.counts, sketch.sketch.counts)
+        self.assertEqual(restored.total, 3)
+
+    def test_save_and_load_through_the_collection(self):
+        collection = FakeCollection()
+        hitters = HeavyHitters(lambda: collection, width=64, depth=2, k=5)
+        hitters.record_translations([_history("Water", "diya"), _history("water", "diya"),
+                                     _history("fire", "gini", unmatched_words=["gini"])])
+        self.assertEqual(hitters.save(), 2)
+        self.assertEqual(hitters.save(), 0)
+
+        restored = HeavyHitters(lambda: collection, width=64, depth=2, k=5)
+        self.assertEqual(restored.load(), 2)
+        top = restored.top("inputs")["english|vedda"]
+        self.assertEqual((top[0]["normalized"], top[0]["count"]), ("water", 2))
+        self.assertEqual(restored.top("unmatched")["english"][0]["text"], "gini")
+
+    def _hitters(self, collection):
+        return HeavyHitters(lambda: collection, width=64, depth=2, k=5)
+
+    def _water_count(self, hitters):
+        return hitters.top("inputs")["english|vedda"][0]["count"]
+
+    def test_saves_from_several_processes_add_up(self):
+        collection = FakeCollection()
+        first, second = self._hitters(collection), self._hitters(collection)
+        first.record_translations([_history("water", "diya")] * 3)
+        second.record_translations([_history("water", "diya")] * 2)
+        first.save()
+        second.save()
+        self.assertEqual(self._water_count(second), 5)
+        first.save()
+        # A save also picks up what the other processes saved
+        self.assertEqual(self._water_count(first), 5)
+        self.assertEqual(collection.docs["inputs:english|vedda"]["total"], 5)
+
+    def test_save_retries_when_another_process_saved_first(self):
+        collection = FakeCollection()
+        first, second = self._hitters(collection), self._hitters(collection)
+        first.record_translations([_history("water", "diya")] * 3)
+        second.record_translations([_history("water", "diya")] * 2)
+        second.save()
+        find_one = collection.find_one
+        raced = []
+
+        def find_then_race(query=None, projection=None, sort=None):
+            doc = find_one(query, projection, sort)
+            if not raced:
+                raced.append(True)
+                second.record_translations([_history("water", "diya")])
+                second.save()
+            return doc
+
+        with patch.object(collection, "find_one", side_effect=find_then_race):
+            self.assertEqual(first.save(), 1)
+        self.assertEqual(self._water_count(first), 6)
+
+    def test_failed_saves_keep_their_counts_for_the_next_save(self):
+        collection = FakeCollection()
+        hitters = self._hitters(collection)
+        hitters.record_translations([_history("water", "diya")] * 2)
+        with patch.object(collection, "find_one", side_effect=Exception("down")):
+            with self.assertRaises(Exception):
+                hitters.save()
+        self.assertEqual(self._water_count(hitters), 2)
+        hitters.record_translations([_history("water", "diya")])
+        hitters.save()
+        hitters.save()
+        self.assertEqual(collection.docs["inputs:english|vedda"]["total"], 3)
+
+    def test_one_process_halves_per_half_life(self):
+        collection = FakeCollection()
+        first, second = self._hitters(collection), self._hitters(collection)
+        first.record_translations([_history("water", "diya")] * 8)
+        first.save()
+        now = datetime.now(timezone.utc)
+        self.assertFalse(first.decay(now))
+        later = now + timedelta(hours=first.half_life_hours)
+        self.assertTrue(first.decay(later))
+        self.assertFalse(second.decay(later))
+        first.save()
+        second.save()
+        self.assertEqual(self._water_count(second), 4)
+        self.assertEqual(collection.docs["inputs:english|vedda"]["total"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,14 +3,108 @@ Vedda Language Speech-to-Text Processor
 Processes Sinhala STT output and maps it to Vedda language using MongoDB dictionary
 """
 
+import json
 import os
 import re
+import struct
+import threading
+import time
+import uuid
+import zlib
 from difflib import SequenceMatcher
 import logging
 from app.db.mongo import get_db
 
 logger = logging.getLogger(__name__)
 
+# Local cold-start snapshot of the derived dictionary maps. Layout (as in the
+# dictionary service's snapshot files): magic, 4-byte little-endian header
+# length, JSON header (format, created_at, entries, checksum), then the maps
+# as UTF-8 JSON. The checksum is the CRC-32 of that payload, so a torn or
+# truncated file is rejected instead of served.
+SNAPSHOT_MAGIC = b'VDSTT\x00\x00\x02'
+SNAPSHOT_FORMAT = 2
+_LENGTH = struct.Struct('<I')
+SNAPSHOT_MAPS = ('vedda_dict', 'sinhala_to_vedda', 'vedda_phonetic_patterns')
+# Relative snapshot paths are resolved against the service root, not the working directory
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_SNAPSHOT_PATH = os.path.join('snapshots', 'vedda_dictionary.snap')
+
+
+class SnapshotFileError(ValueError):
+    """Raised when a snapshot file is missing, corrupt or from another format"""
+
+
+def snapshot_path(path=None):
+    """Absolute snapshot path; *path* (or the default) is taken relative to the service root"""
+    if path is None:
+        path = os.getenv('VEDDA_DICTIONARY_SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH)
+    if not path:
+        return ''
+    return path if os.path.isabs(path) else os.path.join(SERVICE_ROOT, path)
+
+
+def save_snapshot(path, maps):
+    """Atomically write the dictionary *maps* to *path*; returns the header written"""
+    payload = json.dumps({name: maps[name] for name in SNAPSHOT_MAPS}, ensure_ascii=False).encode('utf-8')
+    header = {
+        'format': SNAPSHOT_FORMAT,
+        'created_at': time.time(),
+        'entries': len(maps['vedda_dict']),
+        'checksum': zlib.crc32(payload)
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per writer: processes saving to the same path never share a temp file
+    tmp_path = f'{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return header
+
+
+def load_snapshot(path):
+    """Read and verify the snapshot at *path*; returns (maps, header)"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise SnapshotFileError(f'cannot open snapshot {path}: {e}')
+    prefix = len(SNAPSHOT_MAGIC) + _LENGTH.size
+    if len(data) < prefix or data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise SnapshotFileError('not a Vedda dictionary snapshot')
+    (header_length,) = _LENGTH.unpack(data[len(SNAPSHOT_MAGIC):prefix])
+    try:
+        header = json.loads(data[prefix:prefix + header_length])
+        snapshot_format = header['format']
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotFileError(f'unreadable header: {e}')
+    if snapshot_format != SNAPSHOT_FORMAT:
+        raise SnapshotFileError(f'unsupported snapshot format {snapshot_format}')
+    payload = data[prefix + header_length:]
+    if zlib.crc32(payload) != header.get('checksum'):
+        raise SnapshotFileError('snapshot checksum mismatch (torn or truncated file)')
+    try:
+        maps = json.loads(payload)
+        return {name: maps[name] for name in SNAPSHOT_MAPS}, header
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotFileError(f'corrupt snapshot {path}: {e}')
+
 
 # Singleton instance
 _vedda_stt_processor_instance = None
@@ -30,18 +124,36 @@ class VeddaSTTProcessor:
         self.vedda_dict = {}
         self.sinhala_to_vedda = {}
         self.vedda_phonetic_patterns = {}
-        self.load_dictionary()
-        logger.info("Vedda STT Processor initialized")
+        self.snapshot_path = snapshot_path()
+        
+        start = time.perf_counter()
+        if self._load_snapshot_file():
+            # Serve from the local snapshot and refresh from MongoDB in the background
+            threading.Thread(target=self._reconcile, name='vedda-dictionary-reconcile', daemon=True).start()
+            source = 'snapshot file'
+        else:
+            self.load_dictionary()
+            self._save_snapshot_file()
+            source = 'MongoDB'
+        logger.info(f"Vedda STT Processor initialized from {source} "
+                    f"in {(time.perf_counter() - start) * 1000:.0f}ms")
     
     def load_dictionary(self):
         """Load Vedda dictionary from MongoDB"""
         try:
             if self.db is None:
                 logger.warning("Database not initialized, skipping dictionary load")
-                return
+                return False
+            
+            vedda_dict = {}
+            sinhala_to_vedda = {}
+            vedda_phonetic_patterns = {}
             
             # Load all dictionary entries from MongoDB
-            cursor = self.db.dictionary.find({})
+            cursor = self.db.dictionary.find({}, {
+                'vedda_word': 1, 'sinhala_word': 1, 'english_word': 1,
+                'vedda_ipa': 1, 'sinhala_ipa': 1
+            })
             
             for doc in cursor:
                 vedda_word = doc.get('vedda_word', '')
@@ -51,7 +163,7 @@ class VeddaSTTProcessor:
                 sinhala_ipa = doc.get('sinhala_ipa', '')
                 
                 # Create mappings
-                self.vedda_dict[vedda_word] = {
+                vedda_dict[vedda_word] = {
                     'sinhala': sinhala_word,
                     'english': english_word,
                     'vedda_ipa': vedda_ipa,
@@ -60,21 +172,61 @@ class VeddaSTTProcessor:
                 
                 # Reverse mapping: Sinhala to Vedda
                 if sinhala_word:
-                    self.sinhala_to_vedda[sinhala_word.lower()] = vedda_word
+                    sinhala_to_vedda[sinhala_word.lower()] = vedda_word
                 
                 # Create phonetic patterns for better matching
                 if vedda_ipa and sinhala_ipa:
-                    self.vedda_phonetic_patterns[vedda_word] = {
+                    vedda_phonetic_patterns[vedda_word] = {
                         'vedda_pattern': self._create_phonetic_pattern(vedda_ipa),
                         'sinhala_pattern': self._create_phonetic_pattern(sinhala_ipa)
                     }
             
+            # Swap the fully built maps in so readers never see a half-loaded dictionary
+            self.vedda_dict = vedda_dict
+            self.sinhala_to_vedda = sinhala_to_vedda
+            self.vedda_phonetic_patterns = vedda_phonetic_patterns
+            
             logger.info(f"Loaded {len(self.vedda_dict)} Vedda dictionary entries from MongoDB")
+            return True
             
         except Exception as e:
             logger.error(f"Error loading Vedda dictionary from MongoDB: {str(e)}")
-            self.vedda_dict = {}
-            self.sinhala_to_vedda = {}
+            return False
+    
+    def _load_snapshot_file(self):
+        """Load the dictionary maps from the local snapshot file; False when unavailable"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            start = time.perf_counter()
+            maps, _ = load_snapshot(self.snapshot_path)
+            self.vedda_dict = maps['vedda_dict']
+            self.sinhala_to_vedda = maps['sinhala_to_vedda']
+            self.vedda_phonetic_patterns = maps['vedda_phonetic_patterns']
+            logger.info(f"Loaded {len(self.vedda_dict)} Vedda dictionary entries from "
+                        f"{self.snapshot_path} in {(time.perf_counter() - start) * 1000:.1f}ms")
+            return True
+        except SnapshotFileError as e:
+            logger.warning(f"Ignoring Vedda dictionary snapshot file: {e}")
+            return False
+    
+    def _save_snapshot_file(self):
+        """Persist the dictionary maps for the next cold start (best effort)"""
+        if not self.snapshot_path or not self.vedda_dict:
+            return
+        try:
+            save_snapshot(self.snapshot_path, {
+                'vedda_dict': self.vedda_dict,
+                'sinhala_to_vedda': self.sinhala_to_vedda,
+                'vedda_phonetic_patterns': self.vedda_phonetic_patterns
+            })
+        except OSError as e:
+            logger.warning(f"Could not save Vedda dictionary snapshot file: {e}")
+    
+    def _reconcile(self):
+        """Refresh the snapshot-loaded maps from MongoDB and rewrite the file"""
+        if self.load_dictionary():
+            self._save_snapshot_file()
     
     def _create_phonetic_pattern(self, ipa_text):
         """Create simplified phonetic pattern for matching"""
@@ -7,6 +7,7 @@ mocked so the suite runs without audio hardware or network access.
 
 import sys
 import os
+import tempfile
 import types
 import unittest
 from unittest.mock import MagicMock, patch, Mock
@@ -54,6 +55,7 @@ _vedda_asr_mod.get_vedda_asr_service = MagicMock()
 sys.path.insert(0, str(__import__("pathlib").Path(__file__).resolve().parents[1]))
 
 from app.services.speech_service import SpeechService  # noqa: E402
+from app.services import vedda_stt_processor as _stt_mod  # noqa: E402
 import app.services.speech_service as _speech_svc_mod  # saved ref for patch.object()
 _speech_svc_sr = _speech_svc_mod.sr  # the stubbed speech_recognition module
 
@@ -313,5 +315,65 @@ class TestSupportedLanguages(unittest.TestCase):
         self.assertEqual(result["language_map"]["sinhala"], "si-LK")
 
 
+# ---------------------------------------------------------------------------
+# Vedda dictionary snapshot file
+# ---------------------------------------------------------------------------
+
+class TestDictionarySnapshot(unittest.TestCase):
+
+    MAPS = {
+        "vedda_dict": {"දියරං": {"sinhala": "වතුර", "english": "water",
+                                 "vedda_ipa": "d̪ijaraŋ", "sinhala_ipa": "ʋat̪ura"}},
+        "sinhala_to_vedda": {"වතුර": "දියරං"},
+        "vedda_phonetic_patterns": {"දියරං": {"vedda_pattern": "d̪ijaraŋ", "sinhala_pattern": "ʋat̪ura"}},
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "snapshots", "vedda_dictionary.snap")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        header = _stt_mod.save_snapshot(self.path, self.MAPS)
+        self.assertEqual(header["entries"], 1)
+        maps, loaded = _stt_mod.load_snapshot(self.path)
+        self.assertEqual(maps, self.MAPS)
+        self.assertEqual(loaded["checksum"], header["checksum"])
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["vedda_dictionary.snap"])
+
+    def test_torn_file_is_rejected(self):
+        _stt_mod.save_snapshot(self.path, self.MAPS)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for damaged in (data[:-5], data[:-5] + b"XXXXX"):
+            with open(self.path, "wb") as f:
+                f.write(damaged)
+            with self.assertRaisesRegex(_stt_mod.SnapshotFileError, "checksum"):
+                _stt_mod.load_snapshot(self.path)
+
+    def test_other_files_and_formats_are_rejected(self):
+        other = os.path.join(self.tmp.name, "pickled.snap")
+        with open(other, "wb") as f:
+            f.write(b"\x80\x04not a snapshot")
+        with self.assertRaisesRegex(_stt_mod.SnapshotFileError, "not a Vedda dictionary snapshot"):
+            _stt_mod.load_snapshot(other)
+        with patch.object(_stt_mod, "SNAPSHOT_FORMAT", 1):
+            _stt_mod.save_snapshot(self.path, self.MAPS)
+        with self.assertRaisesRegex(_stt_mod.SnapshotFileError, "format 1"):
+            _stt_mod.load_snapshot(self.path)
+
+    def test_relative_paths_are_anchored_to_the_service_root(self):
+        root = str(__import__("pathlib").Path(__file__).resolve().parents[1])
+        with patch.dict(os.environ):
+            os.environ.pop("VEDDA_DICTIONARY_SNAPSHOT_PATH", None)
+            self.assertEqual(_stt_mod.snapshot_path(),
+                             os.path.join(root, "snapshots", "vedda_dictionary.snap"))
+        self.assertEqual(_stt_mod.snapshot_path("cache/dict.snap"), os.path.join(root, "cache", "dict.snap"))
+        self.assertEqual(_stt_mod.snapshot_path(self.path), self.path)
+        self.assertEqual(_stt_mod.snapshot_path(""), "")
+
+
 if __name__ == "__main__":
     unittest.main()
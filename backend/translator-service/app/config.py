@@ -12,5 +12,15 @@ class Config:
     DICTIONARY_SERVICE_URL = os.getenv('DICTIONARY_SERVICE_URL', 'http://127.0.0.1:5002/api/dictionary')
     HISTORY_SERVICE_URL = os.getenv('HISTORY_SERVICE_URL', 'http://127.0.0.1:5003')
     
+    # Translation memory (served by the history service): answer repeated inputs
+    # from past translations when their confidence is at least the minimum.
+    # Off by default; the history service only serves outputs with enough agreement
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'false').lower() == 'true'
+    TRANSLATION_MEMORY_MIN_CONFIDENCE = float(os.getenv('TRANSLATION_MEMORY_MIN_CONFIDENCE', '0.8'))
+    TRANSLATION_MEMORY_TIMEOUT = float(os.getenv('TRANSLATION_MEMORY_TIMEOUT', '0.3'))
+    
+    # Popular inputs (per language pair) replayed as dictionary searches at startup to warm its search cache; 0 disables
+    PREWARM_POPULAR_LIMIT = int(os.getenv('PREWARM_POPULAR_LIMIT', '100'))
+    
     # Google Translate API configuration
     GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
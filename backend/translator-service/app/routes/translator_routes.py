@@ -15,8 +15,16 @@ def init_translator(app):
     translator = VeddaTranslator(
         dictionary_service_url=app.config['DICTIONARY_SERVICE_URL'],
         history_service_url=app.config['HISTORY_SERVICE_URL'],
-        google_translate_url=app.config['GOOGLE_TRANSLATE_URL']
+        google_translate_url=app.config['GOOGLE_TRANSLATE_URL'],
+        translation_memory=app.config.get('TRANSLATION_MEMORY_ENABLED', False),
+        memory_min_confidence=app.config.get('TRANSLATION_MEMORY_MIN_CONFIDENCE', 0.8),
+        memory_timeout=app.config.get('TRANSLATION_MEMORY_TIMEOUT', 0.3)
     )
+    
+    # Warm the dictionary search cache with popular inputs in the background
+    if app.config.get('PREWARM_POPULAR_LIMIT', 0) > 0:
+        Thread(target=translator.prewarm_from_history, args=(app.config['PREWARM_POPULAR_LIMIT'],),
+               daemon=True).start()
 
 
 @translator_bp.route('/translate', methods=['POST'])
@@ -40,8 +48,8 @@ def translate():
     if target_language not in translator.supported_languages:
         return jsonify({'error': f'Unsupported target language: {target_language}'}), 400
     
-    # Perform translation
-    result = translator.translate_text(text, source_language, target_language)
+    # Perform translation (repeated inputs are answered from translation memory)
+    result = translator.translate_with_memory(text, source_language, target_language)
     
     # Save to history asynchronously (non-blocking)
     def save_history_async():
@@ -52,7 +60,9 @@ def translate():
                 source_language=source_language,
                 target_language=target_language,
                 translation_method=result['method'],
-                confidence=result['confidence']
+                confidence=result['confidence'],
+                unmatched_words=result.get('unmatched_words'),
+                unmatched_language=result.get('unmatched_language')
             )
         except Exception as e:
             print(f"[HISTORY] Failed to save: {e}")
@@ -60,7 +70,7 @@ def translate():
     # Run in background thread - doesn't block response
     Thread(target=save_history_async, daemon=True).start()
     
-    return jsonify({
+    response = {
         'success': True,
         'input_text': text,
         'translated_text': result['translated_text'],
@@ -74,7 +84,11 @@ def translate():
         'source_romanization': result.get('source_romanization', ''),
         'target_romanization': result.get('target_romanization', ''),
         'bridge_translation': result.get('bridge_translation', '')
-    })
+    }
+    if 'translation_memory' in result:
+        response['translation_memory'] = result['translation_memory']
+    
+    return jsonify(response)
 
 
 @translator_bp.route('/languages', methods=['GET'])
@@ -17,11 +17,17 @@ except ImportError:
 
 
 class VeddaTranslator:
-    def __init__(self, dictionary_service_url, history_service_url, google_translate_url):
+    def __init__(self, dictionary_service_url, history_service_url, google_translate_url,
+                 translation_memory=False, memory_min_confidence=0.8, memory_timeout=0.3):
         self.dictionary_service_url = dictionary_service_url
         self.history_service_url = history_service_url
         self.google_translate_url = google_translate_url
 
+        # Translation memory: reuse a remembered translation of the same input when confident enough
+        self.translation_memory = translation_memory
+        self.memory_min_confidence = memory_min_confidence
+        self.memory_timeout = memory_timeout
+
         # IGNORE RULES LIST - Sinhala words that should NOT be translated
         # These words will be passed through without translation attempt
         # Format: Sinhala word → (vedda equivalent or keep as-is)
@@ -920,6 +926,7 @@ class VeddaTranslator:
         sinhala_words = [word.strip() for word in sinhala_text.split() if word.strip()]
         vedda_words = []
         word_sources = []  # Track whether each word came from dictionary or is Sinhala fallback
+        unmatched_words = []  # Sinhala words with no dictionary entry (kept as Sinhala)
         dictionary_hits = 0
         processed_indices = set()  # Track which Sinhala words have been processed
 
@@ -1063,6 +1070,7 @@ class VeddaTranslator:
                         # Use original word WITH suffix (no separation)
                         vedda_words.append(sinhala_word)
                         word_sources.append(('sinhala', sinhala_word, sinhala_word))
+                        unmatched_words.append(sinhala_word)
 
                 processed_indices.add(i)
                 i += 1
@@ -1128,6 +1136,8 @@ class VeddaTranslator:
             'target_romanization': target_singlish,
             'bridge_translation': sinhala_text,
             'methods_used': ['google', 'dictionary', 'sinhala_bridge'],
+            'unmatched_words': unmatched_words,
+            'unmatched_language': 'sinhala',
             'note': f'Translated via Sinhala bridge. Dictionary coverage: {dictionary_hits}/{len(sinhala_words)} words'
         }
     
@@ -1183,6 +1193,7 @@ class VeddaTranslator:
         vedda_words = [word.strip() for word in text.split() if word.strip()]
         sinhala_words = []
         word_sources = []  # Track whether each word came from dictionary or is fallback
+        unmatched_words = []  # Vedda words with no dictionary entry (passed through unchanged)
         dictionary_hits = 0
         processed_indices = set()  # Track which vedda words have been processed
         
@@ -1273,6 +1284,7 @@ class VeddaTranslator:
                     # Fallback: keep the Vedda word unchanged
                     sinhala_words.append(vedda_word)
                     word_sources.append(('sinhala', None, vedda_word, vedda_word))
+                    unmatched_words.append(vedda_word)
                 
                 processed_indices.add(i)
                 i += 1
@@ -1373,6 +1385,8 @@ class VeddaTranslator:
             'target_ipa': target_ipa,
             'bridge_translation': sinhala_text,
             'methods_used': ['dictionary', 'google', 'sinhala_bridge'],
+            'unmatched_words': unmatched_words,
+            'unmatched_language': 'vedda',
             'note': f'Translated via Sinhala bridge. Dictionary coverage: {dictionary_hits}/{len(vedda_words)} words'
         }
     
@@ -1436,8 +1450,101 @@ class VeddaTranslator:
         else:
             return self.direct_translation(text, source_language, target_language)
     
+    def lookup_translation_memory(self, text, source_language, target_language):
+        """Exact translation memory match from the history service, or None (misses never block translation)"""
+        try:
+            response = self.session.get(
+                f"{self.history_service_url}/api/memory/lookup",
+                params={
+                    'text': text,
+                    'source_language': source_language,
+                    'target_language': target_language
+                },
+                timeout=self.memory_timeout
+            )
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('found') and data.get('confidence', 0) >= self.memory_min_confidence:
+                    return data
+        except Exception as e:
+            print(f"[MEMORY] Lookup failed: {e}")
+        return None
+    
+    def translate_with_memory(self, text, source_language, target_language):
+        """Translate, answering from translation memory first when it is enabled"""
+        if self.translation_memory and text.strip():
+            memory = self.lookup_translation_memory(text, source_language, target_language)
+            if memory:
+                # Memory keeps only the text, so pronunciations are generated again
+                source_ipa, source_romanization = self._pronunciation(text, source_language)
+                target_ipa, target_romanization = self._pronunciation(memory['translation'], target_language)
+                return {
+                    'translated_text': memory['translation'],
+                    'confidence': memory['confidence'],
+                    'method': 'translation_memory',
+                    'methods_used': ['translation_memory'],
+                    'source_ipa': source_ipa,
+                    'source_romanization': source_romanization,
+                    'target_ipa': target_ipa,
+                    'target_romanization': target_romanization,
+                    # Saved to history with the hit, so these words are still counted as missing
+                    'unmatched_words': memory.get('unmatched_words') or [],
+                    'unmatched_language': memory.get('unmatched_language'),
+                    'translation_memory': memory.get('provenance', {})
+                }
+        return self.translate_text(text, source_language, target_language)
+    
+    def _pronunciation(self, text, language):
+        """(IPA, Singlish romanization) of text in language; empty strings where not available"""
+        if language == 'english':
+            return self.generate_english_ipa(text), ''
+        if language in ('sinhala', 'vedda'):
+            return self.generate_vedda_sinhala_ipa(text), self.generate_singlish_romanization(text)
+        return '', ''
+    
+    def prewarm_from_history(self, limit=100):
+        """Warm the dictionary service's search cache with the most popular inputs (run at startup)
+
+        Popular inputs come from the history service's heavy-hitter sketches.
+        Only /search scans are cached by the dictionary service (word lookups
+        are snapshot probes), so this replays the searches a translation
+        makes: the whole Vedda phrase, then each word as a Sinhala fallback.
+        English inputs are skipped because their dictionary words only exist
+        after the Google bridge step.
+        """
+        try:
+            response = self.session.get(
+                f"{self.history_service_url}/api/history/popular",
+                params={'kind': 'inputs', 'limit': limit},
+                timeout=5
+            )
+            if response.status_code != 200:
+                print(f"[PREWARM] Popular inputs unavailable (status {response.status_code})")
+                return 0
+            popular = response.json().get('popular', {})
+        except Exception as e:
+            print(f"[PREWARM] Popular inputs unavailable: {e}")
+            return 0
+        
+        searches = []
+        for pair, items in popular.items():
+            source_language, _, target_language = pair.partition('|')
+            if source_language not in ('sinhala', 'vedda'):
+                continue
+            texts = [item['text'].strip() for item in items if item.get('text', '').strip()]
+            if source_language == 'vedda':
+                searches.extend((text, 'vedda', target_language) for text in texts)
+            searches.extend((word, 'sinhala', 'sinhala') for text in texts for word in text.split())
+        
+        searches = list(dict.fromkeys(searches))
+        for query, source_lang, target_lang in searches:
+            self.search_dictionary(query, source_lang, target_lang)
+        print(f"[PREWARM] Sent {len(searches)} popular dictionary searches to warm the search cache")
+        return len(searches)
+    
     def save_translation_history(self, input_text, output_text, source_language, 
-                               target_language, translation_method, confidence):
+                               target_language, translation_method, confidence,
+                               unmatched_words=None, unmatched_language=None):
         """Save translation to history service (runs in background thread)"""
         try:
             data = {
@@ -1448,6 +1555,10 @@ class VeddaTranslator:
                 'translation_method': translation_method,
                 'confidence_score': confidence
             }
+            if unmatched_words:
+                # Counted by the history service to rank missing dictionary words
+                data['unmatched_words'] = unmatched_words
+                data['unmatched_language'] = unmatched_language
             
             # Use reasonable timeout since we're in background thread
             response = self.session.post(
@@ -8,7 +8,7 @@ so the tests run without any network access or optional packages installed.
 import sys
 import types
 import unittest
-from unittest.mock import MagicMock, patch, Mock
+from unittest.mock import MagicMock, patch, Mock, call
 
 # ---------------------------------------------------------------------------
 # Flush any 'app' package left in sys.modules by a previously-run service's
@@ -375,6 +375,144 @@ class TestDirectTranslation(unittest.TestCase):
         self.t.generate_english_ipa.assert_called()
 
 
+class TestTranslationMemory(unittest.TestCase):
+    """lookup_translation_memory() / translate_with_memory()"""
+
+    def setUp(self):
+        self.t = _make_translator(translation_memory=True)
+
+    def _mock_response(self, payload, status=200):
+        resp = Mock()
+        resp.status_code = status
+        resp.json.return_value = payload
+        return resp
+
+    def _memory_hit(self, confidence=0.9):
+        return {
+            "success": True,
+            "found": True,
+            "match": "exact",
+            "translation": "maya",
+            "confidence": confidence,
+            "provenance": {"history_id": "abc", "translation_method": "dictionary"},
+        }
+
+    def test_confident_hit_skips_translation(self):
+        self.t.session.get = Mock(return_value=self._mock_response(self._memory_hit()))
+        with patch.object(self.t, "translate_text") as translate_text:
+            result = self.t.translate_with_memory("water", "english", "vedda")
+        translate_text.assert_not_called()
+        self.assertEqual(result["translated_text"], "maya")
+        self.assertEqual(result["method"], "translation_memory")
+        self.assertEqual(result["translation_memory"]["history_id"], "abc")
+
+    def test_hit_passes_on_unmatched_words(self):
+        hit = dict(self._memory_hit(), unmatched_words=["stream"], unmatched_language="english")
+        self.t.session.get = Mock(return_value=self._mock_response(hit))
+        result = self.t.translate_with_memory("water stream", "english", "vedda")
+        self.assertEqual((result["unmatched_words"], result["unmatched_language"]), (["stream"], "english"))
+
+    def test_hit_regenerates_pronunciations(self):
+        self.t.session.get = Mock(return_value=self._mock_response(self._memory_hit()))
+        with patch.object(self.t, "generate_english_ipa", return_value="ˈwɔːtə"), \
+                patch.object(self.t, "generate_vedda_sinhala_ipa", return_value="maja"), \
+                patch.object(self.t, "generate_singlish_romanization", return_value="maya"):
+            result = self.t.translate_with_memory("water", "english", "vedda")
+        self.assertEqual((result["source_ipa"], result["source_romanization"]), ("ˈwɔːtə", ""))
+        self.assertEqual((result["target_ipa"], result["target_romanization"]), ("maja", "maya"))
+
+    def test_low_confidence_hit_is_ignored(self):
+        self.t.session.get = Mock(return_value=self._mock_response(self._memory_hit(confidence=0.5)))
+        self.assertIsNone(self.t.lookup_translation_memory("water", "english", "vedda"))
+
+    def test_miss_falls_back_to_translation(self):
+        self.t.session.get = Mock(return_value=self._mock_response({"success": True, "found": False}))
+        with patch.object(self.t, "translate_text", return_value={"translated_text": "x"}) as translate_text:
+            result = self.t.translate_with_memory("water", "english", "vedda")
+        translate_text.assert_called_once_with("water", "english", "vedda")
+        self.assertEqual(result["translated_text"], "x")
+
+    def test_lookup_error_falls_back_to_translation(self):
+        self.t.session.get = Mock(side_effect=Exception("timeout"))
+        with patch.object(self.t, "translate_text", return_value={"translated_text": "x"}):
+            result = self.t.translate_with_memory("water", "english", "vedda")
+        self.assertEqual(result["translated_text"], "x")
+
+    def test_disabled_memory_is_not_queried(self):
+        t = _make_translator()
+        t.session.get = Mock()
+        with patch.object(t, "translate_text", return_value={"translated_text": "x"}):
+            t.translate_with_memory("water", "english", "vedda")
+        t.session.get.assert_not_called()
+
+
+class TestPrewarmFromHistory(unittest.TestCase):
+    """prewarm_from_history()"""
+
+    def setUp(self):
+        self.t = _make_translator()
+
+    def _mock_response(self, payload, status=200):
+        resp = Mock()
+        resp.status_code = status
+        resp.json.return_value = payload
+        return resp
+
+    def test_searches_popular_vedda_phrases_and_words(self):
+        payload = {"popular": {"vedda|english": [{"text": "maya kiri", "count": 5},
+                                                 {"text": "maya", "count": 2}]}}
+        self.t.session.get = Mock(return_value=self._mock_response(payload))
+        with patch.object(self.t, "search_dictionary", return_value=None) as search:
+            warmed = self.t.prewarm_from_history()
+        self.assertEqual(search.call_args_list, [
+            call("maya kiri", "vedda", "english"),
+            call("maya", "vedda", "english"),
+            call("maya", "sinhala", "sinhala"),
+            call("kiri", "sinhala", "sinhala"),
+        ])
+        self.assertEqual(warmed, 4)
+
+    def test_searches_sinhala_words_as_fallbacks(self):
+        payload = {"popular": {"sinhala|vedda": [{"text": "වතුර බොන්න", "count": 5}]}}
+        self.t.session.get = Mock(return_value=self._mock_response(payload))
+        with patch.object(self.t, "search_dictionary", return_value=None) as search:
+            self.assertEqual(self.t.prewarm_from_history(), 2)
+        self.assertEqual(search.call_args_list, [
+            call("වතුර", "sinhala", "sinhala"),
+            call("බොන්න", "sinhala", "sinhala"),
+        ])
+
+    def test_skips_english_inputs(self):
+        payload = {"popular": {"english|vedda": [{"text": "water", "count": 5}]}}
+        self.t.session.get = Mock(return_value=self._mock_response(payload))
+        with patch.object(self.t, "search_dictionary") as search:
+            self.assertEqual(self.t.prewarm_from_history(), 0)
+        search.assert_not_called()
+
+    def test_history_unavailable_warms_nothing(self):
+        self.t.session.get = Mock(side_effect=Exception("connection refused"))
+        self.assertEqual(self.t.prewarm_from_history(), 0)
+
+
+class TestSaveTranslationHistory(unittest.TestCase):
+    """save_translation_history()"""
+
+    def setUp(self):
+        self.t = _make_translator()
+        self.t.session.post = Mock(return_value=Mock(status_code=201))
+
+    def test_sends_unmatched_words(self):
+        self.t.save_translation_history("a b", "x b", "vedda", "sinhala", "vedda_to_sinhala_bridge", 0.5,
+                                        unmatched_words=["b"], unmatched_language="vedda")
+        data = self.t.session.post.call_args.kwargs["json"]
+        self.assertEqual(data["unmatched_words"], ["b"])
+        self.assertEqual(data["unmatched_language"], "vedda")
+
+    def test_omits_unmatched_words_when_none(self):
+        self.t.save_translation_history("a", "x", "vedda", "sinhala", "vedda_phrase", 0.95)
+        self.assertNotIn("unmatched_words", self.t.session.post.call_args.kwargs["json"])
+
+
 class TestSupportedLanguages(unittest.TestCase):
     """supported_languages attribute"""
 